@@ -1,6 +1,8 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin, StackedInline
 
+from .cache_utils import invalidate_namespaces, seller_namespace
+from .cards import cards_enabled, refresh_cards
 from .models import *
 
 # Register your models here.
@@ -36,18 +38,37 @@ class ProductAdmin(ModelAdmin):
 
     @admin.action(description="Approve selected products")
     def approve_products(self, request, queryset):
-        updated = queryset.update(
+        product_ids = list(queryset.values_list("pk", flat=True))
+        updated = Product.objects.filter(pk__in=product_ids).update(
             approval_status=Product.ApprovalStatus.APPROVED, rejection_reason=""
         )
+        self._refresh_products(product_ids)
         self.message_user(request, f"{updated} product(s) approved.")
 
     @admin.action(description="Reject selected products")
     def reject_products(self, request, queryset):
-        updated = queryset.update(
+        product_ids = list(queryset.values_list("pk", flat=True))
+        updated = Product.objects.filter(pk__in=product_ids).update(
             approval_status=Product.ApprovalStatus.REJECTED,
             rejection_reason="Rejected by admin.",
         )
+        self._refresh_products(product_ids)
         self.message_user(request, f"{updated} product(s) rejected.")
+
+    def _refresh_products(self, product_ids):
+        # update() bypasses the post_save signals that rebuild the product
+        # cards and invalidate the caches. The ids are taken before it runs:
+        # a changelist filtered on approval_status no longer matches after.
+        if cards_enabled():
+            refresh_cards(product_ids)
+        seller_ids = set(
+            Product.objects.filter(pk__in=product_ids)
+            .exclude(seller=None)
+            .values_list("seller_id", flat=True)
+        )
+        invalidate_namespaces("products", *(seller_namespace(pk) for pk in seller_ids))
+
+
 @admin.register(SellerProfile)
 class SellerProfileAdmin(ModelAdmin):
     list_display = ["business_name", "user", "verification_status", "is_active", "created_at"]
@@ -57,19 +78,32 @@ class SellerProfileAdmin(ModelAdmin):
 
     @admin.action(description="Approve selected sellers")
     def approve_sellers(self, request, queryset):
-        updated = queryset.update(
+        seller_ids = list(queryset.values_list("pk", flat=True))
+        updated = SellerProfile.objects.filter(pk__in=seller_ids).update(
             verification_status=SellerProfile.VerificationStatus.APPROVED,
             rejection_reason="",
         )
+        self._refresh_sellers(seller_ids)
         self.message_user(request, f"{updated} seller(s) approved.")
 
     @admin.action(description="Reject selected sellers")
     def reject_sellers(self, request, queryset):
-        updated = queryset.update(
+        seller_ids = list(queryset.values_list("pk", flat=True))
+        updated = SellerProfile.objects.filter(pk__in=seller_ids).update(
             verification_status=SellerProfile.VerificationStatus.REJECTED,
             rejection_reason="Rejected by admin.",
         )
+        self._refresh_sellers(seller_ids)
         self.message_user(request, f"{updated} seller(s) rejected.")
+
+    def _refresh_sellers(self, seller_ids):
+        # Verification status is on no product card or search document, so
+        # the cache bump is all update() skips. The ids are taken before it
+        # runs: a changelist filtered on verification_status no longer
+        # matches after.
+        invalidate_namespaces("sellers", *(seller_namespace(pk) for pk in seller_ids))
+
+
 @admin.register(ProductImage)
 class ProductImageAdmin(ModelAdmin):
     pass
@@ -132,7 +166,68 @@ class SellerOfferAdmin(ModelAdmin):
 
 @admin.register(SellerPayoutRecord)
 class SellerPayoutAdmin(ModelAdmin):
-    list_display = ["seller", "order", "gross_amount", "commission_amount", "net_amount", "status"]
+    list_display = ["seller", "order", "gross_amount", "commission_amount", "net_amount", "status", "attempts"]
     list_filter = ["status", "delivery_type"]
+    search_fields = ["seller__business_name", "stripe_transfer_id"]
+    readonly_fields = ["gross_amount", "commission_amount", "net_amount", "stripe_transfer_id", "last_error"]
+
+
+@admin.register(IdempotencyRecord)
+class IdempotencyRecordAdmin(ModelAdmin):
+    list_display = ["key", "owner", "endpoint", "status_code", "claimed_at", "expires_at"]
+    list_filter = ["endpoint", "status_code"]
+    search_fields = ["key", "owner__username"]
+    readonly_fields = ["request_hash", "response_body"]
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(ModelAdmin):
+    list_display = ["event_id", "provider", "event_type", "status", "attempts", "received_at"]
+    list_filter = ["provider", "status"]
+    search_fields = ["event_id"]
+    readonly_fields = ["payload", "last_error"]
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(ModelAdmin):
+    list_display = ["product", "quantity", "shard", "status", "order", "owner", "expires_at"]
+    list_filter = ["status"]
+    search_fields = ["product__name"]
+    readonly_fields = ["product", "shard", "quantity", "owner", "order", "expires_at"]
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(ModelAdmin):
+    list_display = ["day", "product", "units", "revenue", "platform_fee", "seller_payout"]
+    list_filter = ["day"]
+    search_fields = ["product__name"]
+    date_hierarchy = "day"
+    readonly_fields = ["day", "product", "units", "revenue", "platform_fee", "seller_payout"]
+
+
+@admin.register(DailySellerSales)
+class DailySellerSalesAdmin(ModelAdmin):
+    list_display = ["day", "seller", "orders", "units", "revenue", "platform_fee", "seller_payout"]
+    list_filter = ["day"]
     search_fields = ["seller__business_name"]
-    readonly_fields = ["gross_amount", "commission_amount", "net_amount"]
+    date_hierarchy = "day"
+    readonly_fields = [
+        "day", "seller", "orders", "units", "revenue", "platform_fee", "seller_payout"
+    ]
+
+
+@admin.register(KPICounter)
+class KPICounterAdmin(ModelAdmin):
+    list_display = ["name", "shard", "value"]
+    list_filter = ["name"]
+    readonly_fields = ["name", "shard", "value"]
+
+
+@admin.register(ProductSalesRank)
+class ProductSalesRankAdmin(ModelAdmin):
+    list_display = ["window", "rank", "product", "units", "revenue", "computed_at"]
+    list_filter = ["window"]
+    search_fields = ["product__name"]
+    readonly_fields = [
+        "window", "rank", "product", "category", "units", "revenue", "computed_at"
+    ]
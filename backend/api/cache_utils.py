@@ -2,25 +2,168 @@
 Performance optimization utilities for caching and reducing database queries.
 """
 
+import hashlib
+import logging
+import time
 from functools import wraps
+from urllib.parse import urlencode
 
 from django.conf import settings
 from django.core.cache import cache
+from django.http import HttpResponseNotModified
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
 from django.views.decorators.cache import cache_page
 from django.views.decorators.http import condition
 from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+logger = logging.getLogger(__name__)
 
-def cache_api_response(timeout=300):
+
+# ─── Versioned namespaces ──────────────────────────────────────────────────────
+#
+# Every cached response embeds the current version of each namespace it
+# depends on ("products", "categories", "seller:12", ...). A write bumps
+# only the namespaces it affects (see api/signals.py); entries keyed with
+# the old version are never read again and simply age out. Nothing else in
+# the cache — e.g. OTP reset tokens — is touched.
+
+NAMESPACE_KEY = "cache_ns:{}"
+
+
+def seller_namespace(seller_id):
+    return f"seller:{seller_id}"
+
+
+def _fresh_version():
+    # Time-based rather than 1 so that a version key evicted by the backend
+    # can never be re-created with a value older entries were keyed under.
+    return time.time_ns() // 1000
+
+
+def get_namespace_versions(namespaces):
+    """Return {namespace: version}, initialising missing namespaces."""
+    keys = {NAMESPACE_KEY.format(ns): ns for ns in namespaces}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, ns in keys.items():
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _fresh_version(), None)
+            version = cache.get(key)
+        versions[ns] = version
+    return versions
+
+
+def invalidate_namespaces(*namespaces):
+    """Bump namespace versions so responses cached under them are skipped."""
+    if not getattr(settings, "ENABLE_CACHING", True):
+        return
+    for ns in set(namespaces):
+        key = NAMESPACE_KEY.format(ns)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+
+
+def build_cache_key(request, namespaces, fingerprint=""):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    versions = get_namespace_versions(namespaces)
+    stamp = ",".join(f"{ns}={versions[ns]}" for ns in sorted(versions))
+    if fingerprint:
+        stamp = f"{stamp};{fingerprint}"
+    return f"api_response:{request.path}:{query}:{stamp}"
+
+
+# ─── Conditional GET ───────────────────────────────────────────────────────────
+#
+# The cache key already fingerprints everything a cached response depends
+# on (path, query, namespace versions), so its hash doubles as a strong
+# ETag: a matching If-None-Match is answered 304 before the view — and its
+# queries and serializers — runs at all.
+
+
+def make_etag(cache_key):
+    return '"%s"' % hashlib.sha1(cache_key.encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    # GZipMiddleware weakens our ETags on compressed responses.
+    tags = parse_etags(header)
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+# ─── Response caching ──────────────────────────────────────────────────────────
+#
+# Entries are stored as (fresh_until, data) and kept for `stale_ttl` seconds
+# past their soft `timeout`. Within that window one request — the holder of
+# a short-lived lock key — recomputes while everyone else is served the
+# stale copy, so a hot key expiring doesn't send every worker to the
+# database at once. A cold miss is single-flight too: losers of the lock
+# briefly wait for the winner's entry. Independently, the last good payload
+# per URL survives namespace bumps for `stale_if_error` seconds and is
+# returned when the view raises or answers 5xx.
+
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+
+
+def _cached_response(data, etag=None):
+    resp = Response(data)
+    if etag:
+        resp["ETag"] = etag
+    resp.accepted_renderer = JSONRenderer()
+    resp.accepted_media_type = "application/json"
+    resp.renderer_context = {}
+    return resp
+
+
+def _is_entry(entry):
+    return isinstance(entry, tuple) and len(entry) == 2
+
+
+def _wait_for_entry(cache_key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(cache_key)
+        if _is_entry(entry):
+            return entry
+    return None
+
+
+def cache_api_response(
+    timeout=300, namespaces=(), stale_ttl=None, stale_if_error=86400, fingerprint=None
+):
     """
     Cache API responses based on user authentication and view parameters.
     Respects ENABLE_CACHING setting globally.
 
     Args:
         timeout: Cache duration in seconds (default: 5 minutes)
+        namespaces: Namespaces the response depends on, or a callable
+            (request, *args, **kwargs) -> namespaces for per-object ones.
+        stale_ttl: How long past `timeout` a stale entry may be served
+            while one request refreshes it (default: `timeout`).
+        stale_if_error: How long the last good payload is kept as a
+            fallback for when the view fails (0 disables).
+        fingerprint: Optional callable () -> str for state that changes
+            without a write, folded into the cache key and ETag.
     """
+    if stale_ttl is None:
+        stale_ttl = timeout
 
     def decorator(view_func):
         @wraps(view_func)
@@ -29,31 +172,60 @@ def cache_api_response(timeout=300):
             if request.user.is_authenticated:
                 return view_func(request, *args, **kwargs)
 
-            # Build cache key from request path and query params
-            cache_key = f"api_response:{request.path}:{request.GET.urlencode()}"
-
-            # Try to get from cache (only if caching is enabled)
-            if getattr(settings, "ENABLE_CACHING", True):
-                cached_response = cache.get(cache_key)
-                if cached_response is not None:
-                    resp = Response(cached_response)
-                    resp.accepted_renderer = JSONRenderer()
-                    resp.accepted_media_type = "application/json"
-                    resp.renderer_context = {}
-                    return resp
-
-            # Call the view
-            response = view_func(request, *args, **kwargs)
-
-            # Cache successful responses only (if enabled)
-            if getattr(settings, "ENABLE_CACHING", True):
-                if (
-                    hasattr(response, "status_code")
-                    and 200 <= response.status_code < 300
-                ):
-                    cache.set(cache_key, response.data, timeout)
-
-            return response
+            if not getattr(settings, "ENABLE_CACHING", True):
+                return view_func(request, *args, **kwargs)
+
+            deps = namespaces(request, *args, **kwargs) if callable(namespaces) else namespaces
+            cache_key = build_cache_key(request, deps, fingerprint() if fingerprint else "")
+            etag = make_etag(cache_key)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            lock_key = f"{cache_key}:lock"
+            last_good_key = f"api_last_good:{request.get_full_path()}"
+
+            entry = cache.get(cache_key)
+            if not _is_entry(entry):
+                entry = None
+            if entry and entry[0] > time.time():
+                return _cached_response(entry[1], etag)
+
+            # Stale or missing: only the lock holder recomputes.
+            locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+            if not locked:
+                if entry is None:
+                    entry = _wait_for_entry(cache_key)
+                if entry is not None:
+                    return _cached_response(entry[1], etag)
+                # The holder is slow or died; compute rather than fail.
+
+            try:
+                try:
+                    response = view_func(request, *args, **kwargs)
+                except Exception:
+                    fallback = entry[1] if entry else cache.get(last_good_key)
+                    if fallback is None:
+                        raise
+                    logger.exception("Serving stale %s after view error", request.path)
+                    return _cached_response(fallback)
+
+                status_code = getattr(response, "status_code", 500)
+                if status_code >= 500:
+                    fallback = entry[1] if entry else cache.get(last_good_key)
+                    if fallback is not None:
+                        return _cached_response(fallback)
+                elif 200 <= status_code < 300:
+                    if status_code == 200:
+                        response["ETag"] = etag
+                    # Cache successful responses only
+                    cache.set(
+                        cache_key, (time.time() + timeout, response.data), timeout + stale_ttl
+                    )
+                    if stale_if_error:
+                        cache.set(last_good_key, response.data, stale_if_error)
+                return response
+            finally:
+                if locked:
+                    cache.delete(lock_key)
 
         return wrapper
 
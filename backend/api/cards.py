@@ -0,0 +1,102 @@
+"""
+ProductCard read model for public product listings.
+
+A card is the ProductSerializer output of one product frozen as JSON,
+plus copies of the columns listings filter and sort on. With
+settings.SERVE_PRODUCT_CARDS enabled, the catalog answers from the card
+table alone instead of joining sellers, tags, gallery images and offers
+on every request.
+
+Cards are rebuilt from api/signals.py whenever a product, its images,
+tags, offers or seller change; `manage.py rebuild_product_cards`
+rebuilds all of them. effective_price also moves when an offer starts
+or expires, which writes nothing — each card records that moment in
+`price_valid_until` and is rebuilt on read once it has passed.
+"""
+
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product, ProductCard
+from .offers import next_price_changes
+from .serializer import ProductSerializer
+
+
+def cards_enabled():
+    return getattr(settings, "SERVE_PRODUCT_CARDS", False)
+
+
+def is_listed(product):
+    return (
+        product.is_active
+        and product.approval_status == Product.ApprovalStatus.APPROVED
+        and not (product.seller and not product.seller.is_active)
+    )
+
+
+def build_cards(products, now=None):
+    """Return unsaved ProductCard rows for products with their relations loaded."""
+    products = list(products)
+    now = now or timezone.now()
+    # Same serializer (and batched offer lookup) the live listing uses, so
+    # a card is byte-for-byte what the catalog would otherwise return.
+    data = ProductSerializer(products, many=True).data
+    changes = next_price_changes(products, now)
+    return [
+        ProductCard(
+            product_id=product.pk,
+            is_listed=is_listed(product),
+            category_id=product.category_id,
+            name=product.name,
+            price=product.price,
+            created_at=product.created_at,
+            payload=JSONRenderer().render(item).decode(),
+            price_valid_until=changes.get(product.pk),
+        )
+        for product, item in zip(products, data)
+    ]
+
+
+def refresh_cards(product_ids):
+    """(Re)build the cards for the given product ids."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    products = (
+        Product.objects.filter(pk__in=product_ids)
+        .select_related("seller")
+        .prefetch_related("tags", "gallery_images")
+    )
+    cards = build_cards(products)
+    with transaction.atomic():
+        ProductCard.objects.filter(product_id__in=product_ids).delete()
+        ProductCard.objects.bulk_create(cards)
+
+
+def refresh_seller_cards(seller_id):
+    refresh_cards(
+        Product.objects.filter(seller_id=seller_id).values_list("pk", flat=True)
+    )
+
+
+def card_payloads(cards):
+    """
+    Serialized products for a page of cards, rebuilding any whose
+    effective_price has been overtaken by an offer starting or expiring.
+    """
+    cards = list(cards)
+    now = timezone.now()
+    stale = [
+        card.product_id
+        for card in cards
+        if card.price_valid_until and card.price_valid_until <= now
+    ]
+    if stale:
+        refresh_cards(stale)
+        fresh = ProductCard.objects.only("product_id", "payload").in_bulk(stale)
+        cards = [fresh.get(card.product_id, card) for card in cards]
+    return [json.loads(card.payload) for card in cards]
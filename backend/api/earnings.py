@@ -0,0 +1,99 @@
+"""
+Seller earnings report for the admin dashboard.
+
+seller_earnings() annotates every approved seller with its 30-day and
+7-day revenue, commission, payout and order figures in a single grouped
+query over the daily seller rollups (api/rollups.py): each metric is a
+SUM with its window as a FILTER clause (a CASE expression on databases
+without one), so sellers without sales still get a row of zeros and any
+metric can be sorted on in SQL. A window reads one rollup row per seller
+and day, whatever the order volume.
+"""
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import DailySellerSales, PlatformSettings, SellerProfile
+from .rollups import window_start
+
+WINDOWS = {"30d": 30, "7d": 7}
+# Report metric -> DailySellerSales column.
+_COLUMNS = {
+    "total_revenue": "revenue",
+    "total_commission": "platform_fee",
+    "seller_payout": "seller_payout",
+    "total_orders": "orders",
+}
+# Sortable annotations, in report column order.
+EARNING_METRICS = tuple(f"{metric}_{window}" for window in WINDOWS for metric in _COLUMNS)
+EARNING_CSV_COLUMNS = (
+    "seller_id",
+    "business_name",
+    "username",
+    "delivery_type",
+    "commission_rate",
+    *EARNING_METRICS,
+)
+
+CENT = Decimal("0.01")
+_MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _total(column, window):
+    if column == "orders":
+        zero, output_field = Value(0), IntegerField()
+    else:
+        zero, output_field = Value(Decimal("0.00"), output_field=_MONEY), _MONEY
+    return Coalesce(
+        Sum(f"daily_sales__{column}", filter=window), zero, output_field=output_field
+    )
+
+
+def seller_earnings(now=None):
+    """Approved sellers annotated with EARNING_METRICS."""
+    annotations = {}
+    for name, days in WINDOWS.items():
+        window = Q(daily_sales__day__gte=window_start(days, now))
+        for metric, column in _COLUMNS.items():
+            annotations[f"{metric}_{name}"] = _total(column, window)
+    return (
+        SellerProfile.objects.filter(verification_status="approved")
+        .select_related("user")
+        .only("business_name", "delivery_type", "commission_rate", "user__username")
+        .annotate(**annotations)
+    )
+
+
+def earnings_summary(now=None):
+    """Marketplace-wide 30-day totals over the same rollups as the report."""
+    totals = DailySellerSales.objects.filter(
+        seller__verification_status="approved",
+        day__gte=window_start(WINDOWS["30d"], now),
+    ).aggregate(
+        total_revenue_30d=Sum("revenue"),
+        total_commission_30d=Sum("platform_fee"),
+    )
+    return {key: (value or Decimal("0")).quantize(CENT) for key, value in totals.items()}
+
+
+def earnings_rows(sellers):
+    """
+    Yield one report dict per annotated seller. The default commission
+    rate is read once for the whole report, not once per seller.
+    """
+    default_rate = PlatformSettings.cached().default_commission_rate
+    for seller in sellers:
+        row = {
+            "seller_id": seller.pk,
+            "business_name": seller.business_name,
+            "username": seller.user.username,
+            "delivery_type": seller.delivery_type,
+            "commission_rate": seller.effective_commission_rate(default_rate),
+        }
+        for metric in EARNING_METRICS:
+            value = getattr(seller, metric)
+            # SQLite hands sums back unscaled; report whole cents everywhere.
+            row[metric] = value.quantize(CENT) if isinstance(value, Decimal) else value
+        yield row
@@ -0,0 +1,82 @@
+"""
+Facet counts for the product catalog sidebar.
+
+Each function takes an already-filtered Product queryset and answers
+with grouped aggregate queries over the matching ids — never by loading
+products into Python.
+"""
+
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+
+from django.db.models import Count, Max, Min, Q
+
+from .models import Product
+
+PRICE_BUCKETS = 5
+MAX_PRICE_BUCKETS = 20
+
+
+def _matching_ids(queryset):
+    return queryset.order_by().values("pk")
+
+
+def category_counts(queryset):
+    rows = (
+        Product.objects.filter(pk__in=_matching_ids(queryset))
+        .values("category_id", "category__name")
+        .annotate(count=Count("pk"))
+        .order_by("-count", "category__name")
+    )
+    return [
+        {"id": row["category_id"], "name": row["category__name"], "count": row["count"]}
+        for row in rows
+    ]
+
+
+def tag_counts(queryset):
+    rows = (
+        Product.tags.through.objects.filter(product_id__in=_matching_ids(queryset))
+        .values("tag_id", "tag__name")
+        .annotate(count=Count("product_id"))
+        .order_by("-count", "tag__name")
+    )
+    return [
+        {"id": row["tag_id"], "name": row["tag__name"], "count": row["count"]}
+        for row in rows
+    ]
+
+
+def price_histogram(queryset, buckets=PRICE_BUCKETS):
+    """Equal-width price buckets between the cheapest and dearest match."""
+    products = Product.objects.filter(pk__in=_matching_ids(queryset))
+    bounds = products.aggregate(low=Min("price"), high=Max("price"))
+    low, high = bounds["low"], bounds["high"]
+    if low is None:
+        return []
+
+    low = low.to_integral_value(rounding=ROUND_FLOOR)
+    high = high.to_integral_value(rounding=ROUND_CEILING)
+    buckets = max(1, min(buckets, MAX_PRICE_BUCKETS))
+    width = max((high - low) / buckets, Decimal("1")).quantize(
+        Decimal("0.01"), rounding=ROUND_CEILING
+    )
+
+    edges = [low + width * i for i in range(buckets)]
+    counts = products.aggregate(
+        **{
+            f"b{i}": Count(
+                "pk",
+                filter=Q(price__gte=edge)
+                & (Q() if i == buckets - 1 else Q(price__lt=edge + width)),
+            )
+            for i, edge in enumerate(edges)
+        }
+    )
+    return [
+        {
+            "min": str(edge),
+            "max": str(edge + width),
+            "count": counts[f"b{i}"],
+        }
+        for i, edge in enumerate(edges)
+    ]
@@ -0,0 +1,267 @@
+"""
+Read-only fast path for serializing large listings.
+
+DRF spends most of a big page in per-row field machinery: SkipField
+handling, PKOnlyObject wrapping, callable checks on every attribute hop.
+serialize_many() walks the same serializer's readable fields once per
+call, turns each into a plain (reader, converter) pair, and then builds
+every row with nothing but attribute access and those converters.
+
+The output is the serializer's own: field order, omitted keys, None
+handling, Decimal quantizing and file URLs all follow DRF's rules, and
+anything it has no shortcut for is delegated to the field itself.
+`manage.py benchmark_serializers` checks the two paths byte for byte, and
+FastSerializerParityTests (api/tests.py) does the same for every endpoint
+that lists through here.
+
+A ListSerializer with its own to_representation must expose a
+`prepare(items)` hook doing its page-level work (see
+ProductListSerializer), otherwise the regular DRF path is used.
+"""
+
+from decimal import Decimal, getcontext
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.manager import BaseManager
+from rest_framework import fields, relations, serializers
+from rest_framework.fields import SkipField, is_simple_callable
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+_SKIP = object()
+
+_STRING_FIELDS = (
+    fields.CharField,
+    fields.EmailField,
+    fields.RegexField,
+    fields.SlugField,
+    fields.URLField,
+)
+
+
+def serialize_many(serializer_class, instances, context=None):
+    """Equivalent of serializer_class(instances, many=True, context=...).data."""
+    list_serializer = serializer_class(many=True, context=context or {})
+    items = list(instances.all() if isinstance(instances, BaseManager) else instances)
+
+    prepare = getattr(list_serializer, "prepare", None)
+    if prepare is not None:
+        prepare(items)
+    elif type(list_serializer).to_representation is not serializers.ListSerializer.to_representation:
+        return list_serializer.to_representation(items)
+
+    row = bind_serializer(list_serializer.child)
+    return [row(item) for item in items]
+
+
+def bind_serializer(serializer):
+    """Return a function instance -> dict for a (bound) serializer."""
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return serializer.to_representation
+
+    plan = [
+        (field.field_name, *_bind_field(serializer, field))
+        for field in serializer._readable_fields
+    ]
+
+    def row(instance):
+        ret = {}
+        for name, read, convert in plan:
+            value = read(instance)
+            if value is _SKIP:
+                continue
+            ret[name] = None if value is None else convert(value)
+        return ret
+
+    return row
+
+
+# ─── Readers ───────────────────────────────────────────────────────────────────
+
+
+def _attribute_reader(field):
+    attrs = field.source_attrs
+
+    def fallback(instance):
+        # Missing attribute, callable, mapping… let DRF decide (default,
+        # None, skip or error) exactly as it would have.
+        try:
+            return field.get_attribute(instance)
+        except SkipField:
+            return _SKIP
+
+    def read(instance):
+        value = instance
+        try:
+            for attr in attrs:
+                value = getattr(value, attr)
+                if callable(value) and is_simple_callable(value):
+                    return fallback(instance)
+        except ObjectDoesNotExist:
+            return None
+        except (KeyError, AttributeError):
+            return fallback(instance)
+        return value
+
+    return read
+
+
+def _fk_reader(serializer, field):
+    """PrimaryKeyRelatedField on a forward FK: read the `<name>_id` column."""
+    if len(field.source_attrs) != 1 or field.pk_field is not None:
+        return None
+    model = getattr(getattr(serializer, "Meta", None), "model", None)
+    try:
+        attname = model._meta.get_field(field.source_attrs[0]).attname
+    except Exception:
+        return None
+    if attname == field.source_attrs[0]:
+        return None  # not a relation column
+
+    def read(instance):
+        return getattr(instance, attname)
+
+    return read
+
+
+def _many_pk_reader(field):
+    base = _attribute_reader(field)
+
+    def read(instance):
+        if instance.pk is None:
+            return []
+        related = base(instance)
+        if related is _SKIP or related is None:
+            return related
+        return related.all() if hasattr(related, "all") else related
+
+    return read
+
+
+# ─── Converters ────────────────────────────────────────────────────────────────
+
+
+def _identity(value):
+    return value
+
+
+def _decimal_converter(field):
+    if field.decimal_places is None or field.normalize_output or field.localize:
+        return field.to_representation
+    coerce = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce:
+        return field.to_representation
+    quantum = Decimal(".1") ** field.decimal_places
+    rounding = field.rounding
+    context = None
+    if field.max_digits is not None:
+        context = getcontext().copy()
+        context.prec = field.max_digits
+    slow = field.to_representation
+
+    def convert(value):
+        if not isinstance(value, Decimal):
+            return slow(value)
+        return f"{value.quantize(quantum, rounding=rounding, context=context):f}"
+
+    return convert
+
+
+def _file_converter(field):
+    use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+    request = field.context.get("request")
+
+    def convert(value):
+        if not value:
+            return None
+        if not use_url:
+            return value.name
+        try:
+            url = value.url
+        except AttributeError:
+            return None
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+def _boolean_converter(field):
+    slow = field.to_representation
+
+    def convert(value):
+        return value if value is True or value is False else slow(value)
+
+    return convert
+
+
+def _choice_converter(field):
+    mapping = field.choice_strings_to_values
+
+    def convert(value):
+        if value == "":
+            return value
+        return mapping.get(str(value), value)
+
+    return convert
+
+
+def _bind_field(serializer, field):
+    if isinstance(field, serializers.SerializerMethodField):
+        return _identity, getattr(serializer, field.method_name)
+
+    if isinstance(field, serializers.ListSerializer):
+        if type(field).to_representation is not serializers.ListSerializer.to_representation:
+            return _attribute_reader(field), field.to_representation
+        child_row = bind_serializer(field.child)
+
+        def convert(value):
+            items = value.all() if isinstance(value, BaseManager) else value
+            return [child_row(item) for item in items]
+
+        return _attribute_reader(field), convert
+
+    if isinstance(field, serializers.BaseSerializer):
+        return _attribute_reader(field), bind_serializer(field)
+
+    if (
+        isinstance(field, relations.ManyRelatedField)
+        and type(field.child_relation) is relations.PrimaryKeyRelatedField
+        and field.child_relation.pk_field is None
+    ):
+        return _many_pk_reader(field), lambda items: [item.pk for item in items]
+
+    if type(field) is relations.PrimaryKeyRelatedField:
+        read = _fk_reader(serializer, field)
+        if read is not None:
+            return read, _identity
+
+    read = _attribute_reader(field)
+    if isinstance(field, fields.DecimalField):
+        return read, _decimal_converter(field)
+    if isinstance(field, fields.FileField):
+        return read, _file_converter(field)
+    if type(field) in _STRING_FIELDS:
+        return read, str
+    if type(field) is fields.IntegerField:
+        return read, int
+    if type(field) is fields.BooleanField:
+        return read, _boolean_converter(field)
+    if type(field) is fields.ChoiceField:
+        return read, _choice_converter(field)
+    return read, field.to_representation
+
+
+class FastListMixin:
+    """ListModelMixin.list() rendered through serialize_many."""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serialize_many(serializer_class, page, context)
+            )
+        return Response(serialize_many(serializer_class, queryset, context))
@@ -0,0 +1,173 @@
+"""
+`Idempotency-Key` support for POST endpoints that create orders or talk
+to a payment gateway.
+
+A client that retries with the same key gets the first response back
+instead of a second order or PaymentIntent. The key is claimed by
+inserting an IdempotencyRecord before the view runs; the unique
+(owner, key) constraint makes exactly one request win, and concurrent
+duplicates poll that row until the winner stores its response.
+
+Only 2xx responses are kept (for KEY_TTL). Errors release the key, so a
+client can fix the request or retry after a gateway failure.
+"""
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http.request import RawPostDataException
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+KEY_TTL = timedelta(hours=24)
+# A claim older than this belongs to a request that died mid-flight
+# (gateway calls time out well before).
+CLAIM_TIMEOUT = timedelta(seconds=60)
+WAIT_TIMEOUT = 10.0
+WAIT_POLL = 0.1
+
+
+def _request_hash(request):
+    try:
+        body = request.body
+    except RawPostDataException:
+        # Form posts already consumed by the CSRF check.
+        body = json.dumps(request.data, sort_keys=True, default=str).encode()
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _error(message, status_code, **headers):
+    response = Response({"error": message}, status=status_code)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def _replay(record):
+    response = Response(json.loads(record.response_body), status=record.status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _claim(request, key, request_hash):
+    """
+    Return (record, claimed). `claimed` is True when this request owns the
+    key and must run the view; otherwise `record` is someone else's.
+    """
+    now = timezone.now()
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(
+                    owner=request.user,
+                    key=key,
+                    endpoint=request.path,
+                    request_hash=request_hash,
+                    claimed_at=now,
+                    expires_at=now + KEY_TTL,
+                )
+            return record, True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyRecord.objects.filter(owner=request.user, key=key).first()
+        if record is None:
+            continue  # released or purged in between
+        if record.expires_at <= now:
+            IdempotencyRecord.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+            continue
+        if record.status_code is None and record.claimed_at <= now - CLAIM_TIMEOUT:
+            # Take over an abandoned claim; the conditional update keeps two
+            # waiters from both doing it.
+            taken = IdempotencyRecord.objects.filter(
+                pk=record.pk, status_code__isnull=True, claimed_at=record.claimed_at
+            ).update(claimed_at=now, request_hash=request_hash, endpoint=request.path)
+            if taken:
+                record.claimed_at = now
+                return record, True
+        return record, False
+
+
+def _wait_for_response(record):
+    """
+    Poll the winner's row. Returns it completed, None if the winner
+    released the key, or still pending after WAIT_TIMEOUT.
+    """
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_POLL)
+        record = IdempotencyRecord.objects.filter(pk=record.pk).first()
+        if record is None or record.status_code is not None:
+            break
+    return record
+
+
+def idempotent(view_func):
+    """
+    Honor the Idempotency-Key header on an authenticated view. Requests
+    without the header are passed through untouched.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER, "").strip()
+        if not key or not request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(
+                f"{HEADER} must be at most {MAX_KEY_LENGTH} characters.",
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_hash = _request_hash(request)
+        record, claimed = _claim(request, key, request_hash)
+
+        if not claimed:
+            if record.endpoint != request.path or record.request_hash != request_hash:
+                return _error(
+                    f"{HEADER} was already used for a different request.",
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is None:
+                record = _wait_for_response(record)
+                if record is None:
+                    # The first request failed and released the key.
+                    return wrapper(request, *args, **kwargs)
+                if record.status_code is None:
+                    return _error(
+                        "A request with this Idempotency-Key is still in progress.",
+                        status.HTTP_409_CONFLICT,
+                        **{"Retry-After": "1"},
+                    )
+            return _replay(record)
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            IdempotencyRecord.objects.filter(pk=record.pk).delete()
+            raise
+
+        data = getattr(response, "data", None)
+        if 200 <= response.status_code < 300 and data is not None:
+            IdempotencyRecord.objects.filter(pk=record.pk).update(
+                status_code=response.status_code,
+                response_body=JSONRenderer().render(data).decode(),
+            )
+        else:
+            IdempotencyRecord.objects.filter(pk=record.pk).delete()
+        return response
+
+    return wrapper
@@ -0,0 +1,151 @@
+"""
+KPI counters for the Unfold admin dashboard.
+
+The dashboard used to COUNT(*) products, users and orders and sum every
+payment on each visit. Instead, KPICounter rows hold the running totals
+and writers add deltas inside their own transaction:
+
+- active products, users and orders from model signals (api/signals.py);
+- lifetime revenue: the grand_total (after coupon discounts) of every
+  order in one of the rollups' COUNTED_STATUSES. An order adds it when
+  it enters those statuses and takes it back when it leaves them or is
+  deleted. Item writes move it by the order's refreshed items_total
+  (api/rollups.py), and order saves and deletes by the rest.
+
+Each KPI is spread over SHARDS rows and a delta goes to a random one, so
+a burst of checkouts does not queue on a single row lock. Writes that
+skip signals (bulk_create, queryset.update, raw fixtures) leave drift
+behind; `manage.py reconcile_kpis` recounts every KPI from the source
+tables and is meant to run nightly.
+
+The dashboard's recent-orders list is cached under the "orders" cache
+namespace, which api/signals.py bumps on every order save or delete.
+"""
+
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .cache_utils import get_namespace_versions
+from .models import KPICounter, Order, Product
+
+ACTIVE_PRODUCTS = "active_products"
+USERS = "users"
+ORDERS = "orders"
+REVENUE = "revenue"
+KPIS = (ACTIVE_PRODUCTS, USERS, ORDERS, REVENUE)
+SHARDS = 8
+
+RECENT_ORDERS = 5
+RECENT_ORDERS_TIMEOUT = 60 * 60
+
+
+# ─── Counters ──────────────────────────────────────────────────────────────────
+
+
+def bump(name, delta):
+    """Add `delta` to a KPI, in the caller's transaction."""
+    if not delta:
+        return
+    shard = random.randrange(SHARDS)
+    counter = KPICounter.objects.filter(name=name, shard=shard)
+    if counter.update(value=F("value") + delta):
+        return
+    try:
+        with transaction.atomic():
+            KPICounter.objects.create(name=name, shard=shard, value=delta)
+    except IntegrityError:
+        counter.update(value=F("value") + delta)  # created concurrently
+
+
+def kpi_values():
+    """{kpi: value} summed over the shards: at most len(KPIS) × SHARDS rows."""
+    values = dict.fromkeys(KPIS, Decimal("0"))
+    values.update(
+        KPICounter.objects.order_by()
+        .values("name")
+        .annotate(total=Sum("value"))
+        .values_list("name", "total")
+    )
+    return values
+
+
+def count_kpis():
+    """The KPIs counted from scratch (slow on big tables)."""
+    from .rollups import COUNTED_STATUSES  # rollups reports revenue through bump()
+
+    revenue = Order.objects.filter(status__in=COUNTED_STATUSES).aggregate(
+        total=Sum("grand_total")
+    )["total"]
+    return {
+        ACTIVE_PRODUCTS: Decimal(Product.objects.filter(is_active=True).count()),
+        USERS: Decimal(get_user_model().objects.count()),
+        ORDERS: Decimal(Order.objects.count()),
+        REVENUE: revenue or Decimal("0"),
+    }
+
+
+def counted_amounts(order_id):
+    """(grand_total, discount_amount) of an order while it is counted, else None."""
+    from .rollups import COUNTED_STATUSES
+
+    return (
+        Order.objects.filter(pk=order_id, status__in=COUNTED_STATUSES)
+        .values_list("grand_total", "discount_amount")
+        .first()
+    )
+
+
+@transaction.atomic
+def reconcile():
+    """
+    Reset every KPI to its recounted value. Returns {kpi: (stored, actual)}.
+    All shard rows are created and locked first, so deltas written
+    meanwhile are either in the recount or applied after it, never lost.
+    """
+    KPICounter.objects.bulk_create(
+        [KPICounter(name=name, shard=shard) for name in KPIS for shard in range(SHARDS)],
+        ignore_conflicts=True,
+    )
+    list(KPICounter.objects.filter(name__in=KPIS).select_for_update())
+    stored = kpi_values()
+    actual = count_kpis()
+    for name in KPIS:
+        KPICounter.objects.filter(name=name).update(value=0)
+        KPICounter.objects.filter(name=name, shard=0).update(value=actual[name])
+    return {name: (stored[name], actual[name]) for name in KPIS}
+
+
+# ─── Recent orders ─────────────────────────────────────────────────────────────
+
+
+def recent_orders():
+    """The newest orders for the dashboard, cached until an order is written."""
+    if not getattr(settings, "ENABLE_CACHING", True):
+        return _recent_orders()
+    version = get_namespace_versions(["orders"])["orders"]
+    key = f"dashboard:recent_orders:{version}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = _recent_orders()
+        cache.set(key, rows, RECENT_ORDERS_TIMEOUT)
+    return rows
+
+
+def _recent_orders():
+    return [
+        {
+            "id": order.id,
+            "owner": order.owner.username if order.owner else "—",
+            "status": order.status,
+            "created_at": order.created_at.strftime("%Y-%m-%d %H:%M"),
+        }
+        for order in Order.objects.select_related("owner").order_by("-created_at")[
+            :RECENT_ORDERS
+        ]
+    ]
@@ -0,0 +1,34 @@
+"""
+Recompute the persisted order totals (items_total, grand_total).
+
+Usage:
+    python manage.py backfill_order_totals
+    python manage.py backfill_order_totals --batch-size 5000
+
+Migration 0018 fills them once; afterwards they are kept in sync by
+signals (see api/signals.py). Run this after writes that bypass model
+saves, e.g. OrderItem.objects.bulk_create() or queryset.update().
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.models import Order
+from api.orders import refresh_order_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute persisted order totals from their items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        order_ids = list(Order.objects.order_by("pk").values_list("pk", flat=True))
+
+        updated = 0
+        for start in range(0, len(order_ids), batch_size):
+            batch = order_ids[start : start + batch_size]
+            updated += refresh_order_totals(Order.objects.filter(pk__in=batch))
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} order(s)."))
@@ -0,0 +1,204 @@
+"""
+Compare DRF serializers with the read-only fast path (api/fast_serializers.py).
+
+Usage:
+    python manage.py benchmark_serializers
+    python manage.py benchmark_serializers --sizes 10 100 1000 --repeat 20
+
+Builds a synthetic catalog and order history inside a transaction that is
+rolled back afterwards, then times both paths on already-fetched rows (so
+only serialization is measured, plus the page-level offer lookup both
+paths share) and checks that they render byte-identical JSON.
+"""
+
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import serialize_many
+from api.models import (
+    CarouselImg,
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    ProductImage,
+    SellerOffer,
+    SellerProfile,
+    Tag,
+)
+from api.serializer import (
+    CarouselImgSerializer,
+    CategorySerializer,
+    OrderSerializer,
+    ProductSerializer,
+    TagsSerializer,
+)
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark DRF serializers against the fast read-only path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["sizes"])
+        self.repeat = max(1, options["repeat"])
+        self.mismatches = 0
+        try:
+            with transaction.atomic():
+                self.seed(sizes[-1])
+                self.run(sizes)
+                raise Rollback
+        except Rollback:
+            pass
+        if self.mismatches:
+            raise CommandError(f"{self.mismatches} listing(s) rendered differently.")
+
+    # ─── Fixtures ─────────────────────────────────────────────────────────────
+
+    def seed(self, count):
+        users = User.objects.bulk_create(
+            User(username=f"bench-{i}", email=f"bench-{i}@example.com")
+            for i in range(count)
+        )
+        sellers = SellerProfile.objects.bulk_create(
+            SellerProfile(
+                user=users[i],
+                business_name=f"Bench Seller {i}",
+                contact_phone="0100000000",
+                contact_email=f"bench-{i}@example.com",
+                avatar=f"sellers/avatars/bench-{i}.jpg" if i % 2 else "",
+            )
+            for i in range(5)
+        )
+        categories = Category.objects.bulk_create(
+            Category(name=f"Bench C{i}", slug=f"bench-c{i}") for i in range(count)
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f"Bench T{i}", slug=f"bench-t{i}") for i in range(count)
+        )
+        CarouselImg.objects.bulk_create(
+            CarouselImg(name=f"Bench slide {i}", image=f"carousel/bench-{i}.jpg", order=i)
+            for i in range(count)
+        )
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"Bench product {i}",
+                slug=f"bench-product-{i}",
+                description="Benchmark fixture",
+                price=Decimal("10.00") + i,
+                image=f"products/bench-{i}.jpg",
+                category=categories[i % 10],
+                # Every seventh product has no seller: exercises omitted keys.
+                seller=None if i % 7 == 0 else sellers[i % len(sellers)],
+            )
+            for i in range(count)
+        )
+        Product.tags.through.objects.bulk_create(
+            Product.tags.through(product=product, tag=tags[(i + k) % 10])
+            for i, product in enumerate(products)
+            for k in range(3)
+        )
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f"products/gallery/bench-{i}-{k}.jpg")
+            for i, product in enumerate(products)
+            for k in range(2)
+        )
+        SellerOffer.objects.bulk_create(
+            [
+                SellerOffer(seller=sellers[1], title="Bench sale", discount_percent=15),
+                SellerOffer(
+                    seller=sellers[2],
+                    product=products[2],
+                    title="Bench deal",
+                    discount_percent=Decimal("12.5"),
+                ),
+            ]
+        )
+        orders = Order.objects.bulk_create(
+            Order(owner=users[i % len(users)], shipping_address="Bench street")
+            for i in range(count)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product=products[(i + k) % len(products)],
+                quantity=k + 1,
+                unit_price=Decimal("10.00") + k,
+                subtotal=(Decimal("10.00") + k) * (k + 1),
+            )
+            for i, order in enumerate(orders)
+            for k in range(3)
+        )
+
+    # ─── Benchmark ────────────────────────────────────────────────────────────
+
+    def listings(self):
+        return [
+            (
+                "product",
+                ProductSerializer,
+                Product.objects.filter(name__startswith="Bench ")
+                .select_related("seller")
+                .prefetch_related("tags", "gallery_images"),
+            ),
+            ("category", CategorySerializer, Category.objects.filter(name__startswith="Bench ")),
+            ("tag", TagsSerializer, Tag.objects.filter(name__startswith="Bench ")),
+            (
+                "carousel",
+                CarouselImgSerializer,
+                CarouselImg.objects.filter(name__startswith="Bench "),
+            ),
+            (
+                "order",
+                OrderSerializer,
+                Order.objects.filter(shipping_address="Bench street")
+                .select_related("owner", "payment")
+                .prefetch_related("items__product"),
+            ),
+        ]
+
+    def time(self, func):
+        best = float("inf")
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def run(self, sizes):
+        renderer = JSONRenderer()
+        self.stdout.write(
+            f"{'listing':<10}{'rows':>6}{'drf ms':>10}{'fast ms':>10}{'speedup':>9}  output"
+        )
+        for name, serializer_class, queryset in self.listings():
+            for size in sizes:
+                rows = list(queryset.order_by("pk")[:size])
+                drf = serializer_class(rows, many=True).data
+                fast = serialize_many(serializer_class, rows)
+                identical = renderer.render(drf) == renderer.render(fast)
+                if not identical:
+                    self.mismatches += 1
+
+                drf_ms = self.time(lambda: serializer_class(rows, many=True).data)
+                fast_ms = self.time(lambda: serialize_many(serializer_class, rows))
+                verdict = (
+                    self.style.SUCCESS("identical") if identical else self.style.ERROR("DIFFERS")
+                )
+                self.stdout.write(
+                    f"{name:<10}{len(rows):>6}{drf_ms:>10.2f}{fast_ms:>10.2f}"
+                    f"{drf_ms / fast_ms:>8.1f}x  {verdict}"
+                )
@@ -0,0 +1,47 @@
+"""
+Apply stored payment-gateway webhooks (see api/webhooks.py).
+
+Usage:
+    python manage.py drain_webhooks                 # one pass, then exit
+    python manage.py drain_webhooks --loop          # keep polling (worker)
+    python manage.py drain_webhooks --batch-size 200 --sleep 1
+
+Several workers may run at once: on PostgreSQL each batch is claimed
+with SELECT ... FOR UPDATE SKIP LOCKED.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.webhooks import drain
+
+
+class Command(BaseCommand):
+    help = "Process pending webhook events with retries and backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--loop", action="store_true", help="Run until interrupted.")
+        parser.add_argument(
+            "--sleep", type=float, default=2.0, help="Idle wait between polls with --loop."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            processed = failed = 0
+            # Drain everything that is due before sleeping.
+            while True:
+                ok, errors = drain(batch_size)
+                processed += ok
+                failed += errors
+                if ok + errors < batch_size:
+                    break
+            if processed or failed or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Processed {processed} event(s), {failed} failed.")
+                )
+            if not options["loop"]:
+                return
+            time.sleep(options["sleep"])
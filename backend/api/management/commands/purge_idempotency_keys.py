@@ -0,0 +1,22 @@
+"""
+Delete expired Idempotency-Key records (see api/idempotency.py).
+
+Usage:
+    python manage.py purge_idempotency_keys
+
+Expired keys are already ignored and overwritten on reuse; this keeps the
+table small. Safe to run from cron at any frequency.
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired record(s)."))
@@ -0,0 +1,34 @@
+"""
+Rebuild the denormalized product cards used by public listings.
+
+Usage:
+    python manage.py rebuild_product_cards
+    python manage.py rebuild_product_cards --batch-size 1000
+
+Run once before enabling SERVE_PRODUCT_CARDS, and after bulk imports that
+bypass model saves (queryset.update(), raw SQL). Day to day the cards are
+kept current by signals (see api/signals.py).
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.cards import refresh_cards
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product card read model from the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        product_ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+
+        for start in range(0, len(product_ids), batch_size):
+            refresh_cards(product_ids[start : start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {len(product_ids)} product card(s).")
+        )
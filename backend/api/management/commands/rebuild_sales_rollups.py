@@ -0,0 +1,51 @@
+"""
+Recompute the daily sales rollups from the orders (see api/rollups.py).
+
+Usage:
+    python manage.py rebuild_sales_rollups                         # all history
+    python manage.py rebuild_sales_rollups --since 2026-03-01
+    python manage.py rebuild_sales_rollups --since 2026-03-01 --until 2026-03-31
+
+Signals keep the rollups current; run this after writes that bypass model
+saves (bulk_create(), queryset.update()) or to repair a range. Every
+chunk of days is rebuilt in its own transaction, so it is safe to run
+while orders come in.
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from api.models import Order
+from api.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily product and seller sales rollups for a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="First day (YYYY-MM-DD).")
+        parser.add_argument("--until", type=date.fromisoformat, help="Last day, default today.")
+        parser.add_argument("--chunk-days", type=int, default=31)
+
+    def handle(self, *args, **options):
+        until = options["until"] or timezone.localdate()
+        since = options["since"]
+        if since is None:
+            first_order = Order.objects.aggregate(first=Min("created_at"))["first"]
+            since = timezone.localdate(first_order) if first_order else until
+        if since > until:
+            raise CommandError("--since must not be after --until.")
+
+        chunk = timedelta(days=max(options["chunk_days"], 1))
+        written, start = 0, since
+        while start <= until:
+            end = min(start + chunk - timedelta(days=1), until)
+            written += rebuild(start, end)
+            start = end + timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} rollup row(s) for {since} to {until}.")
+        )
@@ -0,0 +1,33 @@
+"""
+Rebuild the product full-text search index.
+
+Usage:
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --batch-size 1000
+
+Normally the index is kept current by signals (see api/signals.py); run
+this after bulk imports that bypass model saves, e.g. queryset.update().
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.models import Product
+from api.search import index_products
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        product_ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+
+        for start in range(0, len(product_ids), batch_size):
+            index_products(product_ids[start : start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {len(product_ids)} product(s).")
+        )
@@ -0,0 +1,30 @@
+"""
+Recount the admin dashboard KPI counters from the source tables (see api/kpis.py).
+
+Usage:
+    python manage.py reconcile_kpis
+
+Signals keep the counters current; writes that bypass them (bulk_create(),
+queryset.update(), loaddata) leave drift, which this resets. Meant to run
+nightly from cron, e.g.:
+
+    30 3 * * *  cd /app/backend && python manage.py reconcile_kpis
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.kpis import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount the dashboard KPI counters and fix any drift."
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for name, (stored, actual) in reconcile().items():
+            if stored != actual:
+                drifted += 1
+                self.stdout.write(f"{name}: {stored} -> {actual}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled KPI counters, {drifted} had drifted.")
+        )
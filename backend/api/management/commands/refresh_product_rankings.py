@@ -0,0 +1,26 @@
+"""
+Recompute the precomputed top-product rankings (see api/rankings.py).
+
+Usage:
+    python manage.py refresh_product_rankings
+
+Reads the daily sales rollups, so it is cheap to run often. Meant to run
+hourly from cron, e.g.:
+
+    5 * * * *  cd /app/backend && python manage.py refresh_product_rankings
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.rankings import WINDOWS, refresh_rankings
+
+
+class Command(BaseCommand):
+    help = "Refresh the per-window top-product rankings from the sales rollups."
+
+    def handle(self, *args, **options):
+        written = refresh_rankings()
+        windows = ", ".join(str(days) for days in WINDOWS)
+        self.stdout.write(
+            self.style.SUCCESS(f"Ranked {written} product(s) over {windows}-day windows.")
+        )
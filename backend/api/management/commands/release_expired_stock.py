@@ -0,0 +1,30 @@
+"""
+Return stock held by abandoned checkouts (see api/stock.py).
+
+Usage:
+    python manage.py release_expired_stock
+
+Pending reservations past their expiry are released and their units put
+back on the counters. Checkouts also do this on demand for a product
+that runs short, so this only has to run every few minutes from cron.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = "Release expired stock reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        released = 0
+        while True:
+            count = release_expired(limit=options["batch_size"])
+            released += count
+            if count < options["batch_size"]:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Released {released} reservation(s)."))
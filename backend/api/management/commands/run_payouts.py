@@ -0,0 +1,54 @@
+"""
+Send pending seller payouts as Stripe transfers (see api/payouts.py).
+
+Usage:
+    python manage.py run_payouts                      # one pass, then exit
+    python manage.py run_payouts --loop               # keep polling (worker)
+    python manage.py run_payouts --batch-size 200 --concurrency 8
+
+Each pass reports paid/failed counts and throughput in transfers per
+second; with --loop the same line is logged for every busy pass.
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.payouts import DEFAULT_CONCURRENCY, run_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send pending seller payouts with bounded concurrency and retries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+        parser.add_argument("--loop", action="store_true", help="Run until interrupted.")
+        parser.add_argument(
+            "--sleep", type=float, default=5.0, help="Idle wait between polls with --loop."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            paid = failed = 0
+            elapsed = 0.0
+            while True:
+                ok, errors, seconds = run_batch(batch_size, options["concurrency"])
+                paid += ok
+                failed += errors
+                elapsed += seconds
+                if ok + errors < batch_size:
+                    break
+
+            if paid or failed or not options["loop"]:
+                rate = (paid + failed) / elapsed if elapsed else 0.0
+                summary = f"Paid {paid}, failed {failed} in {elapsed:.2f}s ({rate:.1f} transfers/s)."
+                logger.info(summary)
+                self.stdout.write(self.style.SUCCESS(summary))
+            if not options["loop"]:
+                return
+            time.sleep(options["sleep"])
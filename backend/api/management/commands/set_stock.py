@@ -0,0 +1,50 @@
+"""
+Set how many units of a product are available (see api/stock.py).
+
+Usage:
+    python manage.py set_stock 42 100             # one counter row
+    python manage.py set_stock 42 5000 --hot      # flash sale: sharded counters
+    python manage.py set_stock 42 5000 --shards 16
+    python manage.py set_stock 42 0 --untrack     # stop tracking stock
+
+The quantity excludes units held by pending reservations; those go back
+to the counters if they are released or expire.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Product
+from api.stock import HOT_PRODUCT_SHARDS, set_stock, stock_levels
+
+
+class Command(BaseCommand):
+    help = "Set the available stock of a product."
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_id", type=int)
+        parser.add_argument("quantity", type=int)
+        shards = parser.add_mutually_exclusive_group()
+        shards.add_argument("--shards", type=int, default=1)
+        shards.add_argument(
+            "--hot", action="store_const", dest="shards", const=HOT_PRODUCT_SHARDS,
+            help=f"Spread the stock over {HOT_PRODUCT_SHARDS} counter rows.",
+        )
+        shards.add_argument("--untrack", action="store_const", dest="shards", const=0)
+
+    def handle(self, *args, **options):
+        if options["quantity"] < 0:
+            raise CommandError("Quantity cannot be negative.")
+        if not Product.objects.filter(pk=options["product_id"]).exists():
+            raise CommandError(f"Product {options['product_id']} does not exist.")
+
+        set_stock(options["product_id"], options["quantity"], options["shards"])
+        if options["shards"]:
+            level = stock_levels([options["product_id"]])[options["product_id"]]
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Product {options['product_id']}: {level} unit(s) in "
+                    f"{options['shards']} counter(s)."
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Product {options['product_id']} is no longer stock-tracked."))
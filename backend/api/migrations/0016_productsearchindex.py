@@ -0,0 +1,148 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TABLE = "api_productsearchindex"
+FTS_TABLE = "api_productsearchindex_fts"
+
+POSTGRES_FORWARDS = [
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(keywords, '')), 'B') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    f"CREATE INDEX {TABLE}_vector_gin ON {TABLE} USING GIN (search_vector)",
+]
+
+SQLITE_FORWARDS = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, keywords, body,
+        content='{TABLE}', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, keywords, body)
+        VALUES (new.product_id, new.name, new.keywords, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, keywords, body)
+        VALUES ('delete', old.product_id, old.name, old.keywords, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, keywords, body)
+        VALUES ('delete', old.product_id, old.name, old.keywords, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, name, keywords, body)
+        VALUES (new.product_id, new.name, new.keywords, new.body);
+    END
+    """,
+]
+
+SQLITE_BACKWARDS = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def create_vendor_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = POSTGRES_FORWARDS
+    elif vendor == "sqlite":
+        statements = SQLITE_FORWARDS
+    else:
+        return  # other backends fall back to icontains in api.search
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_vendor_index(apps, schema_editor):
+    # The Postgres column and index go away with the table itself.
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in SQLITE_BACKWARDS:
+            schema_editor.execute(sql)
+
+
+def backfill_documents(apps, schema_editor):
+    from unidecode import unidecode
+
+    Product = apps.get_model("api", "Product")
+    ProductSearchIndex = apps.get_model("api", "ProductSearchIndex")
+
+    products = Product.objects.select_related("category", "seller").prefetch_related(
+        "tags"
+    )
+    docs = []
+    for product in products.iterator(chunk_size=500):
+        # Same document as api.search.build_document() (copied, as
+        # migrations must not depend on app code that may change).
+        keywords = []
+        transliterated = unidecode(product.name)
+        if transliterated != product.name:
+            keywords.append(transliterated)
+        if product.category:
+            keywords.append(product.category.name)
+        keywords.extend(tag.name for tag in product.tags.all())
+        if product.seller:
+            keywords.append(product.seller.business_name)
+        docs.append(
+            ProductSearchIndex(
+                product_id=product.pk,
+                name=product.name,
+                keywords=" ".join(keywords),
+                body=product.description,
+            )
+        )
+    ProductSearchIndex.objects.bulk_create(docs, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_payment_method_payment_provider_payment_id_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSearchIndex",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="api.product",
+                    ),
+                ),
+                ("name", models.TextField(blank=True)),
+                (
+                    "keywords",
+                    models.TextField(
+                        blank=True, help_text="Category, tag and seller names."
+                    ),
+                ),
+                ("body", models.TextField(blank=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Product Search Index",
+                "verbose_name_plural": "Product Search Index",
+            },
+        ),
+        migrations.RunPython(create_vendor_index, drop_vendor_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
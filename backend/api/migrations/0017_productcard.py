@@ -0,0 +1,81 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_productsearchindex"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductCard",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="card",
+                        serialize=False,
+                        to="api.product",
+                    ),
+                ),
+                (
+                    "is_listed",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Active, approved and not owned by a suspended seller.",
+                    ),
+                ),
+                ("name", models.CharField(max_length=70)),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("created_at", models.DateTimeField()),
+                ("payload", models.TextField()),
+                (
+                    "price_valid_until",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Next offer start/expiry that changes effective_price.",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="api.category",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Product Card",
+                "verbose_name_plural": "Product Cards",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["is_listed", "-created_at"],
+                        name="api_product_is_list_77d7b8_idx",
+                    ),
+                    models.Index(
+                        fields=["is_listed", "price"],
+                        name="api_product_is_list_816154_idx",
+                    ),
+                    models.Index(
+                        fields=["is_listed", "name"],
+                        name="api_product_is_list_36a154_idx",
+                    ),
+                    models.Index(
+                        fields=["category"], name="api_product_categor_f39df7_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:23
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model("api", "Order")
+    OrderItem = apps.get_model("api", "OrderItem")
+    items_total = Coalesce(
+        Subquery(
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(total=Sum("subtotal"))
+            .values("total")
+        ),
+        Value(Decimal("0")),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+    Order.objects.update(
+        items_total=items_total, grand_total=items_total - F("discount_amount")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_productcard"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="grand_total",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                help_text="items_total minus discount_amount.",
+                max_digits=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="items_total",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                help_text="Sum of item subtotals, kept in sync by api/signals.py.",
+                max_digits=10,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["grand_total"], name="api_order_grand_t_865ba3_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
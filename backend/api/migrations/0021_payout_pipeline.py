@@ -0,0 +1,47 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_webhook_events"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sellerpayoutrecord",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="sellerpayoutrecord",
+            name="last_error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="sellerpayoutrecord",
+            name="next_attempt_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="sellerpayoutrecord",
+            name="stripe_transfer_id",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="sellerpayoutrecord",
+            index=models.Index(
+                fields=["status", "next_attempt_at"],
+                name="api_sellerp_status_61684e_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="sellerpayoutrecord",
+            constraint=models.UniqueConstraint(
+                fields=("seller", "order"), name="unique_payout_per_seller_order"
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_usage(apps, schema_editor):
+    OrderCoupon = apps.get_model("api", "OrderCoupon")
+    CouponUsage = apps.get_model("api", "CouponUsage")
+    rows = (
+        OrderCoupon.objects.filter(order__owner__isnull=False)
+        .order_by()
+        .values("coupon", "order__owner")
+        .annotate(uses=Count("pk"))
+    )
+    CouponUsage.objects.bulk_create(
+        (
+            CouponUsage(
+                coupon_id=row["coupon"], user_id=row["order__owner"], times_used=row["uses"]
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0021_payout_pipeline"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CouponUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("times_used", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "coupon",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="usages",
+                        to="api.coupon",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="coupon_usages",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("coupon", "user"), name="unique_coupon_usage_per_user"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
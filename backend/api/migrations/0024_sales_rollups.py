@@ -0,0 +1,141 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+COUNTED_STATUSES = ["confirmed", "processing", "shipped", "delivered"]
+
+
+def backfill_rollups(apps, schema_editor):
+    OrderItem = apps.get_model("api", "OrderItem")
+    DailyProductSales = apps.get_model("api", "DailyProductSales")
+    DailySellerSales = apps.get_model("api", "DailySellerSales")
+
+    items = OrderItem.objects.filter(
+        order__status__in=COUNTED_STATUSES, product__isnull=False
+    ).annotate(day=TruncDate("order__created_at", tzinfo=timezone.get_current_timezone()))
+    sums = {
+        "units": Sum("quantity"),
+        "revenue": Sum("subtotal"),
+        "platform_fee": Sum("platform_fee"),
+        "seller_payout": Sum("seller_payout"),
+    }
+    products = items.order_by().values("day", "product_id").annotate(**sums)
+    DailyProductSales.objects.bulk_create(
+        (DailyProductSales(**row) for row in products.iterator()), batch_size=1000
+    )
+    sellers = (
+        items.filter(product__seller__isnull=False)
+        .annotate(seller_id=F("product__seller_id"))
+        .order_by()
+        .values("day", "seller_id")
+        .annotate(orders=Count("order", distinct=True), **sums)
+    )
+    DailySellerSales.objects.bulk_create(
+        (DailySellerSales(**row) for row in sellers.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_stock"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyProductSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "platform_fee",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "seller_payout",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="api.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily Product Sales",
+                "verbose_name_plural": "Daily Product Sales",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "product"), name="unique_daily_product_sales"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailySellerSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("orders", models.IntegerField(default=0)),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "platform_fee",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "seller_payout",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "seller",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="api.sellerprofile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily Seller Sales",
+                "verbose_name_plural": "Daily Seller Sales",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "seller"), name="unique_daily_seller_sales"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:51
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+COUNTED_STATUSES = ["confirmed", "processing", "shipped", "delivered"]
+
+
+def backfill_counters(apps, schema_editor):
+    KPICounter = apps.get_model("api", "KPICounter")
+    Product = apps.get_model("api", "Product")
+    Order = apps.get_model("api", "Order")
+    OrderItem = apps.get_model("api", "OrderItem")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    revenue = OrderItem.objects.filter(order__status__in=COUNTED_STATUSES).aggregate(
+        total=Sum("subtotal")
+    )["total"]
+    values = {
+        "active_products": Product.objects.filter(is_active=True).count(),
+        "users": User.objects.count(),
+        "orders": Order.objects.count(),
+        "revenue": revenue or 0,
+    }
+    KPICounter.objects.bulk_create(
+        [KPICounter(name=name, shard=0, value=value) for name, value in values.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0024_sales_rollups"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="KPICounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                ("shard", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+            ],
+            options={
+                "verbose_name": "KPI Counter",
+                "verbose_name_plural": "KPI Counters",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("name", "shard"), name="unique_kpi_counter_shard"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0025_kpi_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSalesRank",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "window",
+                    models.PositiveSmallIntegerField(
+                        help_text="Days, ending on the refresh day."
+                    ),
+                ),
+                (
+                    "rank",
+                    models.PositiveIntegerField(
+                        help_text="1 = highest revenue in the window."
+                    ),
+                ),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "category",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        help_text="The product's category at refresh time.",
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="api.category",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sales_ranks",
+                        to="api.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Product Sales Rank",
+                "verbose_name_plural": "Product Sales Ranks",
+                "indexes": [
+                    models.Index(
+                        fields=["window", "rank"], name="api_product_window_132875_idx"
+                    ),
+                    models.Index(
+                        fields=["window", "category", "rank"],
+                        name="api_product_window_98cc8a_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("window", "product"), name="unique_sales_rank"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.15 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0026_product_sales_ranks"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="selleroffer",
+            index=models.Index(
+                fields=["is_active", "starts_at"], name="api_sellero_is_acti_d5a871_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="selleroffer",
+            index=models.Index(
+                fields=["is_active", "expires_at"],
+                name="api_sellero_is_acti_b8e283_idx",
+            ),
+        ),
+    ]
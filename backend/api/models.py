@@ -1,11 +1,14 @@
+import time
 import uuid
 from decimal import Decimal
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from PIL import Image
 from unidecode import unidecode
@@ -92,15 +95,58 @@ class Coupon(models.Model):
         if self.max_uses_total is not None and self.times_used >= self.max_uses_total:
             return False, "Coupon usage limit reached."
         if user and user.is_authenticated:
-            from django.db.models import Count
-            uses = OrderCoupon.objects.filter(coupon=self, order__owner=user).count()
-            if uses >= self.max_uses_per_user:
+            if self.uses_by(user) >= self.max_uses_per_user:
                 return False, "You have already used this coupon."
         if order_total is not None and self.min_order_amount is not None:
             if order_total < self.min_order_amount:
                 return False, f"Minimum order amount is ${self.min_order_amount}."
         return True, "Valid."
 
+    def uses_by(self, user):
+        """How many times `user` has redeemed this coupon (one indexed row)."""
+        return (
+            CouponUsage.objects.filter(coupon=self, user=user)
+            .values_list("times_used", flat=True)
+            .first()
+            or 0
+        )
+
+    def redeem(self, user=None, enforce_limits=True):
+        """
+        Count one use of the coupon, atomically. Returns (redeemed, message).
+
+        Both limits are enforced by conditional UPDATEs, so concurrent
+        checkouts cannot push times_used past max_uses_total or a user past
+        max_uses_per_user. The global counter is bumped last: when called
+        inside a larger transaction it keeps the hot coupon row locked for
+        as short a time as possible. `enforce_limits=False` only counts
+        (for a discount the customer has already been charged).
+        """
+        try:
+            with transaction.atomic():
+                if user is not None and user.is_authenticated:
+                    CouponUsage.objects.get_or_create(coupon=self, user=user)
+                    usage = CouponUsage.objects.filter(coupon=self, user=user)
+                    if enforce_limits:
+                        usage = usage.filter(times_used__lt=self.max_uses_per_user)
+                    if not usage.update(
+                        times_used=models.F("times_used") + 1, updated_at=timezone.now()
+                    ):
+                        raise CouponUnavailable("You have already used this coupon.")
+
+                coupon = Coupon.objects.filter(pk=self.pk)
+                if enforce_limits:
+                    coupon = coupon.filter(
+                        models.Q(max_uses_total__isnull=True)
+                        | models.Q(times_used__lt=models.F("max_uses_total"))
+                    )
+                if not coupon.update(times_used=models.F("times_used") + 1):
+                    raise CouponUnavailable("Coupon usage limit reached.")
+        except CouponUnavailable as e:
+            return False, str(e)
+        self.times_used += 1
+        return True, "Redeemed."
+
     def calculate_discount(self, subtotal):
         if self.discount_type == self.DiscountType.FIXED:
             return min(self.discount_value, subtotal)
@@ -111,6 +157,37 @@ class Coupon(models.Model):
             return discount.quantize(Decimal("0.01"))
 
 
+class CouponUnavailable(Exception):
+    pass
+
+
+class CouponUsage(models.Model):
+    """
+    Per-user redemption counter for a coupon, so the max_uses_per_user
+    check is a single-row lookup instead of counting OrderCoupons through
+    their orders.
+    """
+
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name="usages")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="coupon_usages",
+    )
+    times_used = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coupon", "user"], name="unique_coupon_usage_per_user"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon.code} used {self.times_used}× by user #{self.user_id}"
+
+
 class SellerOffer(models.Model):
     class OfferType(models.TextChoices):
         PRODUCT = "product", "Product Offer"
@@ -160,6 +237,11 @@ class SellerOffer(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # offer_clock() and next_price_changes() range-scan these
+            models.Index(fields=["is_active", "starts_at"]),
+            models.Index(fields=["is_active", "expires_at"]),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_offer_type_display()}) - {self.seller}"
@@ -217,8 +299,22 @@ class SellerPayoutRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     paid_at = models.DateTimeField(null=True, blank=True)
 
+    # Transfer bookkeeping for `manage.py run_payouts` (see api/payouts.py)
+    stripe_transfer_id = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["seller", "order"], name="unique_payout_per_seller_order"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
 
     def __str__(self):
         return f"Payout for Order #{self.order_id} to {self.seller.business_name}"
@@ -305,10 +401,13 @@ class SellerProfile(models.Model):
     def is_approved(self):
         return self.verification_status == self.VerificationStatus.APPROVED
  
-    def effective_commission_rate(self):
+    def effective_commission_rate(self, default_rate=None):
+        """`default_rate` lets batch callers skip the PlatformSettings lookup."""
         if self.commission_rate is not None:
             return self.commission_rate
-        settings_obj = PlatformSettings.get_solo()
+        if default_rate is not None:
+            return default_rate
+        settings_obj = PlatformSettings.cached()
         return settings_obj.default_commission_rate
  
  
@@ -322,7 +421,7 @@ class PlatformSettings(models.Model):
     default_commission_rate = models.DecimalField(
         max_digits=5,
         decimal_places=2,
-        default=10.00,
+        default=Decimal("10.00"),
         validators=[MinValueValidator(0), MaxValueValidator(100)],
     )
     auto_approve_products = models.BooleanField(
@@ -335,14 +434,49 @@ class PlatformSettings(models.Model):
         verbose_name = "Platform Settings"
         verbose_name_plural = "Platform Settings"
  
+    # cached() keeps the row in process memory. Every CACHE_TTL seconds it
+    # compares a version stamp in the shared cache, bumped on save, and
+    # reloads only when that moved — or after CACHE_MAX_AGE regardless, which
+    # bounds staleness when the cache backend is per-process (LocMem).
+    CACHE_TTL = 1.0
+    CACHE_MAX_AGE = 60.0
+    VERSION_KEY = "platform_settings:version"
+    _cached = None  # (instance, version, checked_at, loaded_at)
+
     def save(self, *args, **kwargs):
         self.pk = 1
         super().save(*args, **kwargs)
- 
+        transaction.on_commit(type(self).bump_version)
+
     @classmethod
     def get_solo(cls):
         obj, _ = cls.objects.get_or_create(pk=1)
         return obj
+
+    @classmethod
+    def bump_version(cls):
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, time.time_ns() // 1000, None)
+        cls._cached = None
+
+    @classmethod
+    def cached(cls):
+        """Read-only settings for hot paths; no query while the copy is current."""
+        now = time.monotonic()
+        entry = cls._cached
+        if entry and now - entry[2] < cls.CACHE_TTL:
+            return entry[0]
+
+        version = cache.get(cls.VERSION_KEY)
+        if entry and entry[1] == version and now - entry[3] < cls.CACHE_MAX_AGE:
+            cls._cached = (entry[0], version, now, entry[3])
+            return entry[0]
+
+        obj = cls.get_solo()
+        cls._cached = (obj, version, now, now)
+        return obj
  
     def __str__(self):
         return "Platform Settings"
@@ -712,6 +846,168 @@ class ProductImage(models.Model, ImageHandlingMixin):
             self.optimize_image()
 
 
+class StockCounter(models.Model):
+    """
+    Units of a product available for sale (see api/stock.py).
+
+    Products without counters are not stock-tracked. A normal product has
+    one counter; a hot product's stock is split over several shards so
+    concurrent checkouts update different rows instead of queueing on one
+    row lock.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_counters"
+    )
+    shard = models.PositiveSmallIntegerField(default=0)
+    available = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Stock Counter"
+        verbose_name_plural = "Stock Counters"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "shard"], name="unique_stock_counter_shard"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.available} × product #{self.product_id} (shard {self.shard})"
+
+
+class StockReservation(models.Model):
+    """
+    Units taken from a StockCounter for a checkout. Pending reservations
+    are either committed with their order or returned to the counter
+    when released or once `expires_at` has passed.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        COMMITTED = "committed", "Committed"
+        RELEASED = "released", "Released"
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_reservations"
+    )
+    shard = models.PositiveSmallIntegerField(default=0)
+    quantity = models.PositiveIntegerField()
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_reservations",
+    )
+    order = models.ForeignKey(
+        "Order",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_reservations",
+    )
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Stock Reservation"
+        verbose_name_plural = "Stock Reservations"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} × product #{self.product_id} ({self.get_status_display()})"
+
+
+class ProductSearchIndex(models.Model):
+    """
+    Flattened search document for a product (see api/search.py).
+
+    Lives in its own table so the vendor-specific index can be built over
+    it: on PostgreSQL a generated, weighted `search_vector` tsvector column
+    with a GIN index; on SQLite an FTS5 shadow table kept in sync by
+    triggers. Both are created in migration 0016, not declared here.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_index",
+    )
+    name = models.TextField(blank=True)
+    keywords = models.TextField(
+        blank=True, help_text="Category, tag and seller names."
+    )
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Product Search Index"
+        verbose_name_plural = "Product Search Index"
+
+    def __str__(self):
+        return f"Search document for product #{self.product_id}"
+
+
+class ProductCard(models.Model):
+    """
+    Denormalized read model for public product listings (see api/cards.py).
+
+    `payload` is the exact ProductSerializer output for the product, stored
+    as JSON text (jsonb would reorder keys). The other columns are copies
+    of what listings filter and sort on, so a catalog page is a query
+    against this table alone.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card",
+    )
+    is_listed = models.BooleanField(
+        default=False,
+        help_text="Active, approved and not owned by a suspended seller.",
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    name = models.CharField(max_length=70)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    payload = models.TextField()
+    price_valid_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Next offer start/expiry that changes effective_price.",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Product Card"
+        verbose_name_plural = "Product Cards"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["is_listed", "-created_at"]),
+            models.Index(fields=["is_listed", "price"]),
+            models.Index(fields=["is_listed", "name"]),
+            models.Index(fields=["category"]),
+        ]
+
+    def __str__(self):
+        return f"Card for product #{self.product_id}"
+
+
 class Service(models.Model):
     image = models.ImageField(
         upload_to="services/",
@@ -965,6 +1261,14 @@ class Order(models.Model):
         max_digits=10, decimal_places=2, default=0,
         help_text="Platform commission earned from this order.",
     )
+    items_total = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0,
+        help_text="Sum of item subtotals, kept in sync by api/signals.py.",
+    )
+    grand_total = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0,
+        help_text="items_total minus discount_amount.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -973,19 +1277,26 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=["owner", "-created_at"]),
             models.Index(fields=["status"]),
+            models.Index(fields=["grand_total"]),
         ]
 
     def __str__(self):
         return f"Order #{self.pk} — {self.owner_name()} — {self.get_status_display()}"
 
+    def save(self, *args, **kwargs):
+        self.grand_total = self.items_total - self.discount_amount
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"items_total", "discount_amount"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "grand_total"}
+        super().save(*args, **kwargs)
+
     @property
     def total_price(self):
-        items_total = sum(item.subtotal for item in self.items.all())
-        return items_total - self.discount_amount
+        return self.grand_total
 
     @property
     def total_before_discount(self):
-        return sum(item.subtotal for item in self.items.all())
+        return self.items_total
 
     def owner_name(self):
         """Return owner's username or full name as string"""
@@ -1016,11 +1327,19 @@ class OrderItem(models.Model):
     )
 
     def save(self, *args, **kwargs):
+        self.apply_pricing()
+        super().save(*args, **kwargs)
+
+    def apply_pricing(self, default_rate=None):
+        """
+        Fill subtotal, platform_fee and seller_payout. Called by save();
+        bulk creators (api/orders.py) call it directly.
+        """
         self.subtotal = self.unit_price * self.quantity
-        
+
         if self.product and self.product.seller:
             seller = self.product.seller
-            commission_rate = seller.effective_commission_rate()
+            commission_rate = seller.effective_commission_rate(default_rate)
             if seller.delivery_type == "seller":
                 commission_rate = commission_rate * Decimal("0.5")
             fee = (self.subtotal * commission_rate) / Decimal("100.00")
@@ -1029,8 +1348,204 @@ class OrderItem(models.Model):
         else:
             self.platform_fee = self.subtotal
             self.seller_payout = Decimal('0.00')
-            
-        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.quantity} × {self.product} in Order #{self.order_id}"
\ No newline at end of file
+        return f"{self.quantity} × {self.product} in Order #{self.order_id}"
+
+
+class DailyProductSales(models.Model):
+    """
+    One product's sales on one day: the items of counted orders created
+    that day (see api/rollups.py). Analytics read windows from here
+    instead of scanning OrderItem.
+    """
+
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    platform_fee = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    seller_payout = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Daily Product Sales"
+        verbose_name_plural = "Daily Product Sales"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "product"], name="unique_daily_product_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} on {self.day}"
+
+
+class DailySellerSales(models.Model):
+    """Like DailyProductSales, per seller, plus how many orders they were in."""
+
+    day = models.DateField()
+    seller = models.ForeignKey(
+        SellerProfile, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    platform_fee = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    seller_payout = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Daily Seller Sales"
+        verbose_name_plural = "Daily Seller Sales"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "seller"], name="unique_daily_seller_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.seller} on {self.day}"
+
+
+class KPICounter(models.Model):
+    """
+    One shard of an admin-dashboard KPI (see api/kpis.py). Writers add
+    their delta to a random shard, so concurrent checkouts rarely wait on
+    the same row; the dashboard sums the shards of each KPI.
+    """
+
+    name = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "KPI Counter"
+        verbose_name_plural = "KPI Counters"
+        constraints = [
+            models.UniqueConstraint(fields=["name", "shard"], name="unique_kpi_counter_shard"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} (shard {self.shard}): {self.value}"
+
+
+class ProductSalesRank(models.Model):
+    """
+    A product's sales over the last `window` days and its place among all
+    products, recomputed on a schedule (see api/rankings.py). Top-product
+    lists and the "bestsellers" catalog sort read these rows instead of
+    aggregating sales per request.
+    """
+
+    window = models.PositiveSmallIntegerField(help_text="Days, ending on the refresh day.")
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="sales_ranks"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+        help_text="The product's category at refresh time.",
+    )
+    rank = models.PositiveIntegerField(help_text="1 = highest revenue in the window.")
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Product Sales Rank"
+        verbose_name_plural = "Product Sales Ranks"
+        constraints = [
+            models.UniqueConstraint(fields=["window", "product"], name="unique_sales_rank"),
+        ]
+        indexes = [
+            models.Index(fields=["window", "rank"]),
+            models.Index(fields=["window", "category", "rank"]),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} over {self.window} days: {self.product}"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Outcome of a POST sent with an `Idempotency-Key` header (see
+    api/idempotency.py). The row is inserted before the view runs, so the
+    unique constraint decides which of several concurrent retries does the
+    work; the others wait for `status_code` to be filled in and replay it.
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_records",
+    )
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True, help_text="Empty while the first request is running."
+    )
+    response_body = models.TextField(blank=True)
+    claimed_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Idempotency Record"
+        verbose_name_plural = "Idempotency Records"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "key"], name="unique_idempotency_key_per_owner"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.endpoint}) for user #{self.owner_id}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Inbox of verified payment-gateway webhooks (see api/webhooks.py).
+
+    Endpoints only verify, insert and acknowledge; `manage.py
+    drain_webhooks` applies the events. The (provider, event_id)
+    constraint drops redeliveries of an event already received.
+    """
+
+    class Provider(models.TextChoices):
+        STRIPE = "stripe", "Stripe"
+        PAYMOB = "paymob", "Paymob"
+        FAWRY = "fawry", "Fawry"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSED = "processed", "Processed"
+        FAILED = "failed", "Failed"
+
+    provider = models.CharField(max_length=16, choices=Provider.choices)
+    event_id = models.CharField(max_length=255)
+    event_type = models.CharField(max_length=100, blank=True)
+    payload = models.TextField()
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Webhook Event"
+        verbose_name_plural = "Webhook Events"
+        ordering = ["-received_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["provider", "event_id"], name="unique_webhook_event"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_provider_display()} {self.event_type or 'event'} {self.event_id}"
@@ -0,0 +1,151 @@
+"""
+Batched SellerOffer resolution for product listings.
+
+The effective price of a product comes from its newest active
+product-level offer, or — when it has none — from its seller's newest
+active seller-wide offer (product is NULL). OfferResolver loads every
+candidate offer for a whole page of products in one query and answers
+per-product lookups from memory.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .cache_utils import get_namespace_versions
+from .models import SellerOffer
+
+# Upper bound on how long a computed offer_clock is reused.
+OFFER_CLOCK_TIMEOUT = 60 * 60
+
+
+def active_offers(now=None):
+    now = now or timezone.now()
+    return SellerOffer.objects.filter(is_active=True).filter(
+        Q(starts_at__isnull=True) | Q(starts_at__lte=now),
+        Q(expires_at__isnull=True) | Q(expires_at__gte=now),
+    )
+
+
+def offer_clock(now=None):
+    """
+    Fingerprint of which offers are currently live: the latest start or
+    expiry that has already passed. It moves whenever an offer starts or
+    ends on schedule, which no write (and so no cache namespace) records.
+
+    Runs on every request of the cached listings, so the value is cached
+    with the next moment it can move, under the "offers" namespace that
+    offer writes bump; in between it costs one cache read.
+    """
+    if now is not None or not getattr(settings, "ENABLE_CACHING", True):
+        return _offer_clock(now or timezone.now())[0]
+    now = timezone.now()
+    version = get_namespace_versions(["offers"])["offers"]
+    key = f"offers:clock:{version}"
+    entry = cache.get(key)
+    if entry is None or (entry[1] is not None and entry[1] <= now):
+        entry = _offer_clock(now)
+        timeout = OFFER_CLOCK_TIMEOUT
+        if entry[1] is not None:
+            timeout = max(1, min(timeout, int((entry[1] - now).total_seconds()) + 1))
+        cache.set(key, entry, timeout)
+    return entry[0]
+
+
+def _offer_clock(now):
+    """(clock, next moment an active offer starts or expires, or None)."""
+    moments = SellerOffer.objects.filter(is_active=True).aggregate(
+        started=Max("starts_at", filter=Q(starts_at__lte=now)),
+        expired=Max("expires_at", filter=Q(expires_at__lt=now)),
+        next_start=Min("starts_at", filter=Q(starts_at__gt=now)),
+        next_expiry=Min("expires_at", filter=Q(expires_at__gte=now)),
+    )
+    clock = ",".join(
+        moment.isoformat() if moment else "-"
+        for moment in (moments["started"], moments["expired"])
+    )
+    upcoming = [m for m in (moments["next_start"], moments["next_expiry"]) if m]
+    return clock, min(upcoming, default=None)
+
+
+class OfferResolver:
+    def __init__(self, products, now=None):
+        product_ids = {p.pk for p in products}
+        seller_ids = {p.seller_id for p in products if p.seller_id}
+
+        self.by_product = {}
+        self.by_seller = {}
+        if not product_ids:
+            return
+
+        offers = (
+            active_offers(now)
+            .filter(
+                Q(product_id__in=product_ids)
+                | Q(product__isnull=True, seller_id__in=seller_ids)
+            )
+            .only("id", "seller_id", "product_id", "discount_percent", "created_at")
+            .order_by("-created_at")
+        )
+        for offer in offers:
+            if offer.product_id:
+                self.by_product.setdefault(offer.product_id, offer)
+            else:
+                self.by_seller.setdefault(offer.seller_id, offer)
+
+    def offer_for(self, product):
+        offer = self.by_product.get(product.pk)
+        if not offer and product.seller_id:
+            offer = self.by_seller.get(product.seller_id)
+        return offer
+
+    def effective_price(self, product):
+        """Discounted price as a string, or None when no discount applies."""
+        offer = self.offer_for(product)
+        if offer and offer.discount_percent:
+            discount = offer.discount_percent / 100
+            return str(product.price * (1 - discount))
+        return None
+
+
+def next_price_changes(products, now=None):
+    """
+    Map product id -> the next moment an offer starts or expires for it,
+    i.e. when effective_price may change without any row being written.
+    Products with no pending boundary are left out.
+    """
+    now = now or timezone.now()
+    products = list(products)
+    product_ids = {p.pk for p in products}
+    seller_ids = {p.seller_id for p in products if p.seller_id}
+    if not product_ids:
+        return {}
+
+    offers = (
+        SellerOffer.objects.filter(is_active=True)
+        .filter(
+            Q(product_id__in=product_ids)
+            | Q(product__isnull=True, seller_id__in=seller_ids)
+        )
+        .filter(Q(starts_at__gt=now) | Q(expires_at__gte=now))
+        .values_list("product_id", "seller_id", "starts_at", "expires_at")
+    )
+    by_product, by_seller = {}, {}
+    for product_id, seller_id, starts_at, expires_at in offers:
+        moments = [m for m in (starts_at, expires_at) if m and m >= now]
+        if not moments:
+            continue
+        target, key = (by_product, product_id) if product_id else (by_seller, seller_id)
+        target[key] = min([*moments, target.get(key, moments[0])])
+
+    changes = {}
+    for product in products:
+        moments = [
+            m
+            for m in (by_product.get(product.pk), by_seller.get(product.seller_id))
+            if m
+        ]
+        if moments:
+            changes[product.pk] = min(moments)
+    return changes
@@ -0,0 +1,103 @@
+"""
+Order building for checkout.
+
+Products (with their sellers) for the whole cart are fetched in one
+query, every line is priced in memory with OrderItem.apply_pricing, and
+the order with its totals plus all items are written in a single
+transaction: a constant handful of queries whatever the cart size.
+
+Order.items_total / grand_total are persisted so reads never sum items;
+item writes after checkout go through refresh_order_totals (signals).
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderItem, PlatformSettings, Product
+from .rollups import COUNTED_STATUSES, add_order
+
+logger = logging.getLogger(__name__)
+
+
+def price_items(order_items):
+    """
+    Unsaved, priced OrderItems for `[{id, quantity}, ...]` cart lines.
+    Lines pointing at unknown products are logged and dropped.
+    """
+    product_ids = {_as_pk(line.get("id")) for line in order_items} - {None}
+    products = Product.objects.select_related("seller").in_bulk(product_ids)
+
+    default_rate = None
+    if any(
+        product.seller and product.seller.commission_rate is None
+        for product in products.values()
+    ):
+        default_rate = PlatformSettings.cached().default_commission_rate
+
+    items = []
+    for line in order_items:
+        product = products.get(_as_pk(line.get("id")))
+        if product is None:
+            logger.warning(f"Product {line.get('id')} not found during order creation")
+            continue
+        item = OrderItem(
+            product=product,
+            quantity=int(line.get("quantity", 1)),
+            unit_price=product.price,
+        )
+        item.apply_pricing(default_rate)
+        items.append(item)
+    return items
+
+
+def _as_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@transaction.atomic
+def create_order(items, **order_fields):
+    """Insert an order with its precomputed totals and bulk-insert its items."""
+    items_total = sum((item.subtotal for item in items), Decimal("0"))
+    order = Order.objects.create(
+        items_total=items_total,
+        subtotal_before_discount=items_total,
+        total_commission=sum(
+            (item.platform_fee for item in items if item.product.seller_id),
+            Decimal("0"),
+        ),
+        **order_fields,
+    )
+    for item in items:
+        item.order = order
+    OrderItem.objects.bulk_create(items)
+    if order.status in COUNTED_STATUSES:
+        add_order(order.pk)  # the bulk insert skips the item signals
+    return order
+
+
+def refresh_order_totals(orders):
+    """
+    Recompute items_total/grand_total for an Order queryset in one UPDATE.
+    Used by the OrderItem signals and `manage.py backfill_order_totals`.
+    """
+    items_total = Coalesce(
+        Subquery(
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(total=Sum("subtotal"))
+            .values("total")
+        ),
+        Value(Decimal("0")),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+    return orders.update(
+        items_total=items_total, grand_total=items_total - F("discount_amount")
+    )
@@ -0,0 +1,208 @@
+"""
+Keyset (cursor) pagination.
+
+Opt-in alternative to StandardResultsSetPagination for large lists and
+infinite-scroll clients. Instead of COUNT(*) + a growing OFFSET, each page
+is a `WHERE (sort_key, id) > (last_sort_key, last_id)` range scan, so page
+1000 costs the same as page 1.
+
+    GET /api/products/?pagination=cursor&sort=price      -> first page
+    GET /api/products/?...&cursor=<opaque>               -> follow `next`
+
+`previous` links carry a reverse cursor: the same range scan run
+backwards from the page's first row, so a client can step back without
+keeping its own history.
+
+`?count=exact` adds a COUNT(*); `?count=approx` asks the planner for its
+row estimate on PostgreSQL (exact elsewhere). By default no count is run.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 9
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    sort_query_param = "sort"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, sorts=("-created_at",)):
+        self.sorts = tuple(sorts)
+
+    @classmethod
+    def requested(cls, request):
+        params = request.query_params
+        return cls.cursor_query_param in params or params.get("pagination") == "cursor"
+
+    # ─── Cursor encoding ──────────────────────────────────────────────────────
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def encode_cursor(self, sort, value, pk, reverse=False):
+        payload = {"s": sort, "v": self._dump_value(value), "id": pk}
+        if reverse:
+            payload["r"] = 1
+        payload = json.dumps(payload, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request, sort):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if payload["s"] != sort:
+                raise ValueError("cursor was issued for a different sort")
+            return payload["v"], int(payload["id"]), bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # ─── Pagination ───────────────────────────────────────────────────────────
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_sort(self, request):
+        sort = request.query_params.get(self.sort_query_param)
+        return sort if sort in self.sorts else self.sorts[0]
+
+    def _typed_value(self, model, field_name, value):
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            return value  # annotation such as search_rank_key; JSON keeps the type
+        try:
+            return field.to_python(value)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None, sort=None):
+        self.request = request
+        self.sort = sort or self.get_sort(request)
+        self.page_size_value = self.get_page_size(request)
+
+        field_name = self.sort.lstrip("-")
+        descending = self.sort.startswith("-")
+        self.count = self.get_count(queryset.order_by(), request)
+
+        cursor = self.decode_cursor(request, self.sort)
+        reverse = cursor is not None and cursor[2]
+        # A reverse cursor walks the same order backwards from its row.
+        if descending != reverse:
+            queryset = queryset.order_by(f"-{field_name}", "-pk")
+            op = "lt"
+        else:
+            queryset = queryset.order_by(field_name, "pk")
+            op = "gt"
+        if cursor is not None:
+            value, pk, _ = cursor
+            value = self._typed_value(queryset.model, field_name, value)
+            queryset = queryset.filter(
+                Q(**{f"{field_name}__{op}": value})
+                | Q(**{field_name: value, f"pk__{op}": pk})
+            )
+
+        rows = list(queryset[: self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+        if reverse:
+            rows.reverse()
+        # Stepping back from a page means there is one after it, and vice versa.
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else cursor is not None
+
+        self.next_cursor = self.previous_cursor = None
+        if rows and has_next:
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(
+                self.sort, getattr(last, field_name), last.pk
+            )
+        if rows and has_previous:
+            first = rows[0]
+            self.previous_cursor = self.encode_cursor(
+                self.sort, getattr(first, field_name), first.pk, reverse=True
+            )
+        return rows
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get("count")
+        if mode == "exact":
+            return queryset.count()
+        if mode == "approx":
+            return approximate_count(queryset)
+        return None
+
+    def _cursor_link(self, cursor):
+        if not cursor:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._cursor_link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._cursor_link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    Lets a GenericAPIView/ViewSet switch to KeysetPagination per request
+    while keeping its regular pagination_class as the default.
+    """
+
+    keyset_sorts = ("-created_at",)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and KeysetPagination.requested(self.request):
+            self._paginator = KeysetPagination(self.keyset_sorts)
+        return super().paginator
+
+
+def approximate_count(queryset):
+    """Planner row estimate on PostgreSQL; exact COUNT(*) elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -14,11 +14,15 @@ import hashlib
 import hmac
 import json
 import logging
+from datetime import timedelta
 from decimal import Decimal
 
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse
+from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from rest_framework import status
@@ -26,45 +30,81 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Order, Payment
+from .idempotency import idempotent
+from .models import Order, Payment, WebhookEvent
+from .webhooks import WebhookVerificationError, parse_fawry, parse_paymob, record_event
 
 logger = logging.getLogger(__name__)
 
+# One pooled session per process: gateway calls reuse kept-alive TLS
+# connections instead of a handshake per request.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
 
 # ===============================================
 # PAYMOB
 # ===============================================
 
+# Lifetime of a Paymob payment key, in seconds.
+PAYMOB_PAYMENT_KEY_TTL = 3600
+
 PAYMOB_BASE = "https://accept.paymob.com/api"
+# Paymob auth tokens live for an hour; refresh well before that.
+PAYMOB_TOKEN_CACHE_KEY = "paymob:auth_token"
+PAYMOB_TOKEN_TTL = 50 * 60
 
 
 def _paymob_headers():
     return {"Content-Type": "application/json"}
 
 
-def _get_paymob_auth_token():
-    """Authenticate with Paymob and return the auth token."""
+def _get_paymob_auth_token(refresh=False):
+    """Return a Paymob auth token, cached for PAYMOB_TOKEN_TTL seconds."""
+    if not refresh:
+        token = cache.get(PAYMOB_TOKEN_CACHE_KEY)
+        if token:
+            return token
     api_key = getattr(settings, "PAYMOB_API_KEY", "")
     if not api_key:
         raise ValueError("PAYMOB_API_KEY not configured")
-    resp = requests.post(
+    resp = _session.post(
         f"{PAYMOB_BASE}/auth/tokens",
         json={"api_key": api_key},
         headers=_paymob_headers(),
         timeout=15,
     )
     resp.raise_for_status()
-    return resp.json()["token"]
+    token = resp.json()["token"]
+    cache.set(PAYMOB_TOKEN_CACHE_KEY, token, PAYMOB_TOKEN_TTL)
+    return token
+
+
+def _paymob_call(func, *args):
+    """
+    Run func(auth_token, *args) with the cached token, fetching a new one
+    and retrying once if Paymob rejects it (revoked or rotated key).
+    """
+    try:
+        return func(_get_paymob_auth_token(), *args)
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code not in (401, 403):
+            raise
+        return func(_get_paymob_auth_token(refresh=True), *args)
+
+
+def _amount_cents(amount):
+    return int(amount * 100)
 
 
 def _register_paymob_order(auth_token, order_obj):
-    """Register the order with Paymob and return the payment_token."""
-    resp = requests.post(
+    """Register the order with Paymob and return the Paymob order id."""
+    resp = _session.post(
         f"{PAYMOB_BASE}/ecommerce/orders",
         json={
             "auth_token": auth_token,
             "delivery_needed": False,
-            "amount_cents": int(order_obj.total_price * 100),
+            "amount_cents": _amount_cents(order_obj.total_price),
             "currency": "EGP",
             "items": [
                 {
@@ -88,12 +128,12 @@ def _get_paymob_payment_key(auth_token, order_id, billing_data):
     integration_id = getattr(settings, "PAYMOB_INTEGRATION_ID", "")
     if not integration_id:
         raise ValueError("PAYMOB_INTEGRATION_ID not configured")
-    resp = requests.post(
+    resp = _session.post(
         f"{PAYMOB_BASE}/acceptance/payment_keys",
         json={
             "auth_token": auth_token,
             "amount_cents": None,  # uses order amount
-            "expiration": 3600,
+            "expiration": PAYMOB_PAYMENT_KEY_TTL,
             "order_id": order_id,
             "billing_data": billing_data,
             "currency": "EGP",
@@ -106,6 +146,28 @@ def _get_paymob_payment_key(auth_token, order_id, billing_data):
     return resp.json()["token"]
 
 
+def _reusable_paymob_payment(order):
+    """The order's pending Paymob payment, if registered for its current total."""
+    payment = order.payment
+    if (
+        payment is None
+        or payment.method != Payment.Method.PAYMOB
+        or payment.status != Payment.Status.PENDING
+        or not payment.provider_payment_id
+    ):
+        return None
+    raw = payment.raw_response
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return None
+    if not isinstance(raw, dict) or raw.get("amount_cents") != _amount_cents(order.total_price):
+        return None
+    return payment
+
+
+@method_decorator(idempotent, name="post")
 class PaymobCheckoutView(APIView):
     """
     POST /api/payments/paymob/checkout/
@@ -122,7 +184,7 @@ class PaymobCheckoutView(APIView):
             return Response({"error": "order_id required"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            order = Order.objects.get(pk=order_id, owner=request.user)
+            order = Order.objects.select_related("payment").get(pk=order_id, owner=request.user)
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -144,24 +206,38 @@ class PaymobCheckoutView(APIView):
         }
 
         try:
-            auth_token = _get_paymob_auth_token()
-            paymob_order_id = _register_paymob_order(auth_token, order)
-            payment_token = _get_paymob_payment_key(auth_token, paymob_order_id, billing)
+            # A retried checkout reuses the Paymob order registered for it,
+            # as long as the amount has not changed since.
+            payment = _reusable_paymob_payment(order)
+            if payment is not None:
+                paymob_order_id = payment.provider_payment_id
+            else:
+                paymob_order_id = _paymob_call(_register_paymob_order, order)
+            payment_token = _paymob_call(_get_paymob_payment_key, paymob_order_id, billing)
 
             # Build iframe URL
             iframe_url = f"https://accept.paymob.com/api/acceptance/iframes/856497?payment_token={payment_token}"
+            raw_response = json.dumps({
+                "payment_token": payment_token,
+                "iframe_url": iframe_url,
+                "amount_cents": _amount_cents(order.total_price),
+            })
 
             # Store payment record
-            payment = Payment.objects.create(
-                owner=request.user,
-                method="paymob",
-                amount=order.total_price,
-                provider_payment_id=str(paymob_order_id),
-                status="pending",
-                raw_response=json.dumps({"payment_token": payment_token, "iframe_url": iframe_url}),
-            )
-            order.payment = payment
-            order.save(update_fields=["payment"])
+            if payment is not None:
+                payment.raw_response = raw_response
+                payment.save(update_fields=["raw_response", "updated_at"])
+            else:
+                payment = Payment.objects.create(
+                    owner=request.user,
+                    method="paymob",
+                    amount=order.total_price,
+                    provider_payment_id=str(paymob_order_id),
+                    status="pending",
+                    raw_response=raw_response,
+                )
+                order.payment = payment
+                order.save(update_fields=["payment"])
 
             return Response({
                 "iframe_url": iframe_url,
@@ -179,39 +255,18 @@ class PaymobCheckoutView(APIView):
 def paymob_webhook(request):
     """
     POST /api/payments/paymob/webhook/
-    Paymob sends payment status updates here.
+    Paymob sends payment status updates here. Verified callbacks are stored
+    in the webhook inbox and applied by `manage.py drain_webhooks`.
     """
     try:
-        data = json.loads(request.body)
-        logger.info(f"Paymob webhook: {json.dumps(data)}")
-
-        # Validate HMAC if configured
-        paymob_hmac = getattr(settings, "PAYMOB_HMAC", "")
-        if paymob_hmac:
-            hmac_str = data.get("hmac", "")
-            # TODO: Validate HMAC against expected
-
-        obj = data.get("obj", {})
-        paymob_order_id = str(obj.get("order", {}).get("id", ""))
-        success = obj.get("success", False)
-
-        if paymob_order_id:
-            payment = Payment.objects.filter(provider_payment_id=paymob_order_id).first()
-            if payment:
-                payment.status = "completed" if success else "failed"
-                payment.raw_response = json.dumps(data)
-                payment.save(update_fields=["status", "raw_response"])
-
-                if success and hasattr(payment, "order") and payment.order:
-                    payment.order.status = "confirmed"
-                    payment.order.save(update_fields=["status"])
-
-        return JsonResponse({"status": "ok"})
-
-    except Exception as e:
-        logger.exception("Paymob webhook error")
+        event_id, event_type, body = parse_paymob(request.body, request.GET.get("hmac", ""))
+    except WebhookVerificationError as e:
+        logger.warning(f"Rejected Paymob webhook: {e}")
         return JsonResponse({"error": str(e)}, status=400)
 
+    record_event(WebhookEvent.Provider.PAYMOB, event_id, event_type, body)
+    return JsonResponse({"status": "ok"})
+
 
 class PaymobCallbackView(APIView):
     """
@@ -235,6 +290,16 @@ class PaymobCallbackView(APIView):
 # ===============================================
 
 FAWRY_BASE = "https://atfawry.com/e-commerce-portal/api/v2"
+# How long a Fawry reference stays payable at an outlet.
+FAWRY_PAYMENT_WINDOW = timedelta(hours=72)
+
+# Checkout methods paid after the order is placed, and how long the
+# order's stock is held for the payment webhook (with some slack for
+# late notifications). The webhook commits or releases it.
+PAY_LATER_HOLDS = {
+    "paymob_wallet": timedelta(seconds=PAYMOB_PAYMENT_KEY_TTL) + timedelta(hours=1),
+    "fawry": FAWRY_PAYMENT_WINDOW + timedelta(hours=1),
+}
 
 
 def _fawry_headers():
@@ -247,6 +312,7 @@ def _fawry_signature(merchant_code, order_id, amount, security_code):
     return hashlib.sha256(message.encode("utf-8")).hexdigest()
 
 
+@method_decorator(idempotent, name="post")
 class FawryCheckoutView(APIView):
     """
     POST /api/payments/fawry/checkout/
@@ -285,6 +351,7 @@ class FawryCheckoutView(APIView):
             "amount": float(order.total_price),
             "currency": "EGP",
             "signature": signature,
+            "paymentExpiry": int((order.created_at + FAWRY_PAYMENT_WINDOW).timestamp() * 1000),
             "returnUrl": return_url,
             "webServiceUrl": f"{request.scheme}://{request.get_host()}/api/payments/fawry/webhook/",
             "channelType": "All",
@@ -294,7 +361,7 @@ class FawryCheckoutView(APIView):
         }
 
         try:
-            resp = requests.post(
+            resp = _session.post(
                 f"{FAWRY_BASE}/payments",
                 json=payload,
                 headers=_fawry_headers(),
@@ -339,39 +406,18 @@ class FawryCheckoutView(APIView):
 def fawry_webhook(request):
     """
     POST /api/payments/fawry/webhook/
-    Fawry sends payment status updates here.
+    Fawry sends payment status updates here. Verified notifications are
+    stored in the webhook inbox and applied by `manage.py drain_webhooks`.
     """
     try:
-        data = json.loads(request.body)
-        logger.info(f"Fawry webhook: {json.dumps(data)}")
-
-        fawry_ref = data.get("fawryRefNumber", "")
-        merchant_ref = data.get("merchantRefNumber", "")
-        order_status = data.get("orderStatus", "")
-
-        if fawry_ref or merchant_ref:
-            payment = Payment.objects.filter(
-                provider_payment_id__in=[fawry_ref, merchant_ref]
-            ).first()
-
-            if payment:
-                if order_status == "PAID":
-                    payment.status = "completed"
-                    if hasattr(payment, "order") and payment.order:
-                        payment.order.status = "confirmed"
-                        payment.order.save(update_fields=["status"])
-                elif order_status in ("CANCELED", "EXPIRED"):
-                    payment.status = "failed"
-
-                payment.raw_response = json.dumps(data)
-                payment.save(update_fields=["status", "raw_response"])
-
-        return JsonResponse({"status": "ok"})
-
-    except Exception as e:
-        logger.exception("Fawry webhook error")
+        event_id, event_type, body = parse_fawry(request.body)
+    except WebhookVerificationError as e:
+        logger.warning(f"Rejected Fawry webhook: {e}")
         return JsonResponse({"error": str(e)}, status=400)
 
+    record_event(WebhookEvent.Provider.FAWRY, event_id, event_type, body)
+    return JsonResponse({"status": "ok"})
+
 
 class FawryStatusView(APIView):
     """
@@ -393,7 +439,7 @@ class FawryStatusView(APIView):
         ).hexdigest()
 
         try:
-            resp = requests.get(
+            resp = _session.get(
                 f"{FAWRY_BASE}/payments/ord/{merchant_code}/{ref}",
                 headers=_fawry_headers(),
                 timeout=15,
@@ -0,0 +1,160 @@
+"""
+Seller payouts for Stripe-paid orders.
+
+When a payment succeeds, record_payouts() writes one pending
+SellerPayoutRecord per seller of the order (one aggregate query, one
+bulk insert). `manage.py run_payouts` then sends the Stripe transfers in
+batches: up to `concurrency` transfers are in flight at once, each with
+an idempotency key derived from the record, so a retry after a timeout
+can never pay a seller twice. Failures are retried with exponential
+backoff and parked as FAILED after MAX_ATTEMPTS.
+
+Records of sellers without a connected Stripe account stay pending until
+the account is connected.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import stripe
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import OrderItem, SellerPayoutRecord
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = timedelta(minutes=1)
+MAX_BACKOFF = timedelta(hours=6)
+# How long a claimed batch is hidden from other workers while it runs.
+LEASE = timedelta(minutes=5)
+DEFAULT_CONCURRENCY = 4
+
+
+def record_payouts(order):
+    """Create the order's pending payout records. Safe to call repeatedly."""
+    rows = (
+        OrderItem.objects.filter(order=order, product__seller__isnull=False)
+        .order_by()
+        .values("product__seller", "product__seller__delivery_type")
+        .annotate(
+            gross=Sum("subtotal"),
+            commission=Sum("platform_fee"),
+            net=Sum("seller_payout"),
+        )
+    )
+    records = [
+        SellerPayoutRecord(
+            seller_id=row["product__seller"],
+            order_id=order.pk,
+            gross_amount=row["gross"],
+            commission_amount=row["commission"],
+            net_amount=row["net"],
+            delivery_type=row["product__seller__delivery_type"],
+        )
+        for row in rows
+        if row["net"] > 0
+    ]
+    # A redelivered payment event finds the records already there.
+    SellerPayoutRecord.objects.bulk_create(records, ignore_conflicts=True)
+    return len(records)
+
+
+def _due():
+    return SellerPayoutRecord.objects.filter(
+        status=SellerPayoutRecord.Status.PENDING,
+        next_attempt_at__lte=timezone.now(),
+    ).exclude(seller__stripe_account_id="")
+
+
+def claim_batch(batch_size):
+    """Lease up to batch_size due payouts to this worker (see api/webhooks.py)."""
+    with transaction.atomic():
+        records = list(
+            _due()
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("next_attempt_at", "pk")[:batch_size]
+        )
+        if records:
+            SellerPayoutRecord.objects.filter(pk__in=[r.pk for r in records]).update(
+                next_attempt_at=timezone.now() + LEASE
+            )
+    if not records:
+        return []
+    # Load what the transfers need outside the locking query.
+    return list(
+        SellerPayoutRecord.objects.filter(pk__in=[r.pk for r in records])
+        .select_related("seller", "order__payment")
+        .order_by("pk")
+    )
+
+
+def _transfer(record):
+    payment = record.order.payment
+    return stripe.Transfer.create(
+        amount=int(record.net_amount * 100),
+        currency=payment.currency if payment else "egp",
+        destination=record.seller.stripe_account_id,
+        transfer_group=str(record.order_id),
+        idempotency_key=f"seller-payout-{record.pk}",
+    )
+
+
+def _send(record):
+    try:
+        return record, _transfer(record), None
+    except Exception as e:
+        return record, None, e
+
+
+def backoff(attempts):
+    return min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def _record_outcome(record, transfer, error):
+    record.attempts += 1
+    if error is None:
+        record.status = SellerPayoutRecord.Status.PAID
+        record.stripe_transfer_id = transfer["id"]
+        record.paid_at = timezone.now()
+        record.last_error = ""
+        record.save(
+            update_fields=["attempts", "status", "stripe_transfer_id", "paid_at", "last_error"]
+        )
+        logger.info(
+            f"Paid {record.net_amount} to {record.seller.stripe_account_id} "
+            f"for Order #{record.order_id}"
+        )
+        return True
+
+    logger.warning(f"Payout #{record.pk} failed (attempt {record.attempts}): {error}")
+    record.last_error = f"{type(error).__name__}: {error}"
+    if record.attempts >= MAX_ATTEMPTS:
+        record.status = SellerPayoutRecord.Status.FAILED
+    else:
+        record.next_attempt_at = timezone.now() + backoff(record.attempts)
+    record.save(update_fields=["attempts", "status", "next_attempt_at", "last_error"])
+    return False
+
+
+def run_batch(batch_size=100, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Send one batch of due payouts. Returns (paid, failed, seconds). Only the
+    Stripe calls run in worker threads; outcomes are saved on this thread.
+    """
+    started = time.monotonic()
+    records = claim_batch(batch_size)
+    paid = failed = 0
+    if records:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for record, transfer, error in pool.map(_send, records):
+                if _record_outcome(record, transfer, error):
+                    paid += 1
+                else:
+                    failed += 1
+    return paid, failed, time.monotonic() - started
+
@@ -0,0 +1,145 @@
+"""
+Precomputed top-product rankings.
+
+Ranking products over a sales window means summing the daily rollups
+(api/rollups.py) per product and sorting the totals. refresh_rankings()
+does that once for each of WINDOWS and stores every product with sales
+as a ProductSalesRank row (rank 1 = highest revenue), so that
+
+- top_products() answers a standard window, overall or for one category,
+  with an indexed slice of those rows, cached until the next refresh;
+  other windows and limits past TOP_K fall back to the live query;
+- the catalog's "bestsellers" sort orders by each product's units over
+  BESTSELLER_WINDOW days, a row lookup rather than an aggregate.
+
+`manage.py refresh_product_rankings` runs the refresh and is meant to run
+hourly from cron; between runs the rankings lag the live sales.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_utils import get_namespace_versions, invalidate_namespaces
+from .models import DailyProductSales, ProductSalesRank
+from .rollups import window_start
+
+WINDOWS = (1, 7, 30, 90)
+BESTSELLER_WINDOW = 30
+TOP_K = 100
+RANKINGS_TIMEOUT = 60 * 60
+
+
+# ─── Refreshing ────────────────────────────────────────────────────────────────
+
+
+def _window_sales(days, now=None):
+    """Products sold in the window with total_sold/total_revenue, best first."""
+    return (
+        DailyProductSales.objects.filter(day__gte=window_start(days, now))
+        .values("product")
+        .annotate(total_sold=Sum("units"), total_revenue=Sum("revenue"))
+        .order_by("-total_revenue", "product")
+    )
+
+
+@transaction.atomic
+def refresh_rankings(now=None):
+    """Recompute the rankings of every window. Returns the number of rows written."""
+    now = now or timezone.now()
+    written = 0
+    for days in WINDOWS:
+        rows = _window_sales(days, now).values_list(
+            "product", "product__category", "total_sold", "total_revenue"
+        )
+        ranks = (
+            ProductSalesRank(
+                window=days,
+                product_id=product_id,
+                category_id=category_id,
+                rank=rank,
+                units=units,
+                revenue=revenue,
+                computed_at=now,
+            )
+            for rank, (product_id, category_id, units, revenue) in enumerate(
+                rows.iterator(), start=1
+            )
+        )
+        ProductSalesRank.objects.filter(window=days).delete()
+        written += len(ProductSalesRank.objects.bulk_create(ranks, batch_size=1000))
+    transaction.on_commit(lambda: invalidate_namespaces("rankings"))
+    return written
+
+
+# ─── Reading ───────────────────────────────────────────────────────────────────
+
+
+def top_products(days, limit, category_id=None):
+    """
+    The `limit` best-selling products of the last `days` days, optionally
+    within one category, as TopProductSerializer dicts.
+    """
+    if days not in WINDOWS or limit > TOP_K:
+        return _live_top_products(days, limit, category_id)
+    if not getattr(settings, "ENABLE_CACHING", True):
+        rows = _ranked_top_products(days, category_id)
+    else:
+        version = get_namespace_versions(["rankings"])["rankings"]
+        key = f"rankings:top:{version}:{days}:{category_id or 'all'}"
+        rows = cache.get(key)
+        if rows is None:
+            rows = _ranked_top_products(days, category_id)
+            cache.set(key, rows, RANKINGS_TIMEOUT)
+    if not rows:
+        # Not refreshed yet, or nothing sold: the live query is cheap either way.
+        return _live_top_products(days, limit, category_id)
+    return rows[:limit]
+
+
+def _ranked_top_products(days, category_id):
+    ranks = ProductSalesRank.objects.filter(window=days)
+    if category_id is not None:
+        ranks = ranks.filter(category_id=category_id)
+    ranks = ranks.select_related("product").only(
+        "product", "units", "revenue", "product__name", "product__price"
+    )
+    return [
+        {
+            "id": rank.product_id,
+            "name": rank.product.name,
+            "price": rank.product.price,
+            "total_sold": rank.units,
+            "total_revenue": rank.revenue,
+        }
+        for rank in ranks.order_by("rank")[:TOP_K]
+    ]
+
+
+def _live_top_products(days, limit, category_id):
+    sales = _window_sales(days)
+    if category_id is not None:
+        sales = sales.filter(product__category_id=category_id)
+    return list(
+        sales.values(
+            "total_sold",
+            "total_revenue",
+            id=F("product"),
+            name=F("product__name"),
+            price=F("product__price"),
+        )[:limit]
+    )
+
+
+def annotate_bestseller_units(queryset):
+    """
+    Annotate products (or product cards) with `bestseller_units`: units
+    sold over BESTSELLER_WINDOW days as of the last refresh, 0 if none.
+    """
+    units = ProductSalesRank.objects.filter(
+        window=BESTSELLER_WINDOW, product=OuterRef("pk")
+    ).values("units")[:1]
+    return queryset.annotate(bestseller_units=Coalesce(Subquery(units), 0))
@@ -0,0 +1,219 @@
+"""
+Daily sales rollups.
+
+DailyProductSales and DailySellerSales hold units, revenue, platform_fee
+and seller_payout per day × product and day × seller (plus the number of
+orders per seller), so an analytics window sums a few rollup rows per
+product or seller instead of scanning OrderItem joined to Order.
+
+An order is counted while its status is one of COUNTED_STATUSES, under
+the local date it was created. The signals in api/signals.py keep the
+rollups current inside the writing transaction:
+
+- an order saved into or out of COUNTED_STATUSES (confirmed, then
+  cancelled or refunded...) adds or subtracts all of its items;
+- an item written or deleted on a counted order applies the difference
+  between the order's contributions before and after the write (once
+  for a batch of items deleted together).
+
+Writes that bypass model signals must roll up themselves (create_order()
+calls add_order() after its bulk insert) or be followed by `manage.py
+rebuild_sales_rollups` for the days they touched.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .kpis import REVENUE
+from .kpis import bump as bump_kpi
+from .models import DailyProductSales, DailySellerSales, Order, OrderItem
+
+COUNTED_STATUSES = (
+    Order.Status.CONFIRMED,
+    Order.Status.PROCESSING,
+    Order.Status.SHIPPED,
+    Order.Status.DELIVERED,
+)
+AMOUNTS = ("units", "revenue", "platform_fee", "seller_payout")
+# Rollup model -> the column it is keyed on besides `day`.
+_KEYS = {DailyProductSales: "product_id", DailySellerSales: "seller_id"}
+
+
+# ─── Live updates ──────────────────────────────────────────────────────────────
+
+
+def order_contributions(order_id):
+    """{(model, day, key): {column: amount}} that one order adds to the rollups."""
+    contributions = defaultdict(lambda: defaultdict(int))
+    rows = (
+        OrderItem.objects.filter(order_id=order_id, product__isnull=False)
+        .order_by()
+        .values("order__created_at", "product_id", "product__seller_id")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum("subtotal"),
+            platform_fee=Sum("platform_fee"),
+            seller_payout=Sum("seller_payout"),
+        )
+    )
+    for row in rows:
+        day = timezone.localdate(row["order__created_at"])
+        targets = [(DailyProductSales, day, row["product_id"])]
+        if row["product__seller_id"]:
+            seller = (DailySellerSales, day, row["product__seller_id"])
+            targets.append(seller)
+            contributions[seller]["orders"] = 1
+        for target in targets:
+            for column in AMOUNTS:
+                contributions[target][column] += row[column]
+    return contributions
+
+
+def _difference(after, before):
+    changes = defaultdict(lambda: defaultdict(int))
+    for contributions, sign in ((after, 1), (before, -1)):
+        for target, amounts in contributions.items():
+            for column, amount in amounts.items():
+                changes[target][column] += sign * amount
+    return changes
+
+
+def _apply(changes):
+    # Fixed row order, so concurrent writers cannot deadlock on the rollups.
+    for target in sorted(changes, key=lambda t: (t[0].__name__, t[1], t[2])):
+        model, day, key = target
+        amounts = {column: amount for column, amount in changes[target].items() if amount}
+        if not amounts:
+            continue
+        rows = model.objects.filter(day=day, **{_KEYS[model]: key})
+        increments = {column: F(column) + amount for column, amount in amounts.items()}
+        if rows.update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(day=day, **{_KEYS[model]: key}, **amounts)
+        except IntegrityError:
+            rows.update(**increments)  # created concurrently
+
+
+@transaction.atomic
+def add_order(order_id):
+    _apply(order_contributions(order_id))
+
+
+@transaction.atomic
+def remove_order(order_id):
+    _apply(_difference({}, order_contributions(order_id)))
+
+
+@transaction.atomic
+def apply_order_change(order_id, before):
+    """Roll up what changed in an order since the `before` contributions."""
+    _apply(_difference(order_contributions(order_id), before))
+
+
+def _counted_items_total(order_id):
+    """The order's persisted items_total, or None while it is not counted."""
+    return (
+        Order.objects.filter(pk=order_id, status__in=COUNTED_STATUSES)
+        .values_list("items_total", flat=True)
+        .first()
+    )
+
+
+def item_change_started(order_id, origin=None):
+    """
+    Note the order's contributions before one of its items is written.
+    Items deleted together (a cascade or a queryset delete) all signal
+    before any is gone, so they share one change, kept on the `origin`
+    of the delete; a save gets its own. Either way the change lives only
+    as long as the write, even if that write fails half-way.
+    """
+    changes = {} if origin is None else origin.__dict__.setdefault("_rollup_changes", {})
+    change = changes.get(order_id)
+    if change is None:
+        items_total = _counted_items_total(order_id)
+        before = order_contributions(order_id) if items_total is not None else None
+        change = changes[order_id] = {
+            "order_id": order_id,
+            "before": before,
+            "items_total": items_total,
+            "done": False,
+        }
+    return change
+
+
+def item_change_finished(change):
+    """
+    Roll up a change once, when the first of its writes is done, and move
+    the revenue KPI by the order's items_total (refreshed by then, see
+    refresh_totals_for_item in api/signals.py).
+    """
+    if change["done"]:
+        return
+    change["done"] = True
+    if change["before"] is not None:
+        apply_order_change(change["order_id"], change["before"])
+        after = _counted_items_total(change["order_id"]) or 0
+        bump_kpi(REVENUE, after - change["items_total"])
+
+
+# ─── Rebuilding ────────────────────────────────────────────────────────────────
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _rebuild_rows(items):
+    day = TruncDate("order__created_at", tzinfo=timezone.get_current_timezone())
+    sums = {
+        "units": Sum("quantity"),
+        "revenue": Sum("subtotal"),
+        "platform_fee": Sum("platform_fee"),
+        "seller_payout": Sum("seller_payout"),
+    }
+    products = (
+        items.annotate(day=day).order_by().values("day", "product_id").annotate(**sums)
+    )
+    sellers = (
+        items.filter(product__seller__isnull=False)
+        .annotate(day=day, seller_id=F("product__seller_id"))
+        .order_by()
+        .values("day", "seller_id")
+        .annotate(orders=Count("order", distinct=True), **sums)
+    )
+    return (
+        (DailyProductSales(**row) for row in products.iterator()),
+        (DailySellerSales(**row) for row in sellers.iterator()),
+    )
+
+
+@transaction.atomic
+def rebuild(since, until):
+    """
+    Recompute the rollups of days since..until (inclusive) from the
+    orders. Returns the number of rows written.
+    """
+    items = OrderItem.objects.filter(
+        order__status__in=COUNTED_STATUSES,
+        order__created_at__gte=_start_of(since),
+        order__created_at__lt=_start_of(until + timedelta(days=1)),
+        product__isnull=False,
+    )
+    written = 0
+    for model, rows in zip((DailyProductSales, DailySellerSales), _rebuild_rows(items)):
+        model.objects.filter(day__gte=since, day__lte=until).delete()
+        written += len(model.objects.bulk_create(rows, batch_size=1000))
+    return written
+
+
+def window_start(days, now=None):
+    """First rollup day of a `days`-long window ending today."""
+    return timezone.localdate(now) - timedelta(days=max(days, 1) - 1)
+
@@ -0,0 +1,140 @@
+"""
+Full-text product search backed by ProductSearchIndex.
+
+Each product has one flattened search document (name, description,
+category, tag names and seller business name). The index over it is
+vendor specific — see migration 0016:
+
+  * PostgreSQL: generated, weighted `search_vector` tsvector + GIN index,
+    ranked with ts_rank.
+  * SQLite: FTS5 shadow table kept in sync by triggers, ranked with bm25.
+  * Anything else: icontains over the document table, unranked.
+
+Documents are refreshed from api/signals.py whenever a product, tag,
+category or seller changes; `manage.py rebuild_search_index` rebuilds all.
+"""
+
+import re
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from unidecode import unidecode
+
+from .models import Product, ProductSearchIndex
+
+SEARCH_TABLE = ProductSearchIndex._meta.db_table
+FTS_TABLE = f"{SEARCH_TABLE}_fts"
+# search_rank_key = search_rank × RANK_SCALE, truncated or rounded.
+RANK_SCALE = 1_000_000.0
+
+# Letters/digits only: keeps user input out of tsquery / FTS5 MATCH syntax.
+_TERM_RE = re.compile(r"[^\W_]+", re.UNICODE)
+MAX_TERMS = 8
+
+# FTS5 bm25 column weights for (name, keywords, body) — mirrors the
+# A/B/C weights of the Postgres tsvector.
+_BM25_WEIGHTS = "10.0, 5.0, 1.0"
+
+
+def search_terms(query):
+    return _TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def build_document(product):
+    """Return a ProductSearchIndex row for a product with tags/category/seller loaded."""
+    keywords = []
+    transliterated = unidecode(product.name)
+    if transliterated != product.name:
+        # Lets Latin input match Arabic names through their transliteration.
+        keywords.append(transliterated)
+    if product.category:
+        keywords.append(product.category.name)
+    keywords.extend(tag.name for tag in product.tags.all())
+    if product.seller:
+        keywords.append(product.seller.business_name)
+
+    return ProductSearchIndex(
+        product_id=product.pk,
+        name=product.name,
+        keywords=" ".join(keywords),
+        body=product.description,
+    )
+
+
+def index_products(product_ids):
+    """(Re)build the search documents for the given product ids."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    products = (
+        Product.objects.filter(pk__in=product_ids)
+        .select_related("category", "seller")
+        .prefetch_related("tags")
+    )
+    docs = [build_document(product) for product in products]
+    with transaction.atomic():
+        ProductSearchIndex.objects.filter(product_id__in=product_ids).delete()
+        ProductSearchIndex.objects.bulk_create(docs)
+
+
+def search_products(queryset, query):
+    """
+    Restrict a Product queryset to rows matching `query` (prefix match on
+    every term) and annotate `search_rank` — higher is more relevant —
+    plus `search_rank_key`, the rank as an integer to sort and page on.
+    Also accepts querysets of models keyed by product (e.g. ProductCard).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    opts = queryset.model._meta
+    row_id = f"{opts.db_table}.{opts.pk.column}"
+
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        params = (" & ".join(f"{term}:*" for term in terms),)
+        match_sql = (
+            f"SELECT product_id FROM {SEARCH_TABLE} "
+            f"WHERE search_vector @@ to_tsquery('simple', %s)"
+        )
+        rank_sql = (
+            f"SELECT ts_rank(search_vector, to_tsquery('simple', %s)) "
+            f"FROM {SEARCH_TABLE} WHERE product_id = {row_id}"
+        )
+    elif vendor == "sqlite":
+        params = (" ".join(f'"{term}"*' for term in terms),)
+        match_sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        rank_sql = (
+            f"SELECT -bm25({FTS_TABLE}, {_BM25_WEIGHTS}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {row_id}"
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(name__icontains=term)
+                | Q(keywords__icontains=term)
+                | Q(body__icontains=term)
+            )
+        matches = ProductSearchIndex.objects.filter(condition).values("product_id")
+        return _with_rank_key(
+            queryset.filter(pk__in=matches).annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        )
+
+    return _with_rank_key(
+        queryset.filter(pk__in=RawSQL(match_sql, params)).annotate(
+            search_rank=RawSQL(rank_sql, params, output_field=FloatField())
+        )
+    )
+
+
+def _with_rank_key(queryset):
+    # A float rank does not survive a keyset cursor's JSON round trip and
+    # equality tie-break exactly; this integer copy of it does.
+    return queryset.annotate(
+        search_rank_key=Cast(F("search_rank") * Value(RANK_SCALE), BigIntegerField())
+    )
@@ -6,8 +6,10 @@ from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.db import transaction
+from django.db.models.manager import BaseManager
 
 from .models import *
+from .offers import OfferResolver
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -145,6 +147,20 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ["id", "image"]
 
 
+class ProductListSerializer(serializers.ListSerializer):
+    """Resolves offers for the whole page in one query before serializing."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, BaseManager) else data
+        products = list(iterable)
+        self.prepare(products)
+        return super().to_representation(products)
+
+    def prepare(self, products):
+        # Also called by api/fast_serializers.serialize_many.
+        self._context = {**self._context, "offer_resolver": OfferResolver(products)}
+
+
 class ProductSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all(), required=False
@@ -180,28 +196,13 @@ class ProductSerializer(serializers.ModelSerializer):
             "rejection_reason",
         ]
         read_only_fields = ["seller", "seller_name", "seller_avatar", "approval_status", "rejection_reason"]
+        list_serializer_class = ProductListSerializer
 
     def get_effective_price(self, obj):
-        from django.utils import timezone
-        from django.db.models import Q
-        now = timezone.now()
-        time_filter = Q(starts_at__isnull=True) | Q(starts_at__lte=now)
-        expiry_filter = Q(expires_at__isnull=True) | Q(expires_at__gte=now)
-        # 1) Product-specific active offer
-        offer = SellerOffer.objects.filter(
-            product=obj, is_active=True,
-        ).filter(time_filter, expiry_filter).first()
-        # 2) Seller-wide offer (no product = applies to ALL seller products)
-        if not offer and obj.seller_id:
-            offer = SellerOffer.objects.filter(
-                seller_id=obj.seller_id,
-                product__isnull=True,
-                is_active=True,
-            ).filter(time_filter, expiry_filter).first()
-        if offer and offer.discount_percent:
-            discount = offer.discount_percent / 100
-            return str(obj.price * (1 - discount))
-        return None
+        # Product-specific offer first, then a seller-wide one. List
+        # serialization shares one resolver (one query) across the page.
+        resolver = self.context.get("offer_resolver") or OfferResolver([obj])
+        return resolver.effective_price(obj)
 
     def create(self, validated_data):
         # Extract extra data
@@ -662,6 +663,8 @@ class OrderSerializer(serializers.ModelSerializer):
             "shipping_address",
             "note",
             "items",
+            "items_total",
+            "grand_total",
             "total_price",
             "created_at",
             "updated_at",
@@ -672,6 +675,8 @@ class OrderSerializer(serializers.ModelSerializer):
             "payment",
             "payment_id",
             "payment_status",
+            "items_total",
+            "grand_total",
             "total_price",
             "created_at",
             "updated_at",
@@ -688,6 +693,19 @@ class OrderSerializer(serializers.ModelSerializer):
         return None
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """One row of an order list with ?summary=1 (see MyOrdersView)."""
+
+    total = serializers.DecimalField(
+        source="grand_total", max_digits=10, decimal_places=2, read_only=True
+    )
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "status", "total", "item_count", "created_at"]
+
+
 class OrderStatusUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
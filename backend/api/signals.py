@@ -0,0 +1,436 @@
+"""
+Model signal handlers that keep derived data in sync with the catalog.
+Connected in ApiConfig.ready().
+"""
+
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .cache_utils import invalidate_namespaces, seller_namespace
+from .cards import cards_enabled, refresh_cards, refresh_seller_cards
+from .kpis import ACTIVE_PRODUCTS, ORDERS, REVENUE, USERS, counted_amounts
+from .kpis import bump as bump_kpi
+from .models import (
+    CarouselImg,
+    Category,
+    Contact,
+    Order,
+    OrderItem,
+    Product,
+    ProductImage,
+    SellerOffer,
+    SellerProfile,
+    Service,
+    Tag,
+)
+from .orders import refresh_order_totals
+from .rollups import (
+    COUNTED_STATUSES,
+    add_order,
+    item_change_finished,
+    item_change_started,
+    remove_order,
+)
+from .search import index_products
+
+User = get_user_model()
+
+
+# ─── Search index ──────────────────────────────────────────────────────────────
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_products([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def index_product_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # tag.products.add/remove/clear — instance is the Tag.
+        if action == "pre_clear":
+            instance._search_reindex_ids = list(
+                instance.products.values_list("pk", flat=True)
+            )
+        elif action in ("post_add", "post_remove"):
+            index_products(pk_set)
+        elif action == "post_clear":
+            index_products(getattr(instance, "_search_reindex_ids", []))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        index_products([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Category)
+def index_renamed_group(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and "name" not in update_fields):
+        return
+    index_products(instance.products.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=SellerProfile)
+def index_seller_products(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and "business_name" not in update_fields):
+        return
+    index_products(instance.products.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=SellerProfile)
+def remember_grouped_products(sender, instance, **kwargs):
+    # The related rows are detached without per-product signals, so note
+    # which documents need rebuilding once the delete has gone through.
+    instance._search_reindex_ids = list(instance.products.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SellerProfile)
+def index_orphaned_products(sender, instance, **kwargs):
+    index_products(getattr(instance, "_search_reindex_ids", []))
+
+
+# ─── Product cards ─────────────────────────────────────────────────────────────
+# Saves rebuild the card inside the writing transaction. Deletes defer the
+# rebuild to after commit: mid-cascade the product may still exist and a
+# rebuilt card would then block its deletion.
+# With SERVE_PRODUCT_CARDS off nothing reads the cards and none of this
+# runs; `manage.py rebuild_product_cards` catches them up before it is
+# turned on.
+
+
+def _if_cards_enabled(handler):
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        if cards_enabled():
+            handler(*args, **kwargs)
+
+    return wrapper
+
+
+def _refresh_cards_after_commit(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: refresh_cards(product_ids))
+
+
+@receiver(post_save, sender=Product)
+@_if_cards_enabled
+def card_saved_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_cards([instance.pk])
+
+
+@receiver(pre_delete, sender=Product)
+@_if_cards_enabled
+def remember_offer_seller(sender, instance, **kwargs):
+    # Deleting a product nulls SellerOffer.product without signals, turning
+    # its offers seller-wide — every card of that seller may change.
+    if instance.seller_id and instance.offers.exists():
+        instance._card_seller_id = instance.seller_id
+
+
+@receiver(post_delete, sender=Product)
+@_if_cards_enabled
+def card_deleted_product(sender, instance, **kwargs):
+    seller_id = getattr(instance, "_card_seller_id", None)
+    if seller_id:
+        transaction.on_commit(lambda: refresh_seller_cards(seller_id))
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+@_if_cards_enabled
+def card_product_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action == "pre_clear":
+            instance._card_refresh_ids = list(
+                instance.products.values_list("pk", flat=True)
+            )
+        elif action in ("post_add", "post_remove"):
+            refresh_cards(pk_set)
+        elif action == "post_clear":
+            refresh_cards(getattr(instance, "_card_refresh_ids", []))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        refresh_cards([instance.pk])
+
+
+@receiver(post_save, sender=ProductImage)
+@_if_cards_enabled
+def card_saved_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_cards([instance.product_id])
+
+
+@receiver(post_delete, sender=ProductImage)
+@_if_cards_enabled
+def card_deleted_image(sender, instance, **kwargs):
+    _refresh_cards_after_commit([instance.product_id])
+
+
+@receiver(pre_save, sender=SellerOffer)
+@_if_cards_enabled
+def remember_offer_target(sender, instance, raw=False, **kwargs):
+    # An edited offer may have moved off a product (or seller) whose card
+    # still shows its discount.
+    if raw or not instance.pk:
+        return
+    instance._card_previous_target = (
+        SellerOffer.objects.filter(pk=instance.pk)
+        .values_list("product_id", "seller_id")
+        .first()
+    )
+
+
+def _refresh_offer_target(product_id, seller_id):
+    if product_id:
+        refresh_cards([product_id])
+    elif seller_id:
+        refresh_seller_cards(seller_id)
+
+
+@receiver(post_save, sender=SellerOffer)
+@_if_cards_enabled
+def card_saved_offer(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    target = (instance.product_id, instance.seller_id)
+    previous = getattr(instance, "_card_previous_target", None)
+    if previous and previous != target:
+        _refresh_offer_target(*previous)
+    _refresh_offer_target(*target)
+
+
+@receiver(post_delete, sender=SellerOffer)
+@_if_cards_enabled
+def card_deleted_offer(sender, instance, **kwargs):
+    target = (instance.product_id, instance.seller_id)
+    transaction.on_commit(lambda: _refresh_offer_target(*target))
+
+
+@receiver(post_save, sender=SellerProfile)
+@_if_cards_enabled
+def card_seller_products(sender, instance, raw=False, update_fields=None, **kwargs):
+    card_fields = {"business_name", "avatar", "is_active"}
+    if raw or (update_fields and not card_fields & set(update_fields)):
+        return
+    refresh_seller_cards(instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SellerProfile)
+@_if_cards_enabled
+def card_orphaned_products(sender, instance, **kwargs):
+    # Ids captured by remember_grouped_products above.
+    _refresh_cards_after_commit(getattr(instance, "_search_reindex_ids", []))
+
+
+# ─── Order totals ──────────────────────────────────────────────────────────────
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_totals_for_item(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    updated = refresh_order_totals(Order.objects.filter(pk=instance.order_id))
+    # Keep a caller's in-memory order current so a later full save()
+    # doesn't write the old totals back.
+    if updated and OrderItem.order.is_cached(instance):
+        instance.order.refresh_from_db(fields=["items_total", "grand_total"])
+
+
+# ─── Sales rollups ─────────────────────────────────────────────────────────────
+# See api/rollups.py. The previous status is read from the database (and
+# locked inside a transaction), so a save from a stale instance still rolls
+# up exactly the transition it writes.
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or (update_fields and "status" not in update_fields):
+        return
+    current = Order.objects.filter(pk=instance.pk)
+    if transaction.get_connection().in_atomic_block:
+        current = current.select_for_update()
+    instance._rollup_previous_status = current.values_list("status", flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def roll_up_order_status(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and "status" not in update_fields):
+        return
+    previous = None if created else getattr(instance, "_rollup_previous_status", None)
+    was_counted = previous in COUNTED_STATUSES
+    if instance.status in COUNTED_STATUSES and not was_counted:
+        add_order(instance.pk)
+    elif was_counted and instance.status not in COUNTED_STATUSES:
+        remove_order(instance.pk)
+
+
+@receiver(pre_save, sender=OrderItem)
+@receiver(pre_delete, sender=OrderItem)
+def remember_order_contributions(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw:
+        instance._rollup_change = item_change_started(instance.order_id, origin)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def roll_up_item(sender, instance, raw=False, **kwargs):
+    change = getattr(instance, "_rollup_change", None)
+    if not raw and change is not None:
+        item_change_finished(change)
+
+
+# ─── KPI counters ──────────────────────────────────────────────────────────────
+# See api/kpis.py. Deltas are written in the saving transaction; item
+# writes move revenue through the sales rollups above.
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_active(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or (update_fields and "is_active" not in update_fields):
+        return
+    instance._kpi_was_active = (
+        Product.objects.filter(pk=instance.pk).values_list("is_active", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and "is_active" not in update_fields):
+        return
+    was_active = False if created else bool(getattr(instance, "_kpi_was_active", False))
+    bump_kpi(ACTIVE_PRODUCTS, int(instance.is_active) - int(was_active))
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    if instance.is_active:
+        bump_kpi(ACTIVE_PRODUCTS, -1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Order)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_kpi(ORDERS if sender is Order else USERS, 1)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Order)
+def count_deleted(sender, instance, **kwargs):
+    bump_kpi(ORDERS if sender is Order else USERS, -1)
+
+
+def _counted_revenue(order_id):
+    amounts = counted_amounts(order_id)
+    return amounts[0] if amounts else 0
+
+
+def _moves_revenue(update_fields):
+    # Order.save() adds grand_total whenever items_total or discount_amount is saved.
+    return not update_fields or {"status", "grand_total"} & set(update_fields)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_revenue(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or not _moves_revenue(update_fields):
+        return
+    instance._kpi_previous_revenue = _counted_revenue(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def count_order_revenue(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _moves_revenue(update_fields):
+        return
+    previous = 0 if created else getattr(instance, "_kpi_previous_revenue", 0)
+    bump_kpi(REVENUE, _counted_revenue(instance.pk) - previous)
+
+
+@receiver(pre_delete, sender=Order)
+def remember_counted_discount(sender, instance, **kwargs):
+    # The cascade deletes the items first and their signals take back
+    # items_total; what the order still counts then is minus its discount.
+    amounts = counted_amounts(instance.pk)
+    instance._kpi_counted_discount = amounts[1] if amounts else 0
+
+
+@receiver(post_delete, sender=Order)
+def count_deleted_order_revenue(sender, instance, **kwargs):
+    bump_kpi(REVENUE, getattr(instance, "_kpi_counted_discount", 0))
+
+
+# ─── Cache namespaces ──────────────────────────────────────────────────────────
+# Each write bumps only its own model's namespace (plus the owning seller's),
+# after commit so readers can't re-cache the pre-write state under the new
+# version. Readers declare what they depend on in cache_api_response.
+
+MODEL_NAMESPACES = {
+    Product: "products",
+    ProductImage: "products",
+    SellerOffer: "offers",
+    SellerProfile: "sellers",
+    Category: "categories",
+    Tag: "tags",
+    CarouselImg: "carousel",
+    Service: "services",
+    Contact: "contacts",
+    Order: "orders",
+}
+
+
+def _owning_seller_id(instance):
+    if isinstance(instance, SellerProfile):
+        return instance.pk
+    if isinstance(instance, ProductImage):
+        return Product.objects.filter(pk=instance.product_id).values_list(
+            "seller_id", flat=True
+        ).first()
+    return getattr(instance, "seller_id", None)
+
+
+def _bump_namespaces_for(instance):
+    namespaces = [MODEL_NAMESPACES[type(instance)]]
+    seller_id = _owning_seller_id(instance)
+    if seller_id:
+        namespaces.append(seller_namespace(seller_id))
+    transaction.on_commit(lambda: invalidate_namespaces(*namespaces))
+
+
+def bump_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_namespaces_for(instance)
+
+
+def bump_on_delete(sender, instance, **kwargs):
+    _bump_namespaces_for(instance)
+
+
+for model in MODEL_NAMESPACES:
+    post_save.connect(bump_on_save, sender=model, dispatch_uid=f"cache_ns_save_{model.__name__}")
+    post_delete.connect(bump_on_delete, sender=model, dispatch_uid=f"cache_ns_delete_{model.__name__}")
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def bump_on_product_tags(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    namespaces = ["products", "tags"]
+    if not reverse and instance.seller_id:
+        namespaces.append(seller_namespace(instance.seller_id))
+    transaction.on_commit(lambda: invalidate_namespaces(*namespaces))
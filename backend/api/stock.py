@@ -0,0 +1,247 @@
+"""
+Stock reservation for checkout.
+
+Available units live in StockCounter rows, never on the Product row, so
+product edits and checkouts do not overwrite each other. A product
+without counters is not stock-tracked and is never refused.
+
+reserve_stock() takes units with conditional UPDATEs (`available >=
+quantity`), so the database itself refuses an oversell, and records them
+as pending StockReservations. It runs in its own short transaction:
+callers reserve *before* opening the order transaction, so a counter row
+is locked for a few statements, not for a whole checkout. The order then
+commits the reservation, or it is released explicitly, or it expires
+after RESERVATION_TTL and release_expired() puts the units back. An
+order paid later at a gateway holds its reservation instead
+(hold_stock()) until the payment webhook commits or releases it.
+
+Hot products get several counter shards (set_stock(..., shards=N)):
+each checkout picks a random shard that can cover it, so concurrent
+buyers of a flash-sale item mostly update different rows.
+"""
+
+import logging
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import StockCounter, StockReservation
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL = timedelta(minutes=15)
+HOT_PRODUCT_SHARDS = 8
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f"Product {product_id} does not have {requested} unit(s) in stock")
+
+
+def stock_levels(product_ids):
+    """{product_id: units available} for the stock-tracked ones."""
+    return dict(
+        StockCounter.objects.filter(product_id__in=product_ids)
+        .order_by()
+        .values("product_id")
+        .annotate(total=Sum("available"))
+        .values_list("product_id", "total")
+    )
+
+
+@transaction.atomic
+def set_stock(product, quantity, shards=1):
+    """
+    Set the units available now (pending reservations excluded) and how
+    many counter shards hold them. shards=0 stops tracking the product.
+    """
+    product_id = getattr(product, "pk", product)
+    StockCounter.objects.filter(product_id=product_id).delete()
+    if shards <= 0:
+        return
+    base, extra = divmod(quantity, shards)
+    StockCounter.objects.bulk_create(
+        StockCounter(product_id=product_id, shard=shard, available=base + (shard < extra))
+        for shard in range(shards)
+    )
+
+
+# ─── Reserving ─────────────────────────────────────────────────────────────────
+
+
+def _take(product_id, shard, quantity):
+    return StockCounter.objects.filter(
+        product_id=product_id, shard=shard, available__gte=quantity
+    ).update(available=F("available") - quantity)
+
+
+def _reserve_line(product_id, quantity, shards):
+    """
+    Take `quantity` units of one product; `shards` is {shard: available}
+    as last read. Returns [(shard, units), ...] or raises OutOfStock.
+    """
+    # Common case: one shard covers the line. Random order spreads load.
+    candidates = [shard for shard, available in shards.items() if available >= quantity]
+    random.shuffle(candidates)
+    for shard in candidates:
+        if _take(product_id, shard, quantity):
+            return [(shard, quantity)]
+
+    # Otherwise gather from several shards, in ascending order so that two
+    # checkouts doing this cannot lock the same rows in opposite orders.
+    taken, remaining = [], quantity
+    for shard in sorted(shards):
+        units = min(shards[shard], remaining)
+        if units > 0 and _take(product_id, shard, units):
+            taken.append((shard, units))
+            remaining -= units
+            if not remaining:
+                return taken
+    raise OutOfStock(product_id, quantity)
+
+
+@transaction.atomic(durable=True)
+def _reserve(lines, owner, order, ttl):
+    product_ids = sorted(lines)
+    shards = defaultdict(dict)
+    for product_id, shard, available in StockCounter.objects.filter(
+        product_id__in=product_ids
+    ).values_list("product_id", "shard", "available"):
+        shards[product_id][shard] = available
+
+    expires_at = timezone.now() + ttl
+    reservations = []
+    # Products in id order: concurrent multi-item checkouts lock in one order.
+    for product_id in product_ids:
+        if product_id not in shards:
+            continue  # not stock-tracked
+        for shard, units in _reserve_line(product_id, lines[product_id], shards[product_id]):
+            reservations.append(
+                StockReservation(
+                    product_id=product_id,
+                    shard=shard,
+                    quantity=units,
+                    owner=owner,
+                    order=order,
+                    expires_at=expires_at,
+                )
+            )
+    return StockReservation.objects.bulk_create(reservations)
+
+
+def reserve_stock(lines, owner=None, order=None, ttl=RESERVATION_TTL):
+    """
+    Reserve [(product_id, quantity), ...] all-or-nothing and return the
+    pending reservations. Must not be called inside a transaction. On a
+    shortfall, expired reservations of that product are released and the
+    reservation retried once before OutOfStock is raised.
+    """
+    wanted = defaultdict(int)
+    for product_id, quantity in lines:
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            continue  # the caller reports unknown products
+        if quantity > 0:
+            wanted[product_id] += quantity
+    if owner is not None and not owner.is_authenticated:
+        owner = None
+
+    try:
+        return _reserve(wanted, owner, order, ttl)
+    except OutOfStock as e:
+        if not release_expired(product_ids=[e.product_id]):
+            raise
+    return _reserve(wanted, owner, order, ttl)
+
+
+# ─── Committing and releasing ──────────────────────────────────────────────────
+
+
+def commit_stock(reservations, order):
+    """Attach pending reservations to their order for good."""
+    return StockReservation.objects.filter(
+        pk__in=[r.pk for r in reservations], status=StockReservation.Status.PENDING
+    ).update(status=StockReservation.Status.COMMITTED, order=order)
+
+
+def hold_stock(reservations, order):
+    """Attach pending reservations to an order that is still awaiting payment."""
+    return StockReservation.objects.filter(
+        pk__in=[r.pk for r in reservations], status=StockReservation.Status.PENDING
+    ).update(order=order)
+
+
+def commit_order_stock(order):
+    """Commit the order's pending reservations (its payment went through)."""
+    committed = StockReservation.objects.filter(
+        order=order, status=StockReservation.Status.PENDING
+    ).update(status=StockReservation.Status.COMMITTED)
+    if StockReservation.objects.filter(
+        order=order, status=StockReservation.Status.RELEASED
+    ).exists():
+        logger.warning(f"Order #{order.pk} was paid after part of its stock reservation expired")
+    return committed
+
+
+def _give_back(reservations):
+    returned = defaultdict(int)
+    for reservation in reservations:
+        returned[(reservation.product_id, reservation.shard)] += reservation.quantity
+    for (product_id, shard), quantity in sorted(returned.items()):
+        if StockCounter.objects.filter(product_id=product_id, shard=shard).update(
+            available=F("available") + quantity
+        ):
+            continue
+        # The product was re-sharded meanwhile; any of its counters will do.
+        counter = StockCounter.objects.filter(product_id=product_id).order_by("shard").first()
+        if counter is not None:
+            StockCounter.objects.filter(pk=counter.pk).update(
+                available=F("available") + quantity
+            )
+
+
+@transaction.atomic
+def _release(queryset):
+    reservations = list(
+        queryset.filter(status=StockReservation.Status.PENDING).select_for_update(
+            skip_locked=True
+        )
+    )
+    if not reservations:
+        return 0
+    StockReservation.objects.filter(pk__in=[r.pk for r in reservations]).update(
+        status=StockReservation.Status.RELEASED
+    )
+    _give_back(reservations)
+    return len(reservations)
+
+
+def release_stock(reservations):
+    """Return pending reservations to stock (checkout failed or was abandoned)."""
+    if not reservations:
+        return 0
+    return _release(StockReservation.objects.filter(pk__in=[r.pk for r in reservations]))
+
+
+def release_order_stock(order):
+    return _release(StockReservation.objects.filter(order=order))
+
+
+def release_expired(product_ids=None, limit=1000):
+    """Release up to `limit` pending reservations past their expiry."""
+    expired = StockReservation.objects.filter(
+        status=StockReservation.Status.PENDING, expires_at__lte=timezone.now()
+    )
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=product_ids)
+    pks = list(expired.order_by("expires_at").values_list("pk", flat=True)[:limit])
+    if not pks:
+        return 0
+    return _release(StockReservation.objects.filter(pk__in=pks))
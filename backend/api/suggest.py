@@ -0,0 +1,194 @@
+"""
+Search-box autocomplete served from a per-process prefix index.
+
+Product, category and tag names are normalized with unidecode (so Arabic
+and Latin input meet on the same keys) and stored once per word start in
+a sorted list per kind; a suggestion is a bisect plus a short forward
+scan in each list, with no database query.
+
+Freshness comes from the cache namespace versions bumped by
+api/signals.py. At most every REFRESH_INTERVAL seconds a request compares
+them with the versions the index was built from: products changed since
+the last sync are patched in place, while category, tag and seller
+changes reload the affected part.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from unidecode import unidecode
+
+from .cache_utils import get_namespace_versions
+from .models import Category, Product, Tag
+
+NAMESPACES = ("products", "sellers", "categories", "tags")
+REFRESH_INTERVAL = 2.0
+# Overlap between syncs so rows saved by transactions that committed late
+# (or on a server with a skewed clock) are still picked up.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+MAX_WORDS = 6
+DEFAULT_SUGGESTIONS = 5
+MAX_SUGGESTIONS = 10
+KINDS = ("products", "categories", "tags")
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def normalize(text):
+    return " ".join(_WORD_RE.findall(unidecode(text or "").lower()))
+
+
+def index_keys(name):
+    """Every word start of the normalized name: 'galaxy s24', 's24'."""
+    words = normalize(name).split()[:MAX_WORDS]
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    """
+    Sorted (key, id) tuples for each kind, plus labels. Each kind is its
+    own list so that a common prefix matching thousands of products still
+    reaches the categories and tags. Immutable once published: updates
+    build a patched copy so concurrent readers never see a list mid-shift.
+    """
+
+    def __init__(self, entries=(), labels=None):
+        self.entries = {kind: [] for kind in KINDS}
+        for key, kind, pk in entries:
+            self.entries[kind].append((key, pk))
+        for kind_entries in self.entries.values():
+            kind_entries.sort()
+        self.labels = labels or {}
+
+    def replace(self, kinds=(), remove=(), add=()):
+        """
+        Copy of the index without every item of `kinds` and the (kind, id)
+        pairs in `remove`, plus the (kind, id, name) items in `add`.
+        """
+        kinds, remove = set(kinds), set(remove)
+        labels = {
+            item: name
+            for item, name in self.labels.items()
+            if item[0] not in kinds and item not in remove
+        }
+        entries = [
+            (key, kind, pk)
+            for kind, kind_entries in self.entries.items()
+            if kind not in kinds
+            for key, pk in kind_entries
+            if (kind, pk) not in remove
+        ]
+        for kind, pk, name in add:
+            labels[(kind, pk)] = name
+            entries.extend((key, kind, pk) for key in index_keys(name))
+        return PrefixIndex(entries, labels)
+
+    def lookup(self, query, limit=DEFAULT_SUGGESTIONS):
+        prefix = normalize(query)
+        results = {kind: [] for kind in KINDS}
+        if not prefix:
+            return results
+
+        for kind, entries in self.entries.items():
+            bucket, seen = results[kind], set()
+            # An item appears at most MAX_WORDS times, so a full bucket
+            # is never more than limit × MAX_WORDS entries away.
+            i = bisect_left(entries, (prefix,))
+            while len(bucket) < limit and i < len(entries) and entries[i][0].startswith(prefix):
+                pk = entries[i][1]
+                i += 1
+                if pk not in seen:
+                    seen.add(pk)
+                    bucket.append({"id": pk, "name": self.labels[(kind, pk)]})
+        return results
+
+
+def _listed_products():
+    return (
+        Product.objects.filter(
+            is_active=True, approval_status=Product.ApprovalStatus.APPROVED
+        )
+        .exclude(seller__is_active=False)
+        .order_by()
+    )
+
+
+def _product_items(queryset):
+    return [("products", pk, name) for pk, name in queryset.values_list("pk", "name")]
+
+
+def _group_items(kind, model):
+    return [(kind, pk, name) for pk, name in model.objects.values_list("pk", "name")]
+
+
+class SuggestionService:
+    def __init__(self):
+        self.index = PrefixIndex()
+        self.versions = None
+        self.synced_at = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def suggest(self, query, limit=DEFAULT_SUGGESTIONS):
+        self.refresh_if_stale()
+        return self.index.lookup(query, limit)
+
+    def refresh_if_stale(self):
+        if time.monotonic() - self.checked_at < REFRESH_INTERVAL:
+            return
+        with self._lock:
+            if time.monotonic() - self.checked_at < REFRESH_INTERVAL:
+                return
+            versions = get_namespace_versions(NAMESPACES)
+            if not getattr(settings, "ENABLE_CACHING", True):
+                # Writes don't bump versions then; rebuild on every check.
+                self.synced_at = None
+            if self.synced_at is None or versions != self.versions:
+                self.sync(versions)
+            self.checked_at = time.monotonic()
+
+    def sync(self, versions):
+        now = timezone.now()
+        previous = self.versions or {}
+        changed = {ns for ns in NAMESPACES if previous.get(ns) != versions[ns]}
+        index = self.index
+
+        if self.synced_at is None or "sellers" in changed:
+            # Seller suspension hides products without touching them.
+            index = index.replace(
+                kinds=["products"], add=_product_items(_listed_products())
+            )
+        elif "products" in changed:
+            listed = set(_listed_products().values_list("pk", flat=True))
+            indexed = {pk for kind, pk in index.labels if kind == "products"}
+            renamed = set(
+                Product.objects.filter(
+                    updated_at__gte=self.synced_at - SYNC_OVERLAP
+                ).values_list("pk", flat=True)
+            )
+            # Bulk approvals use queryset.update() and leave updated_at alone,
+            # so newly listed ids are diffed in as well.
+            stale = (indexed - listed) | renamed
+            fresh = (listed - indexed) | (listed & renamed)
+            add = _product_items(_listed_products().filter(pk__in=fresh)) if fresh else []
+            index = index.replace(remove={("products", pk) for pk in stale}, add=add)
+
+        if self.synced_at is None or "categories" in changed:
+            index = index.replace(
+                kinds=["categories"], add=_group_items("categories", Category)
+            )
+        if self.synced_at is None or "tags" in changed:
+            index = index.replace(kinds=["tags"], add=_group_items("tags", Tag))
+
+        self.index = index
+        self.versions = versions
+        self.synced_at = now
+
+
+suggestions = SuggestionService()
@@ -1,3 +1,912 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    CarouselImg,
+    Category,
+    Contact,
+    Coupon,
+    CouponUsage,
+    DailyProductSales,
+    DailySellerSales,
+    IdempotencyRecord,
+    Order,
+    OrderItem,
+    Payment,
+    Product,
+    ProductCard,
+    ProductImage,
+    SellerOffer,
+    SellerProfile,
+    Service,
+    StockCounter,
+    StockReservation,
+    Tag,
+    WebhookEvent,
+)
+from .orders import create_order, price_items
+from .kpis import ACTIVE_PRODUCTS, KPIS, ORDERS, REVENUE, USERS, kpi_values, reconcile
+from .rollups import rebuild
+from .suggest import PrefixIndex
+from .stock import (
+    OutOfStock,
+    release_expired,
+    release_stock,
+    reserve_stock,
+    set_stock,
+    stock_levels,
+)
+from .webhooks import (
+    PAYMOB_TOKEN_HMAC_FIELDS,
+    WebhookVerificationError,
+    drain,
+    parse_paymob,
+    record_event,
+)
+
+backfill_rollups = import_module("api.migrations.0024_sales_rollups").backfill_rollups
+
+
+def make_product(name="Flash sale item"):
+    return Product.objects.create(
+        name=name, description="Test product", price=Decimal("10.00"), image="products/x.jpg"
+    )
+
+
+class StockReservationTests(TestCase):
+    def test_untracked_products_are_never_refused(self):
+        product = make_product()
+        self.assertEqual(reserve_stock([(product.pk, 1000)]), [])
+
+    def test_reservation_is_all_or_nothing(self):
+        a, b = make_product("A"), make_product("B")
+        set_stock(a, 5)
+        set_stock(b, 1)
+        with self.assertRaises(OutOfStock) as raised:
+            reserve_stock([(a.pk, 2), (b.pk, 2)])
+        self.assertEqual(raised.exception.product_id, b.pk)
+        self.assertEqual(stock_levels([a.pk, b.pk]), {a.pk: 5, b.pk: 1})
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_line_spanning_several_shards(self):
+        product = make_product()
+        set_stock(product, 10, shards=4)
+        reservations = reserve_stock([(product.pk, 9)])
+        self.assertEqual(sum(r.quantity for r in reservations), 9)
+        self.assertEqual(stock_levels([product.pk]), {product.pk: 1})
+
+        release_stock(reservations)
+        self.assertEqual(stock_levels([product.pk]), {product.pk: 10})
+
+    def test_expired_reservations_are_reclaimed_on_shortfall(self):
+        product = make_product()
+        set_stock(product, 3)
+        abandoned = reserve_stock([(product.pk, 3)], ttl=timedelta(seconds=-1))
+        self.assertEqual(len(abandoned), 1)
+
+        reservations = reserve_stock([(product.pk, 2)])
+        self.assertEqual(reservations[0].quantity, 2)
+        self.assertEqual(stock_levels([product.pk]), {product.pk: 1})
+        self.assertEqual(release_expired(), 0)
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    """
+    Many buyers hammering one product at once must never take more units
+    than exist. Runs against the configured database; SQLite serializes
+    writers and reports the contention as "table is locked", so workers
+    retry those like a client would.
+    """
+
+    THREADS = 16
+    ATTEMPTS_PER_THREAD = 12
+    STOCK = 60
+
+    def hammer(self, product):
+        results = Counter()
+        shards_used = Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS)
+
+        def buyer():
+            start.wait()
+            try:
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    while True:
+                        try:
+                            reservations = reserve_stock([(product.pk, 1)])
+                        except OutOfStock:
+                            outcome, shards = "refused", []
+                        except OperationalError:
+                            time.sleep(0.005)
+                            continue
+                        else:
+                            outcome, shards = "reserved", [r.shard for r in reservations]
+                        break
+                    with lock:
+                        results[outcome] += 1
+                        shards_used.update(shards)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, shards_used
+
+    def assert_no_oversell(self, product, results):
+        self.assertEqual(results["reserved"], self.STOCK)
+        self.assertEqual(
+            results["refused"], self.THREADS * self.ATTEMPTS_PER_THREAD - self.STOCK
+        )
+        self.assertEqual(stock_levels([product.pk]), {product.pk: 0})
+        self.assertEqual(
+            sum(StockReservation.objects.values_list("quantity", flat=True)), self.STOCK
+        )
+
+    def test_single_counter(self):
+        product = make_product()
+        set_stock(product, self.STOCK)
+        results, _ = self.hammer(product)
+        self.assert_no_oversell(product, results)
+
+    def test_hot_product_spreads_over_shards(self):
+        product = make_product()
+        set_stock(product, self.STOCK, shards=8)
+        results, shards_used = self.hammer(product)
+        self.assert_no_oversell(product, results)
+        # Buyers landed on every shard rather than queueing on one row.
+        self.assertEqual(set(shards_used), set(range(8)))
+        self.assertFalse(StockCounter.objects.filter(product=product, available__gt=0).exists())
+
+
+class CouponRedemptionTests(TestCase):
+    """Coupon.redeem() counts a use only while both limits allow it."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user("alice", "a@example.com", "pw")
+        self.bob = User.objects.create_user("bob", "b@example.com", "pw")
+
+    def make_coupon(self, **limits):
+        return Coupon.objects.create(code="SAVE10", discount_value=10, **limits)
+
+    def test_usage_limit(self):
+        coupon = self.make_coupon(max_uses_total=2, max_uses_per_user=5)
+        self.assertEqual(coupon.redeem(self.alice), (True, "Redeemed."))
+        self.assertEqual(coupon.redeem(self.bob), (True, "Redeemed."))
+        self.assertEqual(coupon.redeem(self.bob), (False, "Coupon usage limit reached."))
+        # The refused use is rolled back together with the per-user count.
+        self.assertEqual(coupon.uses_by(self.bob), 1)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 2)
+        self.assertEqual(coupon.is_valid(self.alice)[1], "Coupon usage limit reached.")
+
+        # An already charged discount is counted past the limit.
+        self.assertEqual(coupon.redeem(self.bob, enforce_limits=False), (True, "Redeemed."))
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 3)
+
+    def test_per_user_limit(self):
+        coupon = self.make_coupon(max_uses_per_user=2)
+        self.assertTrue(coupon.redeem(self.alice)[0])
+        self.assertTrue(coupon.redeem(self.alice)[0])
+        self.assertEqual(coupon.redeem(self.alice), (False, "You have already used this coupon."))
+        self.assertEqual(coupon.is_valid(self.alice)[1], "You have already used this coupon.")
+        self.assertTrue(coupon.redeem(self.bob)[0])
+        self.assertEqual(
+            dict(CouponUsage.objects.values_list("user__username", "times_used")),
+            {"alice": 2, "bob": 1},
+        )
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 3)
+
+
+class CouponConcurrencyTests(TransactionTestCase):
+    """
+    Concurrent checkouts redeeming one coupon never exceed its limits.
+    Retries SQLite's "table is locked" like StockConcurrencyTests.
+    """
+
+    THREADS = 12
+    ATTEMPTS_PER_THREAD = 4
+
+    def hammer(self, coupon, users):
+        results = Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS)
+
+        def buyer(user):
+            start.wait()
+            try:
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    while True:
+                        try:
+                            redeemed, _ = Coupon.objects.get(pk=coupon.pk).redeem(user)
+                        except OperationalError:
+                            time.sleep(0.005)
+                            continue
+                        break
+                    with lock:
+                        results[redeemed] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        coupon.refresh_from_db()
+        return results
+
+    def test_usage_limit_under_concurrency(self):
+        User = get_user_model()
+        users = [User.objects.create_user(f"buyer-{i}") for i in range(self.THREADS)]
+        coupon = Coupon.objects.create(
+            code="FLASH", discount_value=10, max_uses_total=10, max_uses_per_user=2
+        )
+        results = self.hammer(coupon, users)
+        self.assertEqual(results[True], 10)
+        self.assertEqual(coupon.times_used, 10)
+        self.assertEqual(sum(CouponUsage.objects.values_list("times_used", flat=True)), 10)
+        self.assertLessEqual(
+            max(CouponUsage.objects.values_list("times_used", flat=True)), 2
+        )
+
+    def test_per_user_limit_under_concurrency(self):
+        user = get_user_model().objects.create_user("buyer")
+        coupon = Coupon.objects.create(code="ONCE", discount_value=10, max_uses_per_user=3)
+        results = self.hammer(coupon, [user] * self.THREADS)
+        self.assertEqual(results[True], 3)
+        self.assertEqual(coupon.times_used, 3)
+        self.assertEqual(coupon.uses_by(user), 3)
+
+
+class PaymentStockTests(TestCase):
+    """Held stock goes back when a checkout or its payment fails."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "pw")
+        self.product = make_product()
+        set_stock(self.product, 5)
+
+    def pending_order(self, **payment_fields):
+        payment = Payment.objects.create(
+            amount=Decimal("20.00"), user_email=self.user.email, **payment_fields
+        )
+        order = Order.objects.create(owner=self.user, status="pending", payment=payment)
+        reserve_stock([(self.product.pk, 2)], owner=self.user, order=order)
+        self.assertEqual(stock_levels([self.product.pk]), {self.product.pk: 3})
+        return order, payment
+
+    def assert_closed(self, order, payment, payment_status):
+        unprocessed = WebhookEvent.objects.exclude(status=WebhookEvent.Status.PROCESSED)
+        self.assertFalse(unprocessed.exists())
+        order.refresh_from_db()
+        payment.refresh_from_db()
+        self.assertEqual(order.status, "cancelled")
+        self.assertEqual(payment.status, payment_status)
+        self.assertEqual(stock_levels([self.product.pk]), {self.product.pk: 5})
+
+    def test_stripe_payment_failed_releases_stock(self):
+        order, payment = self.pending_order(stripe_payment_id="pi_failed")
+        # Intents created before orders were linked to their payment
+        Order.objects.filter(pk=order.pk).update(payment=None)
+        intent = {"id": "pi_failed", "metadata": {"order_id": str(order.pk)}}
+        payload = json.dumps({"data": {"object": intent}})
+        record_event(
+            WebhookEvent.Provider.STRIPE, "evt_1", "payment_intent.payment_failed", payload
+        )
+        self.assertEqual(drain(), (1, 0))
+        self.assert_closed(order, payment, "failed")
+
+    def place_order(self, payment_method):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            "/api/orders/create/",
+            {
+                "payment_method": payment_method,
+                "order_items": [{"id": self.product.pk, "quantity": 2}],
+                "shipping_address": "1 Nile St",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertEqual(order.status, "pending")
+        held = StockReservation.objects.get(order=order)
+        self.assertEqual(held.status, StockReservation.Status.PENDING)
+        self.assertEqual(stock_levels([self.product.pk]), {self.product.pk: 3})
+        return client, order
+
+    def paymob_checkout(self):
+        client, order = self.place_order("paymob_wallet")
+        with mock.patch("api.payment_gateways._paymob_call", side_effect=[77, "tok"]):
+            response = client.post("/api/payments/paymob/checkout/", {"order_id": order.pk})
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        return order, order.payment
+
+    def paymob_callback(self, success):
+        payload = json.dumps(
+            {"type": "TRANSACTION", "obj": {"order": {"id": 77}, "success": success}}
+        )
+        record_event(WebhookEvent.Provider.PAYMOB, "TRANSACTION:1", "TRANSACTION", payload)
+        self.assertEqual(drain(), (1, 0))
+
+    def test_paymob_payment_failed_releases_stock(self):
+        order, payment = self.paymob_checkout()
+        self.paymob_callback(success=False)
+        self.assert_closed(order, payment, "failed")
+
+    def test_paymob_payment_succeeded_commits_stock(self):
+        order, payment = self.paymob_checkout()
+        self.paymob_callback(success=True)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "confirmed")
+        held = StockReservation.objects.get(order=order)
+        self.assertEqual(held.status, StockReservation.Status.COMMITTED)
+        self.assertEqual(stock_levels([self.product.pk]), {self.product.pk: 3})
+
+    @override_settings(FAWRY_MERCHANT_CODE="merchant", FAWRY_SECURITY_CODE="secret")
+    def test_fawry_payment_expired_releases_stock(self):
+        client, order = self.place_order("fawry")
+        held = StockReservation.objects.get(order=order)
+        self.assertGreater(held.expires_at, order.created_at + timedelta(hours=72))
+        gateway = mock.Mock()
+        gateway.json.return_value = {"referenceNumber": "FR-1", "paymentUrl": ""}
+        with mock.patch("api.payment_gateways._session.post", return_value=gateway):
+            response = client.post("/api/payments/fawry/checkout/", {"order_id": order.pk})
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+
+        payload = json.dumps({"fawryRefNumber": "FR-1", "orderStatus": "EXPIRED"})
+        record_event(WebhookEvent.Provider.FAWRY, "FR-1:EXPIRED", "EXPIRED", payload)
+        self.assertEqual(drain(), (1, 0))
+        self.assert_closed(order, order.payment, "failed")
+
+    def create_intent(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post(
+            "/api/payments/create-intent/",
+            {"amount": 2000, "order_items": [{"id": self.product.pk, "quantity": 2}]},
+            format="json",
+        )
+
+    @mock.patch("stripe.PaymentIntent.create")
+    def test_payment_intent_links_the_order(self, create):
+        create.return_value = SimpleNamespace(id="pi_new", client_secret="secret")
+        response = self.create_intent()
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data["orderId"])
+        self.assertEqual(order.payment.stripe_payment_id, "pi_new")
+
+    @mock.patch("stripe.PaymentIntent.create")
+    def test_unexpected_payment_intent_error_releases_stock(self, create):
+        create.return_value = SimpleNamespace(id="pi_new", client_secret="secret")
+        with mock.patch.object(Payment.objects, "create", side_effect=RuntimeError("db down")):
+            response = self.create_intent()
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(stock_levels([self.product.pk]), {self.product.pk: 5})
+
+
+class IdempotentCheckoutTests(TestCase):
+    """Resending an Idempotency-Key to CreateOrderView never places a second order."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "pw")
+        self.product = make_product()
+        set_stock(self.product, 5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place_order(self, key, quantity=2):
+        return self.client.post(
+            "/api/orders/create/",
+            {
+                "payment_method": "cod",
+                "order_items": [{"id": self.product.pk, "quantity": quantity}],
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.place_order("checkout-1")
+        self.assertEqual(first.status_code, 201)
+        retry = self.place_order("checkout-1")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(stock_levels([self.product.pk]), {self.product.pk: 3})
+
+        self.assertEqual(self.place_order("checkout-2").status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_a_different_request(self):
+        self.assertEqual(self.place_order("checkout-1").status_code, 201)
+        response = self.place_order("checkout-1", quantity=1)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @mock.patch("api.idempotency.WAIT_TIMEOUT", 0.2)
+    def test_retry_while_the_first_request_runs(self):
+        self.assertEqual(self.place_order("checkout-1").status_code, 201)
+        # Put the claim back in flight, as if the first request were still running.
+        IdempotencyRecord.objects.update(
+            status_code=None, response_body="", claimed_at=timezone.now()
+        )
+        response = self.place_order("checkout-1")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_releases_the_key(self):
+        response = self.place_order("checkout-1", quantity=6)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        set_stock(self.product, 10)
+        self.assertEqual(self.place_order("checkout-1", quantity=6).status_code, 201)
+
+
+MONEY_COLUMNS = ("revenue", "platform_fee", "seller_payout")
+
+
+class SalesRollupTests(TestCase):
+    """The signal-maintained rollups always equal a rebuild from the orders."""
+
+    def setUp(self):
+        seller_user = get_user_model().objects.create_user("seller", "s@example.com", "pw")
+        self.seller = SellerProfile.objects.create(
+            user=seller_user,
+            business_name="Shop",
+            contact_phone="0100",
+            contact_email="s@example.com",
+            verification_status="approved",
+        )
+        self.buyer = get_user_model().objects.create_user("buyer", "b@example.com", "pw")
+        self.product = make_product("Sold by seller")
+        self.product.seller = self.seller
+        self.product.save()
+        self.house_product = make_product("Sold by the platform")
+
+    def rollups(self):
+        """Non-zero rollup rows of both tables, comparable across databases."""
+        cent = Decimal("0.01")
+        tables = []
+        for model, key in ((DailyProductSales, "product"), (DailySellerSales, "seller")):
+            rows = model.objects.values()
+            tables.append(
+                sorted(
+                    (
+                        row["day"],
+                        row[f"{key}_id"],
+                        row.get("orders", 0),
+                        row["units"],
+                        *(Decimal(row[column]).quantize(cent) for column in MONEY_COLUMNS),
+                    )
+                    for row in rows
+                    if row["units"] or row.get("orders")
+                )
+            )
+        return tables
+
+    def assert_rebuildable(self):
+        live = self.rollups()
+        today = timezone.localdate()
+        rebuild(today - timedelta(days=1), today + timedelta(days=1))
+        self.assertEqual(live, self.rollups())
+        DailyProductSales.objects.all().delete()
+        DailySellerSales.objects.all().delete()
+        backfill_rollups(apps, None)
+        self.assertEqual(live, self.rollups())
+        return live
+
+    def add_item(self, order, product, quantity=1):
+        return OrderItem.objects.create(
+            order=order, product=product, quantity=quantity, unit_price=product.price
+        )
+
+    def test_order_lifecycle(self):
+        order = Order.objects.create(owner=self.buyer, status="pending")
+        item = self.add_item(order, self.product, 2)
+        self.add_item(order, self.house_product)
+        self.assertEqual(self.assert_rebuildable(), [[], []])
+
+        for step in ("confirmed", "edit", "cancelled", "confirmed", "delete item", "delete"):
+            if step == "edit":
+                item.quantity = 5
+                item.save()
+            elif step == "delete item":
+                item.delete()
+            elif step == "delete":
+                order.delete()
+            else:
+                order.status = step
+                order.save()
+            with self.subTest(step=step):
+                self.assert_rebuildable()
+        self.assertFalse(DailyProductSales.objects.exists())
+
+    def test_stale_order_instance_and_queryset_delete(self):
+        order = Order.objects.create(owner=self.buyer, status="pending")
+        self.add_item(order, self.product, 3)
+        stale = Order.objects.get(pk=order.pk)
+        order.status = "confirmed"
+        order.save()
+        stale.status = "refunded"
+        stale.save()
+        self.assertEqual(self.assert_rebuildable(), [[], []])
+
+        order.status = "shipped"
+        order.save()
+        self.add_item(order, self.house_product, 2)
+        OrderItem.objects.filter(order=order).delete()
+        self.assert_rebuildable()
+
+    def test_bulk_created_order(self):
+        items = price_items([{"id": self.product.pk, "quantity": 2}, {"id": self.house_product.pk}])
+        create_order(items, owner=self.buyer, status="confirmed")
+        live = self.assert_rebuildable()
+        self.assertEqual(len(live[0]), 2)
+
+    def test_failed_item_write_leaves_nothing_behind(self):
+        order = Order.objects.create(owner=self.buyer, status="confirmed")
+        item = self.add_item(order, self.product)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            OrderItem(
+                pk=item.pk, order=order, product=self.product, quantity=1, unit_price=Decimal("10")
+            ).save(force_insert=True)
+        order.status = "cancelled"
+        order.save()
+        self.add_item(order, self.product)
+        self.assertEqual(self.assert_rebuildable(), [[], []])
+
+
+class KPICounterTests(TestCase):
+    """The dashboard counters follow writes and reconcile without drift."""
+
+    def assert_kpis(self, **expected):
+        values = kpi_values()
+        self.assertEqual({name: values[name] for name in expected}, expected)
+        drift = {name: pair for name, pair in reconcile().items() if pair[0] != pair[1]}
+        self.assertEqual(drift, {})
+
+    def test_counters_follow_writes(self):
+        self.assert_kpis(**dict.fromkeys(KPIS, 0))
+        user = get_user_model().objects.create_user("buyer", "b@example.com", "pw")
+        product = make_product()
+        hidden = make_product("Hidden")
+        hidden.is_active = False
+        hidden.save()
+        self.assert_kpis(**{USERS: 1, ACTIVE_PRODUCTS: 1})
+
+        hidden.is_active = True
+        hidden.save(update_fields=["is_active"])
+        product.is_active = False
+        product.save()
+        product.name = "Renamed"
+        product.save()
+        self.assert_kpis(**{ACTIVE_PRODUCTS: 1})
+
+        order = Order.objects.create(owner=user, status="pending")
+        OrderItem.objects.create(order=order, product=hidden, quantity=2, unit_price=hidden.price)
+        self.assert_kpis(**{ORDERS: 1, REVENUE: 0})
+        order.status = "confirmed"
+        order.save()
+        self.assert_kpis(**{REVENUE: Decimal("20.00")})
+        create_order(price_items([{"id": hidden.pk}]), owner=user, status="delivered")
+        self.assert_kpis(**{ORDERS: 2, REVENUE: Decimal("30.00")})
+
+        order.delete()
+        hidden.delete()
+        user.delete()
+        self.assert_kpis(**{ORDERS: 1, USERS: 0, ACTIVE_PRODUCTS: 0, REVENUE: Decimal("10.00")})
+
+    def test_revenue_is_counted_after_discounts(self):
+        product = make_product()
+        cart = [{"id": product.pk, "quantity": 3}]
+        order = create_order(price_items(cart), status="confirmed", discount_amount=5)
+        self.assert_kpis(**{REVENUE: Decimal("25.00")})
+
+        OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=10)
+        self.assert_kpis(**{REVENUE: Decimal("35.00")})
+        order.refresh_from_db()
+        order.discount_amount = Decimal("7.50")
+        order.save(update_fields=["discount_amount"])
+        self.assert_kpis(**{REVENUE: Decimal("32.50")})
+        order.status = "cancelled"
+        order.save(update_fields=["status"])
+        self.assert_kpis(**{REVENUE: 0})
+        order.status = "shipped"
+        order.save()
+        self.assert_kpis(**{REVENUE: Decimal("32.50")})
+
+        discounted = create_order(price_items(cart), status="delivered", discount_amount=2)
+        self.assert_kpis(**{REVENUE: Decimal("60.50")})
+        Order.objects.filter(pk__in=[order.pk, discounted.pk]).delete()
+        self.assert_kpis(**{REVENUE: 0})
+
+    def test_reconcile_fixes_writes_that_skip_signals(self):
+        make_product()
+        Product.objects.update(is_active=False)
+        stored, actual = reconcile()[ACTIVE_PRODUCTS]
+        self.assertEqual((stored, actual), (1, 0))
+        self.assert_kpis(**{ACTIVE_PRODUCTS: 0})
+
+    def test_failed_item_write_does_not_skew_revenue(self):
+        product = make_product()
+        order = Order.objects.create(status="confirmed")
+        item = OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=10)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            OrderItem(pk=item.pk, order=order, product=product, quantity=1, unit_price=10).save(
+                force_insert=True
+            )
+        order.status = "cancelled"
+        order.save()
+        OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=10)
+        self.assert_kpis(**{REVENUE: 0})
+
+
+@override_settings(PAYMOB_HMAC="paymob-secret")
+class PaymobCallbackTests(TestCase):
+    token = {
+        "id": 41,
+        "token": "tok_abc",
+        "masked_pan": "xxxx-xxxx-xxxx-1234",
+        "merchant_id": 7,
+        "card_subtype": "Visa",
+        "created_at": "2026-10-18T10:00:00",
+        "email": "buyer@example.com",
+        "order_id": "77",
+    }
+
+    def sign(self, obj, fields):
+        message = "".join(str(obj[field]) for field in fields)
+        return hmac.new(b"paymob-secret", message.encode(), hashlib.sha512).hexdigest()
+
+    def test_token_callback_is_verified_over_its_own_fields(self):
+        body = json.dumps({"type": "TOKEN", "obj": self.token}).encode()
+        signature = self.sign(self.token, PAYMOB_TOKEN_HMAC_FIELDS)
+        self.assertEqual(parse_paymob(body, signature)[1], "TOKEN")
+        with self.assertRaises(WebhookVerificationError):
+            parse_paymob(body, "0" * 128)
+
+    def test_token_callback_is_acknowledged_and_ignored(self):
+        body = json.dumps({"type": "TOKEN", "obj": self.token})
+        signature = self.sign(self.token, PAYMOB_TOKEN_HMAC_FIELDS)
+        url = f"/api/payments/paymob/webhook/?hmac={signature}"
+        response = self.client.post(url, body, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(drain(), (1, 0))
+
+
+@override_settings(PAYMOB_HMAC="paymob-secret", FAWRY_SECURITY_CODE="fawry-secret")
+class MalformedWebhookTests(TestCase):
+    """Payloads that cannot be verified are refused with a 400, never a 500."""
+
+    def post(self, url, body):
+        response = self.client.post(url, body, content_type="application/json")
+        self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_non_object_payloads(self):
+        for url in ("/api/payments/paymob/webhook/", "/api/payments/fawry/webhook/"):
+            for body in ("[]", '"paid"', "42", "null"):
+                self.post(url, body)
+        self.post("/api/payments/paymob/webhook/", json.dumps({"obj": [1], "type": "TOKEN"}))
+        self.post("/api/payments/paymob/webhook/", json.dumps({"obj": {}, "type": ["TOKEN"]}))
+
+    def test_malformed_fawry_amounts(self):
+        for field in ("paymentAmount", "orderAmount"):
+            body = {"fawryRefNumber": "FR-1", "orderStatus": "PAID", field: "12,50 EGP"}
+            self.post("/api/payments/fawry/webhook/", json.dumps(body))
+
+
+def drf_serialize_many(serializer_class, instances, context=None):
+    return serializer_class(instances, many=True, context=context or {}).data
+
+
+@override_settings(ENABLE_CACHING=False, SERVE_PRODUCT_CARDS=False)
+class FastSerializerParityTests(TestCase):
+    """Every listing served through serialize_many renders what DRF would."""
+
+    public_urls = (
+        "/api/products/",
+        "/api/products/?search=lamp",
+        "/api/categories/",
+        "/api/carousels/",
+        "/api/services/",
+        "/api/contact/",
+        "/api/tags/",
+    )
+    admin_urls = (
+        "/api/admins/products/",
+        "/api/admins/products/?pagination=cursor",
+        "/api/admins/categories/",
+        "/api/admins/tags/",
+        "/api/admins/carousels/",
+        "/api/admins/orders/",
+        "/api/admins/orders/?summary=1",
+        "/api/orders/mine/",
+        "/api/orders/mine/?summary=1",
+    )
+
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        seller = SellerProfile.objects.create(
+            user=User.objects.create_user("seller", "s@example.com", "pw"),
+            business_name="Lamp Shop",
+            contact_phone="0100000000",
+            contact_email="s@example.com",
+            avatar="sellers/avatars/lamp.jpg",
+        )
+        category = Category.objects.create(name="Lighting")
+        tags = [Tag.objects.create(name=name) for name in ("Desk", "Brass")]
+        products = [make_product(f"Lamp {i}") for i in range(3)]
+        for i, product in enumerate(products):
+            product.category = category if i else None
+            product.seller = seller if i != 1 else None
+            product.price = Decimal("10.00") + Decimal(i) / 3
+            product.save()
+            product.tags.set(tags[:i])
+            ProductImage.objects.create(product=product, image=f"products/gallery/{i}.jpg")
+        SellerOffer.objects.create(
+            seller=seller, product=products[2], title="Deal", discount_percent=Decimal("12.5")
+        )
+        CarouselImg.objects.bulk_create(
+            [CarouselImg(name="Hero", image="carousel/hero.jpg", order=1)]
+        )
+        Service.objects.bulk_create(
+            [Service(name="Fitting", image="services/f.jpg", price="5", description="On site")]
+        )
+        Contact.objects.create(name="Support", value="help@example.com", contact_type="email")
+
+        paid = create_order(price_items([{"id": products[2].pk, "quantity": 2}]), owner=self.admin)
+        paid.payment = Payment.objects.create(
+            amount=paid.grand_total, user_email="admin@example.com", owner=self.admin
+        )
+        paid.save(update_fields=["payment"])
+        Order.objects.create(owner=self.admin, shipping_address="No items yet")
+
+    def assert_parity(self, client, urls):
+        for url in urls:
+            with self.subTest(url=url):
+                fast = client.get(url)
+                with mock.patch("api.views.serialize_many", drf_serialize_many), mock.patch(
+                    "api.fast_serializers.serialize_many", drf_serialize_many
+                ):
+                    drf = client.get(url)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, drf.content)
+
+    def test_public_listings_match_drf(self):
+        self.assert_parity(APIClient(), self.public_urls)
+
+    def test_admin_and_order_listings_match_drf(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assert_parity(client, self.public_urls + self.admin_urls)
+
+
+class ProductCardTests(TestCase):
+    """Cards follow approvals and are left alone while cards are off."""
+
+    @override_settings(SERVE_PRODUCT_CARDS=True)
+    def test_admin_approval_lists_the_card(self):
+        product = make_product()
+        product.approval_status = Product.ApprovalStatus.PENDING
+        product.save()
+        self.assertFalse(ProductCard.objects.get(product=product).is_listed)
+
+        admin_user = get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin_user)
+        # Each changelist filter stops matching once its action has run.
+        for status, action, listed in (
+            ("pending", "approve_products", True),
+            ("approved", "reject_products", False),
+        ):
+            response = self.client.post(
+                f"/admin/api/product/?approval_status__exact={status}",
+                {"action": action, "_selected_action": [product.pk]},
+            )
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(ProductCard.objects.get(product=product).is_listed, listed)
+
+    @override_settings(SERVE_PRODUCT_CARDS=False)
+    def test_saves_skip_cards_while_disabled(self):
+        product = make_product()
+        ProductImage.objects.create(product=product, image="products/gallery/x.jpg")
+        product.name = "Renamed"
+        product.save()
+        self.assertFalse(ProductCard.objects.exists())
+
+
+class OrderPagingTests(TestCase):
+    """A customer can page through their orders both ways."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("buyer", "b@example.com", "pw")
+        product = make_product()
+        for _ in range(20):
+            create_order(price_items([{"id": product.pk, "quantity": 2}]), owner=self.user)
+        # Ties on created_at are broken by id.
+        Order.objects.filter(pk__lte=Order.objects.order_by("pk")[5].pk).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            body = self.client.get(url).json()
+            pages.append([order["id"] for order in body["results"]])
+            url = body[link]
+        return pages, body
+
+    def assert_pages_both_ways(self, url):
+        expected = list(
+            Order.objects.filter(owner=self.user)
+            .order_by("-created_at", "-pk")
+            .values_list("pk", flat=True)
+        )
+        forward, last = self.walk(url, "next")
+        self.assertEqual([len(page) for page in forward], [9, 9, 2])
+        self.assertEqual(sum(forward, []), expected)
+        self.assertIsNone(self.client.get(url).json()["previous"])
+
+        backward, first = self.walk(last["previous"], "previous")
+        self.assertEqual(backward, forward[-2::-1])
+        self.assertIsNotNone(first["next"])
+        return last["results"][0]
+
+    def test_full_orders_page_both_ways(self):
+        row = self.assert_pages_both_ways("/api/orders/mine/")
+        self.assertEqual(len(row["items"]), 1)
+
+    def test_summary_orders_page_both_ways(self):
+        row = self.assert_pages_both_ways("/api/orders/mine/?summary=1")
+        self.assertEqual(row["item_count"], 1)
+        self.assertNotIn("items", row)
+
+
+class SuggestionIndexTests(TestCase):
+    """Every kind of suggestion gets its own scan of the prefix index."""
+
+    def test_common_prefix_still_reaches_categories_and_tags(self):
+        items = [("products", pk, f"Phone model {pk}") for pk in range(1, 1001)]
+        items += [("categories", 1, "Phones"), ("tags", 1, "Phone cases")]
+        results = PrefixIndex().replace(add=items).lookup("ph", limit=5)
+        self.assertEqual([row["id"] for row in results["products"]], [1, 10, 100, 1000, 101])
+        self.assertEqual(results["categories"], [{"id": 1, "name": "Phones"}])
+        self.assertEqual(results["tags"], [{"id": 1, "name": "Phone cases"}])
+
+    def test_item_matching_several_word_starts_is_suggested_once(self):
+        items = [("products", 1, "Stand stand stand"), ("products", 2, "Steel stand")]
+        results = PrefixIndex().replace(add=items).lookup("st", limit=5)
+        self.assertEqual([row["id"] for row in results["products"]], [1, 2])
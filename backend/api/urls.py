@@ -9,6 +9,7 @@ from .payment_gateways import *
 urlpatterns = [
     # Public endpoints
     path("products/", get_product, name="get_products"),
+    path("products/suggest/", suggest_products, name="suggest_products"),
     path("categories/", get_category, name="get_category"),
     path("carousels/", get_carouselImg, name="get_carouselImg"),
     path("services/", get_services, name="get_services"),
@@ -1,18 +1,24 @@
 import logging
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from datetime import timedelta
 import stripe
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, status, viewsets
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.generics import ListAPIView
 from rest_framework.pagination import PageNumberPagination
@@ -21,9 +27,39 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
-from .cache_utils import cache_api_response
+from .cache_utils import cache_api_response, seller_namespace
+from .cards import card_payloads, cards_enabled
+from .fast_serializers import FastListMixin, serialize_many
+from .earnings import (
+    EARNING_CSV_COLUMNS,
+    EARNING_METRICS,
+    earnings_rows,
+    earnings_summary,
+    seller_earnings,
+)
+from .exports import EXPORT_FORMATS, StreamedExportMixin, csv_response, export_response
+from .facets import PRICE_BUCKETS, category_counts, price_histogram, tag_counts
+from .idempotency import idempotent
+from .kpis import ACTIVE_PRODUCTS, ORDERS, REVENUE, USERS, kpi_values, recent_orders
 from .models import *
+from .offers import offer_clock
+from .orders import create_order, price_items
+from .pagination import KeysetPagination, KeysetPaginationMixin
+from .payment_gateways import PAY_LATER_HOLDS
+from .rankings import annotate_bestseller_units, top_products
+from .search import search_products
+from .stock import (
+    RESERVATION_TTL,
+    OutOfStock,
+    commit_stock,
+    hold_stock,
+    release_order_stock,
+    release_stock,
+    reserve_stock,
+)
 from .serializer import *
+from .suggest import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, suggestions
+from .webhooks import WebhookVerificationError, parse_stripe, record_event
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -121,23 +157,6 @@ class SellerMeView(generics.RetrieveUpdateAPIView):
 
 
 
-class CacheInvalidateMixin:
-    def perform_create(self, serializer):
-        super().perform_create(serializer)
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
-
-    def perform_update(self, serializer):
-        super().perform_update(serializer)
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
-
-    def perform_destroy(self, instance):
-        super().perform_destroy(instance)
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
-
-
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 9
     page_size_query_param = "page_size"
@@ -145,42 +164,43 @@ class StandardResultsSetPagination(PageNumberPagination):
 
 
 # ++++++++++ ADDED ADMIN VIEWSETS ++++++++++
-class ProductAdminViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
+class ProductAdminViewSet(KeysetPaginationMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().select_related("seller__user").prefetch_related("tags", "gallery_images")
     serializer_class = ProductSerializer
     permission_classes = [IsAdminUser]
     pagination_class = StandardResultsSetPagination  # ✅ Add this line
+    keyset_sorts = ("-created_at", "price", "-price", "name")
 
 
-class CategoryAdminViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
+class CategoryAdminViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     pagination_class = StandardResultsSetPagination  # ✅ Add this line
     serializer_class = CategorySerializer
     permission_classes = [IsAdminUser]
 
 
-class ServiceAdminViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
+class ServiceAdminViewSet(viewsets.ModelViewSet):
     queryset = Service.objects.all()
     pagination_class = StandardResultsSetPagination  # ✅ Add this line
     serializer_class = ServiceSerializer
     permission_classes = [IsAdminUser]
 
 
-class ContactAdminViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
+class ContactAdminViewSet(viewsets.ModelViewSet):
     queryset = Contact.objects.all()
     pagination_class = StandardResultsSetPagination  # ✅ Add this line
     serializer_class = ContactSerializer
     permission_classes = [IsAdminUser]
 
 
-class TagsAdminViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
+class TagsAdminViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     pagination_class = StandardResultsSetPagination  # ✅ Add this line
     serializer_class = TagsSerializer
     permission_classes = [IsAdminUser]
 
 
-class CarouselAdminViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
+class CarouselAdminViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = CarouselImg.objects.all()
     pagination_class = StandardResultsSetPagination  # ✅ Add this line
     serializer_class = CarouselImgSerializer
@@ -196,8 +216,6 @@ class ProductGalleryImageDeleteView(APIView):
         product = get_object_or_404(Product, pk=pk)
         gallery_image = get_object_or_404(ProductImage, pk=img_id, product=product)
         gallery_image.delete()
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -277,7 +295,10 @@ def get_all_users(request):
             )
 
         # +++ ADD PAGINATION LOGIC +++
-        paginator = StandardResultsSetPagination()
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination(sorts=("-date_joined", "username"))
+        else:
+            paginator = StandardResultsSetPagination()
         paginated_users = paginator.paginate_queryset(users, request)
 
         serializer = UserSerializer(
@@ -380,24 +401,19 @@ class CurrentUserView(generics.RetrieveUpdateAPIView):
 
 # Public Content Views
 def create_public_list_view(
-    model, serializer_class, order_by=None, filter_active=False
+    model,
+    serializer_class,
+    order_by=None,
+    filter_active=False,
+    cache_namespaces=(),
 ):
     @api_view(["GET"])
     @permission_classes([AllowAny])
     def view_func(request):
         try:
             queryset = model.objects.all()
-
-            # Optimize queries
-            if model == Product:
-                queryset = queryset.select_related("seller__user").prefetch_related("tags", "gallery_images")
-
             if filter_active:
                 queryset = queryset.filter(is_active=True)
-                if model == Product:
-                    queryset = queryset.filter(
-                        approval_status=Product.ApprovalStatus.APPROVED
-                    ).exclude(seller__is_active=False)
             if order_by:
                 queryset = queryset.order_by(order_by)
 
@@ -406,13 +422,13 @@ def create_public_list_view(
             paginated_queryset = paginator.paginate_queryset(queryset, request)
 
             # Serialize paginated data
-            serializer = serializer_class(
+            data = serialize_many(
+                serializer_class,
                 paginated_queryset,
-                many=True,
                 context={"is_admin": request.user.is_staff},
             )
 
-            response = paginator.get_paginated_response(serializer.data)
+            response = paginator.get_paginated_response(data)
 
             # Add HTTP cache headers for browser caching
             if not request.user.is_authenticated:
@@ -427,6 +443,8 @@ def create_public_list_view(
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    if cache_namespaces:
+        return cache_api_response(timeout=600, namespaces=cache_namespaces)(view_func)
     return view_func
 
 
@@ -456,16 +474,19 @@ class PasswordChangeView(generics.GenericAPIView):
 
 # Instantiate public views
 get_carouselImg = create_public_list_view(
-    CarouselImg, CarouselImgSerializer, filter_active=True
+    CarouselImg, CarouselImgSerializer, filter_active=True, cache_namespaces=("carousel",)
 )
-get_product = create_public_list_view(
-    Product, ProductSerializer, filter_active=True  # Keep filtering for active products
+get_category = create_public_list_view(
+    Category, CategorySerializer, filter_active=True, cache_namespaces=("categories",)
+)
+get_services = create_public_list_view(
+    Service, ServiceSerializer, order_by="price", cache_namespaces=("services",)
+)
+get_contact = create_public_list_view(
+    Contact, ContactSerializer, filter_active=True, cache_namespaces=("contacts",)
 )
-get_category = create_public_list_view(Category, CategorySerializer, filter_active=True)
-get_services = create_public_list_view(Service, ServiceSerializer, order_by="price")
-get_contact = create_public_list_view(Contact, ContactSerializer, filter_active=True)
 
-get_tags = create_public_list_view(Tag, TagsSerializer)
+get_tags = create_public_list_view(Tag, TagsSerializer, cache_namespaces=("tags",))
 
 
 class PaymentListView(ListAPIView):
@@ -473,6 +494,14 @@ class PaymentListView(ListAPIView):
     serializer_class = PaymentSerializer
 
 
+def out_of_stock_response(error):
+    return Response(
+        {"error": "Not enough stock", "product_id": error.product_id},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+@method_decorator(idempotent, name="post")
 class CreatePaymentIntentView(APIView):
     """
     Create payment intent AFTER creating the order.
@@ -482,6 +511,7 @@ class CreatePaymentIntentView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
+        order = None
         try:
             # Extract data from request
             amount = request.data.get("amount")  # in cents
@@ -510,6 +540,18 @@ class CreatePaymentIntentView(APIView):
                 note=note,
             )
 
+            # Hold the stock while the customer pays; committed or released
+            # by the payment webhook, or expired if the payment is abandoned
+            try:
+                reserve_stock(
+                    [(item_data.get("id"), item_data.get("quantity", 1)) for item_data in order_items],
+                    owner=request.user,
+                    order=order,
+                )
+            except OutOfStock as e:
+                order.delete()
+                return out_of_stock_response(e)
+
             # ===== STEP 2: CREATE ORDER ITEMS =====
             total_price = 0
             for item_data in order_items:
@@ -526,6 +568,7 @@ class CreatePaymentIntentView(APIView):
                     )
                     total_price += price * quantity
                 except Product.DoesNotExist:
+                    release_order_stock(order)
                     order.delete()  # Rollback if product not found
                     return Response(
                         {"error": f'Product {item_data.get("id")} not found'},
@@ -555,6 +598,9 @@ class CreatePaymentIntentView(APIView):
                     currency=currency,
                     status="pending",  # Payment starts as pending
                 )
+                # The payment webhooks find the order through this link
+                order.payment = payment
+                order.save(update_fields=["payment"])
 
                 return Response(
                     {
@@ -568,36 +614,42 @@ class CreatePaymentIntentView(APIView):
                 )
 
             except stripe.error.CardError as e:
+                release_order_stock(order)
                 order.delete()  # Rollback order if payment intent fails
                 return Response(
                     {"error": f"Card error: {e.user_message}"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
             except stripe.error.RateLimitError:
+                release_order_stock(order)
                 order.delete()
                 return Response(
                     {"error": "Too many requests to Stripe"},
                     status=status.HTTP_429_TOO_MANY_REQUESTS,
                 )
             except stripe.error.InvalidRequestError as e:
+                release_order_stock(order)
                 order.delete()
                 return Response(
                     {"error": f"Invalid request: {str(e)}"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
             except stripe.error.AuthenticationError:
+                release_order_stock(order)
                 order.delete()
                 return Response(
                     {"error": "Stripe authentication failed"},
                     status=status.HTTP_401_UNAUTHORIZED,
                 )
             except stripe.error.APIConnectionError:
+                release_order_stock(order)
                 order.delete()
                 return Response(
                     {"error": "Failed to connect to Stripe"},
                     status=status.HTTP_503_SERVICE_UNAVAILABLE,
                 )
             except stripe.error.StripeError as e:
+                release_order_stock(order)
                 order.delete()
                 return Response(
                     {"error": f"Stripe error: {str(e)}"},
@@ -605,89 +657,180 @@ class CreatePaymentIntentView(APIView):
                 )
 
         except Exception as e:
+            if order is not None and order.pk is not None:
+                # Don't leave the reservation held by an orphan pending order
+                release_order_stock(order)
+                order.delete()
             return Response(
                 {"error": f"Unexpected error: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
 
-@method_decorator(cache_api_response(timeout=600), name="dispatch")
-class ProductSearchView(APIView):
-    permission_classes = [AllowAny]
+def _search_namespaces(request):
+    namespaces = ("products", "categories", "tags", "offers", "sellers")
+    if request.GET.get("sort") == "bestsellers":
+        namespaces += ("rankings",)
+    return namespaces
 
-    def get(self, request):
-        queryset = (
-            Product.objects.filter(
-                is_active=True,
-                approval_status=Product.ApprovalStatus.APPROVED,
-            )
-            .exclude(seller__is_active=False)
-            .prefetch_related("tags", "gallery_images")
-            .select_related("category")
-        )
 
-        # Text search — name & description
-        search = request.query_params.get("search", "").strip()
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+@method_decorator(
+    cache_api_response(
+        timeout=600,
+        namespaces=_search_namespaces,
+        fingerprint=offer_clock,
+    ),
+    name="dispatch",
+)
+class ProductSearchView(APIView):
+    """
+    GET /api/products/ — public catalog search.
+    ?facets=1 adds category/tag counts and a price histogram for the
+    current filters (each facet ignores its own filter so siblings stay
+    visible), cached together with the result page.
+    ?sort=bestsellers orders by units sold over the last 30 days, read
+    from the precomputed rankings (api/rankings.py).
+    """
 
+    permission_classes = [AllowAny]
+
+    def filter_queryset(self, queryset, params, skip=()):
         # Category filter
-        category = request.query_params.get("category", "")
-        if category and category != "all":
+        category = params.get("category", "")
+        if "category" not in skip and category and category != "all":
             if category == "uncategorized":
                 queryset = queryset.filter(category__isnull=True)
-            else:
-                if category.isdigit():
-                    sort = request.query_params.get("sort", "-created_at")
-                    allowed_sorts = ["price", "-price", "-created_at", "name"]
-                    if sort in allowed_sorts:
-                        queryset = queryset.order_by(sort)
-                    queryset = queryset.filter(category__id=int(category))
+            elif category.isdigit():
+                queryset = queryset.filter(category__id=int(category))
 
         # Tags filter (comma-separated IDs: ?tags=1,2,3)
-        tags = request.query_params.get("tags", "")
-        if tags:
+        tags = params.get("tags", "")
+        if "tags" not in skip and tags:
             tag_ids = [t for t in tags.split(",") if t.isdigit()]
             if tag_ids:
-                queryset = queryset.filter(tags__id__in=tag_ids).distinct()
+                tagged = Product.tags.through.objects.filter(tag_id__in=tag_ids)
+                queryset = queryset.filter(pk__in=tagged.values("product_id"))
 
         # Price filter
-        min_price = request.query_params.get("minPrice", "")
-        max_price = request.query_params.get("maxPrice", "")
-        if min_price:
-            try:
-                queryset = queryset.filter(price__gte=Decimal(min_price))
-            except:
-                pass
-        if max_price:
-            try:
-                queryset = queryset.filter(price__lte=Decimal(max_price))
-            except:
-                pass
-        # Sorting
-        sort = request.query_params.get("sort", "-created_at")
+        if "price" not in skip:
+            min_price = params.get("minPrice", "")
+            max_price = params.get("maxPrice", "")
+            if min_price:
+                try:
+                    queryset = queryset.filter(price__gte=Decimal(min_price))
+                except:
+                    pass
+            if max_price:
+                try:
+                    queryset = queryset.filter(price__lte=Decimal(max_price))
+                except:
+                    pass
+        return queryset
+
+    def get_facets(self, queryset, params):
+        try:
+            buckets = int(params.get("price_buckets", PRICE_BUCKETS))
+        except ValueError:
+            buckets = PRICE_BUCKETS
+        return {
+            "categories": category_counts(
+                self.filter_queryset(queryset, params, skip=("category",))
+            ),
+            "tags": tag_counts(self.filter_queryset(queryset, params, skip=("tags",))),
+            "price": price_histogram(
+                self.filter_queryset(queryset, params, skip=("price",)), buckets
+            ),
+        }
+
+    def get(self, request):
+        params = request.query_params
+        use_cards = cards_enabled()
+        if use_cards:
+            base = ProductCard.objects.filter(is_listed=True)
+        else:
+            base = (
+                Product.objects.filter(
+                    is_active=True,
+                    approval_status=Product.ApprovalStatus.APPROVED,
+                )
+                .exclude(seller__is_active=False)
+                .prefetch_related("tags", "gallery_images")
+                .select_related("category", "seller")
+            )
+
+        # Full-text search — name, description, category, tags, seller
+        search = params.get("search", "").strip()
+        if search:
+            base = search_products(base, search)
+
+        queryset = self.filter_queryset(base, params)
+
+        # Sorting — searches default to relevance
+        sort = params.get("sort", "relevance" if search else "-created_at")
         allowed_sorts = ["price", "-price", "-created_at", "name"]
-        if sort in allowed_sorts:
+        if sort == "relevance" and search:
+            queryset = queryset.order_by("-search_rank_key", "-pk")
+        elif sort == "bestsellers":
+            # -pk as KeysetPagination breaks ties, so both modes agree
+            queryset = annotate_bestseller_units(queryset).order_by("-bestseller_units", "-pk")
+        elif sort in allowed_sorts:
             queryset = queryset.order_by(sort)
-        # Pagination
-        paginator = StandardResultsSetPagination()
-        paginated = paginator.paginate_queryset(queryset, request)
-        serializer = ProductSerializer(
-            paginated, many=True, context={"is_admin": request.user.is_staff}
-        )
-        return paginator.get_paginated_response(serializer.data)
+        # Pagination — ?pagination=cursor opts into keyset pages
+        if KeysetPagination.requested(request):
+            if sort == "relevance" and search:
+                keyset_sort = "-search_rank_key"
+            elif sort == "bestsellers":
+                keyset_sort = "-bestseller_units"
+            elif sort in allowed_sorts:
+                keyset_sort = sort
+            else:
+                keyset_sort = "-created_at"
+            paginator = KeysetPagination()
+            paginated = paginator.paginate_queryset(queryset, request, sort=keyset_sort)
+        else:
+            paginator = StandardResultsSetPagination()
+            paginated = paginator.paginate_queryset(queryset, request)
+        if use_cards:
+            data = card_payloads(paginated)
+        else:
+            data = serialize_many(
+                ProductSerializer, paginated, context={"is_admin": request.user.is_staff}
+            )
+        response = paginator.get_paginated_response(data)
+        if params.get("facets") in ("1", "true"):
+            response.data["facets"] = self.get_facets(base, params)
+        return response
 
 
 get_product = ProductSearchView.as_view()
 
 
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def suggest_products(request):
+    """
+    GET /api/products/suggest/?q=gal — search-box autocomplete.
+    Answers from the in-process prefix index (api/suggest.py); no
+    authentication so an anonymous keystroke never touches the database.
+    """
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_SUGGESTIONS))
+    except ValueError:
+        limit = DEFAULT_SUGGESTIONS
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+    query = request.query_params.get("q", "")
+    return Response({"query": query, **suggestions.suggest(query, limit)})
+
+
+@method_decorator(idempotent, name="post")
 class CreateOrderView(APIView):
     """
     Creates an Order + OrderItems.
     - Stripe card: receives payment_intent_id to link existing Payment.
-    - Paymob / Fawry / COD: creates order directly, payment handled separately.
+    - Paymob / Fawry: creates a pending order holding its stock; the
+      gateway's payment webhook confirms it or cancels it.
+    - COD: creates a confirmed order directly.
     """
 
     permission_classes = [IsAuthenticated]
@@ -735,79 +878,144 @@ class CreateOrderView(APIView):
                     {"error": "Could not verify payment with Stripe"}, status=400
                 )
 
-        # Create the order
-        order = Order.objects.create(
-            owner=request.user,
-            status="confirmed",
-            shipping_address=shipping_address,
-            note=note,
-            discount_amount=Decimal(str(discount_amount or 0)),
-        )
+        # Fetch and price every line up front (one product query)
+        items = price_items(order_items)
 
-        # Apply coupon if provided
-        if coupon_code and discount_amount:
-            try:
-                coupon = Coupon.objects.get(code__iexact=coupon_code)
-                OrderCoupon.objects.create(
-                    order=order,
-                    coupon=coupon,
-                    discount_amount=Decimal(str(discount_amount)),
+        # Reserve stock before the order transaction so counter rows are
+        # only locked briefly; released again unless the order commits.
+        hold = PAY_LATER_HOLDS.get(payment_method) if payment is None else None
+        try:
+            reservations = reserve_stock(
+                [(item.product_id, item.quantity) for item in items],
+                owner=request.user,
+                ttl=hold or RESERVATION_TTL,
+            )
+        except OutOfStock as e:
+            if payment is None:
+                return out_of_stock_response(e)
+            # Already charged: honour the order and flag the shortfall
+            logger.warning(f"Card payment {payment_intent_id} completed with {e}")
+            reservations = []
+
+        try:
+            with transaction.atomic():
+                # Create the order with its totals, then all items in one insert
+                order = create_order(
+                    items,
+                    owner=request.user,
+                    status="pending" if hold else "confirmed",
+                    shipping_address=shipping_address,
+                    note=note,
+                    discount_amount=Decimal(str(discount_amount or 0)),
+                    payment=payment,
                 )
-                coupon.times_used += 1
-                coupon.save(update_fields=["times_used"])
-            except Coupon.DoesNotExist:
-                pass
 
-        # Create order items
-        for item_data in order_items:
+                if hold:
+                    # Not paid yet: the payment webhook settles the stock
+                    hold_stock(reservations, order)
+                else:
+                    commit_stock(reservations, order)
+
+                # Mark the Stripe payment as settled
+                if payment:
+                    payment.status = Payment.Status.SUCCESS
+                    payment.save(update_fields=["status"])
+
+                # Redeem the coupon last: it locks the coupon row until commit
+                coupon = None
+                if coupon_code and discount_amount:
+                    coupon = Coupon.objects.filter(code__iexact=coupon_code).first()
+                if coupon:
+                    OrderCoupon.objects.create(
+                        order=order,
+                        coupon=coupon,
+                        discount_amount=Decimal(str(discount_amount)),
+                    )
+                    # A card payment was already charged with the discount, so
+                    # it is counted even if the coupon ran out in the meantime.
+                    redeemed, message = coupon.redeem(
+                        request.user, enforce_limits=payment is None
+                    )
+                    if not redeemed:
+                        transaction.set_rollback(True)
+                        return Response({"error": message}, status=status.HTTP_400_BAD_REQUEST)
+            reservations = []  # committed or held with the order
+        finally:
+            release_stock(reservations)
+
+        order = (
+            Order.objects.select_related("payment", "owner")
+            .prefetch_related("items__product")
+            .get(pk=order.pk)
+        )
+        serializer = OrderSerializer(order)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+ORDER_SORTS = ("-created_at", "created_at", "-grand_total", "grand_total")
+
+
+def filter_orders(queryset, params):
+    """?min_total= / ?max_total= / ?sort= against the persisted grand_total."""
+    for param, lookup in (("min_total", "grand_total__gte"), ("max_total", "grand_total__lte")):
+        value = params.get(param)
+        if value:
             try:
-                product = Product.objects.get(pk=item_data["id"])
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=int(item_data.get("quantity", 1)),
-                    unit_price=product.price,
-                )
-            except Product.DoesNotExist:
-                logger.warning(
-                    f"Product {item_data.get('id')} not found during order creation"
-                )
+                value = Decimal(value)
+            except InvalidOperation:
                 continue
+            if value.is_finite():
+                queryset = queryset.filter(**{lookup: value})
+    sort = params.get("sort")
+    if sort in ORDER_SORTS:
+        queryset = queryset.order_by(sort, "-pk")
+    return queryset
 
-        # Calculate commission
-        total_commission = Decimal("0")
-        for item in order.items.select_related("product__seller").all():
-            if item.product and item.product.seller:
-                total_commission += item.platform_fee
-        order.total_commission = total_commission
-        order.subtotal_before_discount = sum(i.subtotal for i in order.items.all())
-        order.save(update_fields=["total_commission", "subtotal_before_discount"])
-
-        # Link payment if Stripe
-        if payment:
-            payment.status = Payment.Status.SUCCESS
-            payment.save(update_fields=["status"])
-            order.payment = payment
-            order.save(update_fields=["payment"])
 
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+def wants_summary(request):
+    return request.query_params.get("summary") in ("1", "true")
+
 
+def order_summaries(queryset):
+    """
+    Orders reduced to OrderSummarySerializer's columns: the persisted
+    grand_total plus a per-order item count, in one aggregated query.
+    """
+    return queryset.only("id", "status", "grand_total", "created_at").annotate(
+        item_count=Count("items")
+    )
 
-class MyOrdersView(ListAPIView):
-    """Returns the authenticated user's own orders, newest first."""
+
+class MyOrdersView(FastListMixin, ListAPIView):
+    """
+    Returns the authenticated user's own orders, newest first, in keyset
+    pages (follow `next`; ?sort= takes any of ORDER_SORTS).
+
+    Full rows keep their nested items on purpose: the orders page renders
+    them. ?summary=1 lists only id, status, total, item_count and
+    created_at without touching OrderItem rows; an order's items then
+    come from MyOrderDetailView.
+    """
 
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
-    pagination_class = None  # Disable pagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = KeysetPagination(ORDER_SORTS)
+        return self._paginator
+
+    def get_serializer_class(self):
+        return OrderSummarySerializer if wants_summary(self.request) else OrderSerializer
 
     def get_queryset(self):
-        return (
-            Order.objects.filter(owner=self.request.user)
-            .select_related("payment")
-            .prefetch_related("items__product")
-            .order_by("-created_at")
-        )
+        queryset = Order.objects.filter(owner=self.request.user)
+        if wants_summary(self.request):
+            queryset = order_summaries(queryset)
+        else:
+            queryset = queryset.select_related("payment").prefetch_related("items__product")
+        return filter_orders(queryset.order_by("-created_at"), self.request.query_params)
 
 
 class MyOrderDetailView(APIView):
@@ -824,8 +1032,14 @@ class MyOrderDetailView(APIView):
         return Response(OrderSerializer(order).data)
 
 
-class OrderAdminViewSet(viewsets.ModelViewSet):
-    """Full CRUD for admins. Status updates go through partial_update (PATCH)."""
+class OrderAdminViewSet(KeysetPaginationMixin, FastListMixin, viewsets.ModelViewSet):
+    """
+    Full CRUD for admins. Status updates go through partial_update (PATCH).
+
+    The list nests each order's items, which the admin pages read;
+    ?summary=1 lists OrderSummarySerializer rows without them, like
+    MyOrdersView.
+    """
 
     queryset = (
         Order.objects.select_related("owner", "payment")
@@ -834,10 +1048,25 @@ class OrderAdminViewSet(viewsets.ModelViewSet):
     )
     permission_classes = [IsAdminUser]
     pagination_class = StandardResultsSetPagination
+    keyset_sorts = ORDER_SORTS
+
+    def is_summary(self):
+        return self.action == "list" and wants_summary(self.request)
+
+    def get_queryset(self):
+        if self.is_summary():
+            queryset = order_summaries(Order.objects.order_by("-created_at"))
+        else:
+            queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = filter_orders(queryset, self.request.query_params)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "partial_update":
             return OrderStatusUpdateSerializer
+        if self.is_summary():
+            return OrderSummarySerializer
         return OrderSerializer
 
     def partial_update(self, request, *args, **kwargs):
@@ -852,9 +1081,11 @@ class OrderAdminViewSet(viewsets.ModelViewSet):
 @method_decorator(csrf_exempt, name="dispatch")
 class StripeWebhookView(APIView):
     """
-    Handle Stripe webhook events to update order and payment status.
+    Receive Stripe webhook events.
 
-    Events handled:
+    The signature is verified and the event stored in the webhook inbox;
+    `manage.py drain_webhooks` applies it (see api/webhooks.py). Events
+    handled:
     - payment_intent.succeeded: Mark payment as successful, update order status
     - payment_intent.payment_failed: Mark payment as failed
     - payment_intent.canceled: Mark payment as cancelled
@@ -867,131 +1098,16 @@ class StripeWebhookView(APIView):
         sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
 
         try:
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-            )
-        except ValueError:
-            return Response(
-                {"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST
-            )
-        except stripe.error.SignatureVerificationError:
+            event_id, event_type, body = parse_stripe(payload, sig_header)
+        except WebhookVerificationError:
             return Response(
-                {"error": "Invalid signature"}, status=status.HTTP_400_BAD_REQUEST
+                {"error": "Invalid payload or signature"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Handle the event
-        if event["type"] == "payment_intent.succeeded":
-            self.handle_payment_succeeded(event["data"]["object"])
-
-        elif event["type"] == "payment_intent.payment_failed":
-            self.handle_payment_failed(event["data"]["object"])
-
-        elif event["type"] == "payment_intent.canceled":
-            self.handle_payment_cancelled(event["data"]["object"])
-
+        record_event(WebhookEvent.Provider.STRIPE, event_id, event_type, body)
         return Response({"status": "success"}, status=status.HTTP_200_OK)
 
-    def handle_payment_succeeded(self, payment_intent):
-        """
-        Update payment and order status when payment succeeds,
-        and issue Stripe Transfers to sellers.
-        """
-        try:
-            order_id = payment_intent["metadata"].get("order_id")
-            payment_intent_id = payment_intent["id"]
-
-            # Update Payment record
-            payment = Payment.objects.get(stripe_payment_id=payment_intent_id)
-            payment.status = "success"
-            payment.save()
-
-            # Update Order status from pending to confirmed
-            order = Order.objects.get(id=order_id)
-            if order.status == "pending":
-                order.status = "confirmed"
-                order.save()
-                
-            # Issue Transfers to Sellers
-            # Group payouts by seller account
-            seller_payouts = {}
-            for item in order.items.all():
-                if item.product and item.product.seller and item.product.seller.stripe_account_id:
-                    stripe_account = item.product.seller.stripe_account_id
-                    seller_payouts[stripe_account] = seller_payouts.get(stripe_account, Decimal('0.00')) + item.seller_payout
-            
-            for stripe_account, amount in seller_payouts.items():
-                if amount > 0:
-                    try:
-                        amount_in_cents = int(amount * 100)
-                        stripe.Transfer.create(
-                            amount=amount_in_cents,
-                            currency=payment.currency,
-                            destination=stripe_account,
-                            transfer_group=str(order.id),
-                        )
-                        print(f"Issued transfer of {amount} to {stripe_account} for Order #{order.id}")
-                    except Exception as e:
-                        print(f"Failed to issue transfer to {stripe_account}: {str(e)}")
-
-            print(f"✓ Payment succeeded for Order #{order_id}")
-
-        except Payment.DoesNotExist:
-            print(f"✗ Payment not found: {payment_intent_id}")
-        except Order.DoesNotExist:
-            print(f"✗ Order not found: {order_id}")
-        except Exception as e:
-            print(f"✗ Error handling payment success: {str(e)}")
-
-    def handle_payment_failed(self, payment_intent):
-        """
-        Update payment status when payment fails.
-        """
-        try:
-            payment_intent_id = payment_intent["id"]
-
-            # Update Payment record
-            payment = Payment.objects.get(stripe_payment_id=payment_intent_id)
-            payment.status = "failed"
-            payment.save()
-
-            # Update Order status to cancelled if payment fails
-            order = payment.order
-            if order.status == "pending":
-                order.status = "cancelled"
-                order.save()
-
-            print(f"✗ Payment failed for Order #{order.id}")
-
-        except Payment.DoesNotExist:
-            print(f"✗ Payment not found: {payment_intent_id}")
-        except Exception as e:
-            print(f"✗ Error handling payment failure: {str(e)}")
-
-    def handle_payment_cancelled(self, payment_intent):
-        """
-        Update payment status when payment is cancelled.
-        """
-        try:
-            payment_intent_id = payment_intent["id"]
-
-            # Update Payment record
-            payment = Payment.objects.get(stripe_payment_id=payment_intent_id)
-            payment.status = "cancelled"
-            payment.save()
-
-            # Update Order status to cancelled
-            order = payment.order
-            if order.status == "pending":
-                order.status = "cancelled"
-                order.save()
-
-            print(f"⊘ Payment cancelled for Order #{order.id}")
-
-        except Payment.DoesNotExist:
-            print(f"✗ Payment not found: {payment_intent_id}")
-        except Exception as e:
-            print(f"✗ Error handling payment cancellation: {str(e)}")
-
 
 # +++++++++++ ANALYTICS VIEWS ++++++++++
 from django.db.models import Count, Sum
@@ -1023,79 +1139,86 @@ from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
 
 
 class TopProductsAnalyticsView(APIView):
+    """
+    Best-selling products by revenue. ?category=<id> ranks one category;
+    standard windows (rankings.WINDOWS) are served from the precomputed
+    rankings (api/rankings.py), any other ?days= from the live rollups.
+    """
+
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         limit = int(request.query_params.get("limit", 10))
         days = int(request.query_params.get("days", 30))
-        since_date = timezone.now() - timedelta(days=days)
-
-        top_products = (
-            Product.objects.filter(order_items__order__created_at__gte=since_date)
-            .annotate(
-                total_sold=Count("order_items"),
-                # ✅ Compute revenue from DB columns, not the Python property
-                total_revenue=Sum("order_items__subtotal"),
-            )
-            .order_by("-total_revenue")
-            .values("id", "name", "price", "total_sold", "total_revenue")[:limit]
-        )
+        category = request.query_params.get("category", "")
+        category_id = int(category) if category.isdigit() else None
 
-        serializer = TopProductSerializer(top_products, many=True)
+        top = top_products(days, limit, category_id)
+        serializer = TopProductSerializer(top, many=True)
         return Response({"days": days, "products": serializer.data})
 
 
-class PurchasesAnalyticsView(APIView):
-    permission_classes = [IsAdminUser]
+PURCHASE_COLUMNS = (
+    "order_id",
+    "user_id",
+    "username",
+    "product_id",
+    "product_name",
+    "quantity",
+    "unit_price",
+    "subtotal",
+    "order_date",
+)
 
-    def get(self, request):
-        user_id = request.query_params.get("user_id")
-        product_id = request.query_params.get("product_id")
-        days = int(request.query_params.get("days", 30))
-        since_date = timezone.now() - timedelta(days=days)
 
+class PurchasesAnalyticsView(StreamedExportMixin, APIView):
+    """
+    Order items in the window as JSON, or streamed with ?format=csv or
+    ?format=ndjson: rows are read through a server-side cursor and sent
+    as they arrive, so memory stays flat whatever the window.
+    """
+
+    permission_classes = [IsAdminUser]
+    chunk_size = 2000
+
+    def get_rows(self, request, since_date):
         query = OrderItem.objects.filter(order__created_at__gte=since_date)
 
-        if user_id:
+        if user_id := request.query_params.get("user_id"):
             query = query.filter(order__owner__id=user_id)
-        if product_id:
+        if product_id := request.query_params.get("product_id"):
             query = query.filter(product__id=product_id)
 
-        # Use select_related for better performance and debugging
-        query = query.select_related("order__owner", "product")
-
-        data = []
-        for item in query:
-            order = item.order
-            owner = order.owner
-
-            # Handle case where order has no owner (NULL)
-            if owner:
-                username = owner.username
-                user_id_val = owner.id
-            else:
-                username = "Guest User"
-                user_id_val = None
+        return query.order_by("order_id", "pk").values(
+            "order_id",
+            "product_id",
+            "quantity",
+            "unit_price",
+            "subtotal",
+            user_id=F("order__owner_id"),
+            order_date=F("order__created_at"),
+            # Orders without an owner, items whose product was deleted
+            username=Coalesce("order__owner__username", Value("Guest User")),
+            product_name=Coalesce("product__name", Value("Deleted Product")),
+        )
 
-            data.append(
-                {
-                    "order_id": order.id,
-                    "user_id": user_id_val,
-                    "username": username,  # Will be 'Guest User' if no owner
-                    "product_id": item.product.id if item.product else None,
-                    "product_name": (
-                        item.product.name if item.product else "Deleted Product"
-                    ),
-                    "quantity": item.quantity,
-                    "unit_price": float(item.unit_price),
-                    "subtotal": float(item.subtotal),
-                    "order_date": order.created_at,
-                }
+    def get(self, request):
+        days = int(request.query_params.get("days", 30))
+        since_date = timezone.now() - timedelta(days=days)
+        rows = self.get_rows(request, since_date)
+
+        export_format = request.query_params.get("format")
+        if export_format in EXPORT_FORMATS:
+            return export_response(
+                export_format,
+                f"purchases-{days}d-{timezone.localdate():%Y-%m-%d}",
+                PURCHASE_COLUMNS,
+                rows.iterator(chunk_size=self.chunk_size),
             )
 
-        total = len(data)
+        data = list(rows)
         serializer = PurchaseSerializer(data, many=True)
-        return Response({"days": days, "total": total, "purchases": serializer.data})
+        return Response({"days": days, "total": len(data), "purchases": serializer.data})
 
 
 # ─── Unfold Admin Dashboard Callback ───────────────────────────────────────────
@@ -1104,22 +1227,15 @@ from django.db.models import Sum, Count
 
 def dashboard_callback(request, context):
     """
-    Populates the Unfold Admin home page with live KPI metrics.
+    Populates the Unfold Admin home page from the KPI counters (api/kpis.py),
+    a fixed handful of rows however large the tables grow.
     Configured via UNFOLD["DASHBOARD_CALLBACK"] in settings.py.
     """
-    total_products = Product.objects.filter(is_active=True).count()
-    total_users = User.objects.count()
-    total_orders = Order.objects.count()
-
-    revenue_agg = Order.objects.select_related("payment").aggregate(
-        total=Sum("payment__amount")
-    )
-    revenue = revenue_agg["total"] or 0
-
-    recent_orders = (
-        Order.objects.select_related("owner")
-        .order_by("-created_at")[:5]
-    )
+    kpis = kpi_values()
+    total_products = int(kpis[ACTIVE_PRODUCTS])
+    total_users = int(kpis[USERS])
+    total_orders = int(kpis[ORDERS])
+    revenue = kpis[REVENUE]
 
     context.update(
         {
@@ -1149,22 +1265,14 @@ def dashboard_callback(request, context):
                     "icon": "payments",
                 },
             ],
-            "recent_orders": [
-                {
-                    "id": o.id,
-                    "owner": o.owner.username if o.owner else "—",
-                    "status": o.status,
-                    "created_at": o.created_at.strftime("%Y-%m-%d %H:%M"),
-                }
-                for o in recent_orders
-            ],
+            "recent_orders": recent_orders(),
         }
     )
     return context
 
 
 
-class SellerProductViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
+class SellerProductViewSet(viewsets.ModelViewSet):
     """
     /api/sellers/products/            GET (list mine), POST (create)
     /api/sellers/products/<pk>/       GET, PUT, PATCH, DELETE (mine only)
@@ -1187,16 +1295,12 @@ class SellerProductViewSet(CacheInvalidateMixin, viewsets.ModelViewSet):
         # request body, since ProductSerializer already marks it read_only.
         # New seller-submitted products always start pending review.
         serializer.save(seller=self.request.user.seller_profile, approval_status=Product.ApprovalStatus.PENDING)
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
  
     def perform_update(self, serializer):
         # Editing a live product sends it back for re-review. Adjust this
         # if you'd rather let minor edits (e.g. price) stay live — in that
         # case only reset to PENDING when specific fields change.
         serializer.save(approval_status=Product.ApprovalStatus.PENDING, rejection_reason="")
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
  
  
  
@@ -1208,11 +1312,6 @@ class ProductApprovalView(generics.UpdateAPIView):
     serializer_class = ProductApprovalSerializer
     permission_classes = [IsAdminUser]
  
-    def perform_update(self, serializer):
-        super().perform_update(serializer)
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
- 
  
 class PendingProductsAdminView(ListAPIView):
     """GET /api/admins/products/pending/ — queue for the review dashboard."""
@@ -1245,11 +1344,6 @@ class AdminSellerViewSet(viewsets.ModelViewSet):
             return SellerApprovalSerializer
         return AdminSellerSerializer
 
-    def perform_update(self, serializer):
-        super().perform_update(serializer)
-        if getattr(settings, "ENABLE_CACHING", True):
-            cache.clear()
-
 
 class SellerStripeOnboardView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1354,20 +1448,28 @@ class CouponApplyView(APIView):
 
         discount = coupon.calculate_discount(order.total_before_discount)
 
-        OrderCoupon.objects.create(
-            order=order,
-            coupon=coupon,
-            discount_amount=discount,
-        )
+        with transaction.atomic():
+            _, created = OrderCoupon.objects.get_or_create(
+                order=order,
+                coupon=coupon,
+                defaults={"discount_amount": discount},
+            )
+            if not created:
+                return Response(
+                    {"error": "Coupon already applied to this order."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-        order.discount_amount = sum(
-            oc.discount_amount for oc in order.coupons_applied.all()
-        )
-        order.subtotal_before_discount = order.total_before_discount
-        order.save()
+            order.discount_amount = sum(
+                oc.discount_amount for oc in order.coupons_applied.all()
+            )
+            order.subtotal_before_discount = order.total_before_discount
+            order.save()
 
-        coupon.times_used += 1
-        coupon.save(update_fields=["times_used"])
+            redeemed, message = coupon.redeem(request.user)
+            if not redeemed:
+                transaction.set_rollback(True)
+                return Response({"error": message}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "success": True,
@@ -1380,6 +1482,14 @@ class CouponApplyView(APIView):
 # SELLER PUBLIC PROFILE (YouTube-style)
 # ===============================================
 
+@method_decorator(
+    cache_api_response(
+        timeout=600,
+        namespaces=lambda request, pk: ("categories", "tags", seller_namespace(pk)),
+        fingerprint=offer_clock,
+    ),
+    name="dispatch",
+)
 class SellerPublicProfileView(generics.RetrieveAPIView):
     queryset = SellerProfile.objects.select_related("user")
     serializer_class = SellerPublicProfileSerializer
@@ -1503,7 +1613,7 @@ class PlatformSettingsView(APIView):
         for field in ["default_commission_rate", "auto_approve_products", "auto_approve_sellers"]:
             if field in request.data:
                 setattr(ps, field, request.data[field])
-        ps.save()
+        ps.save()  # bumps the shared version stamp; every worker reloads within ~1s
         return Response({
             "default_commission_rate": str(ps.default_commission_rate),
             "auto_approve_products": ps.auto_approve_products,
@@ -1511,61 +1621,59 @@ class PlatformSettingsView(APIView):
         })
 
 
+class SellerEarningsPagination(StandardResultsSetPagination):
+    page_size = 50
+
+
 class AdminSellerEarningsView(APIView):
+    """
+    30-day and 7-day earnings of every approved seller, computed in one
+    grouped query (see api/earnings.py).
+
+    ?sort= takes any of EARNING_METRICS, `-` for descending (default
+    -total_revenue_30d); ?page= / ?page_size= opt into pages of sellers,
+    otherwise every seller is listed. ?export=csv downloads every seller
+    in the current sort order.
+    """
+
     permission_classes = [IsAdminUser]
+    default_sort = "-total_revenue_30d"
 
     def get(self, request):
-        from django.db.models import Sum
-        from django.utils import timezone
-        from datetime import timedelta
-
         now = timezone.now()
-        last_30_days = now - timedelta(days=30)
-        last_7_days = now - timedelta(days=7)
-
-        sellers = SellerProfile.objects.filter(
-            verification_status="approved"
-        ).select_related("user")
-
-        earnings = []
-        for seller in sellers:
-            items = OrderItem.objects.filter(
-                product__seller=seller,
-                order__created_at__gte=last_30_days,
-                order__status__in=["confirmed", "processing", "shipped", "delivered"],
+        sort = request.query_params.get("sort", self.default_sort)
+        if sort.lstrip("-") not in EARNING_METRICS:
+            sort = self.default_sort
+        sellers = seller_earnings(now).order_by(sort, "pk")
+
+        if request.query_params.get("export") == "csv":
+            return csv_response(
+                f"seller-earnings-{now:%Y-%m-%d}.csv",
+                EARNING_CSV_COLUMNS,
+                earnings_rows(sellers.iterator(chunk_size=500)),
             )
-            weekly_items = items.filter(order__created_at__gte=last_7_days)
-
-            total_revenue_30d = items.aggregate(total=Sum("subtotal"))["total"] or 0
-            total_commission_30d = items.aggregate(total=Sum("platform_fee"))["total"] or 0
-            total_revenue_7d = weekly_items.aggregate(total=Sum("subtotal"))["total"] or 0
-            total_orders = items.values("order").distinct().count()
-
-            earnings.append({
-                "seller_id": seller.id,
-                "business_name": seller.business_name,
-                "username": seller.user.username,
-                "delivery_type": seller.delivery_type,
-                "commission_rate": str(seller.effective_commission_rate()),
-                "total_revenue_30d": str(total_revenue_30d),
-                "total_commission_30d": str(total_commission_30d),
-                "total_revenue_7d": str(total_revenue_7d),
-                "total_orders_30d": total_orders,
-                "seller_payout_30d": str(total_revenue_30d - total_commission_30d),
-            })
-
-        total_platform_commission = sum(
-            Decimal(e["total_commission_30d"]) for e in earnings
-        )
-        total_revenue = sum(
-            Decimal(e["total_revenue_30d"]) for e in earnings
-        )
 
+        paginator = None
+        if "page" in request.query_params or "page_size" in request.query_params:
+            paginator = SellerEarningsPagination()
+            sellers = paginator.paginate_queryset(sellers, request, view=self)
+            count = paginator.page.paginator.count
+        else:
+            sellers = list(sellers)
+            count = len(sellers)
+        earnings = [
+            {key: str(value) if isinstance(value, Decimal) else value for key, value in row.items()}
+            for row in earnings_rows(sellers)
+        ]
+        summary = earnings_summary(now)
         return Response({
+            "count": count,
+            "next": paginator.get_next_link() if paginator else None,
+            "previous": paginator.get_previous_link() if paginator else None,
             "earnings": earnings,
             "summary": {
-                "total_revenue_30d": str(total_revenue),
-                "total_commission_30d": str(total_platform_commission),
-                "active_sellers": len(earnings),
+                "total_revenue_30d": str(summary["total_revenue_30d"]),
+                "total_commission_30d": str(summary["total_commission_30d"]),
+                "active_sellers": count,
             },
         })
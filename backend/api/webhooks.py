@@ -0,0 +1,387 @@
+"""
+Payment-gateway webhook inbox.
+
+The webhook endpoints verify the payload, store it with record_event()
+and answer 200 straight away, so a slow database or Stripe API call can
+no longer time the gateway out and trigger redeliveries. Redeliveries of
+an event already stored are dropped by the (provider, event_id)
+constraint.
+
+`manage.py drain_webhooks` applies stored events with drain(). A handler
+that raises is retried with exponential backoff; after MAX_ATTEMPTS the
+event is parked as failed for a human to look at. Handlers therefore
+have to be safe to run more than once.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Order, Payment, WebhookEvent
+from .payouts import record_payouts
+from .stock import commit_order_stock, release_order_stock
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = timedelta(seconds=30)
+MAX_BACKOFF = timedelta(hours=1)
+# How long a drained batch is hidden from other workers while it runs.
+LEASE = timedelta(minutes=5)
+
+
+class WebhookVerificationError(Exception):
+    pass
+
+
+# ─── Receiving ─────────────────────────────────────────────────────────────────
+
+
+def record_event(provider, event_id, event_type, payload):
+    """Store an event unless it was already received. Returns True if new."""
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(
+                provider=provider,
+                event_id=event_id,
+                event_type=event_type,
+                payload=payload,
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def _payload_digest(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def _load_object(body):
+    """The JSON object a gateway posted, or WebhookVerificationError."""
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise WebhookVerificationError(f"Invalid payload: {e}")
+    if not isinstance(data, dict):
+        raise WebhookVerificationError("Invalid payload: expected a JSON object")
+    return data
+
+
+def parse_stripe(body, sig_header):
+    """Verify a Stripe webhook; returns (event_id, event_type, payload)."""
+    try:
+        event = stripe.Webhook.construct_event(
+            body, sig_header, settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        raise WebhookVerificationError(str(e))
+    return event["id"], event["type"], body.decode()
+
+
+# Fields of a Paymob transaction callback covered by its HMAC, in order.
+PAYMOB_HMAC_FIELDS = (
+    "amount_cents",
+    "created_at",
+    "currency",
+    "error_occured",
+    "has_parent_transaction",
+    "id",
+    "integration_id",
+    "is_3d_secure",
+    "is_auth",
+    "is_capture",
+    "is_refunded",
+    "is_standalone_payment",
+    "is_voided",
+    "order.id",
+    "owner",
+    "pending",
+    "source_data.pan",
+    "source_data.sub_type",
+    "source_data.type",
+    "success",
+)
+# Fields of a Paymob TOKEN callback (a saved card) covered by its HMAC.
+PAYMOB_TOKEN_HMAC_FIELDS = (
+    "card_subtype",
+    "created_at",
+    "email",
+    "id",
+    "masked_pan",
+    "merchant_id",
+    "order_id",
+    "token",
+)
+PAYMOB_HMAC_FIELDS_BY_TYPE = {
+    "TRANSACTION": PAYMOB_HMAC_FIELDS,
+    "TOKEN": PAYMOB_TOKEN_HMAC_FIELDS,
+}
+
+
+def _paymob_hmac_value(obj, path):
+    value = obj
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "" if value is None else str(value)
+
+
+def parse_paymob(body, received_hmac=""):
+    """
+    Verify a Paymob TRANSACTION or TOKEN callback, each against the fields
+    Paymob signs for its type; returns (event_id, event_type, payload).
+    """
+    data = _load_object(body)
+    obj = data.get("obj") or {}
+    event_type = data.get("type", "TRANSACTION")
+    if not isinstance(obj, dict) or not isinstance(event_type, str):
+        raise WebhookVerificationError("Invalid payload: malformed obj or type")
+
+    secret = getattr(settings, "PAYMOB_HMAC", "")
+    if secret:
+        fields = PAYMOB_HMAC_FIELDS_BY_TYPE.get(event_type)
+        if fields is None:
+            raise WebhookVerificationError(f"Unknown callback type {event_type!r}")
+        message = "".join(_paymob_hmac_value(obj, path) for path in fields)
+        expected = hmac.new(secret.encode(), message.encode(), hashlib.sha512).hexdigest()
+        if not hmac.compare_digest(expected, str(received_hmac or data.get("hmac", ""))):
+            raise WebhookVerificationError("Invalid HMAC")
+
+    event_id = str(obj.get("id") or _payload_digest(body))
+    return f"{event_type}:{event_id}", event_type, body.decode()
+
+
+def parse_fawry(body):
+    """Verify a Fawry V2 notification; returns (event_id, event_type, payload)."""
+    data = _load_object(body)
+
+    security_code = getattr(settings, "FAWRY_SECURITY_CODE", "")
+    if security_code:
+        message = "".join(
+            [
+                str(data.get("fawryRefNumber", "")),
+                str(data.get("merchantRefNumber", "")),
+                _fawry_amount(data.get("paymentAmount")),
+                _fawry_amount(data.get("orderAmount")),
+                str(data.get("orderStatus", "")),
+                str(data.get("paymentMethod", "")),
+                str(data.get("paymentRefrenceNumber") or ""),
+                security_code,
+            ]
+        )
+        expected = hashlib.sha256(message.encode()).hexdigest()
+        if not hmac.compare_digest(expected, str(data.get("messageSignature", ""))):
+            raise WebhookVerificationError("Invalid signature")
+
+    order_status = data.get("orderStatus", "")
+    ref = data.get("fawryRefNumber") or data.get("merchantRefNumber")
+    # One notification per status change of a reference.
+    event_id = f"{ref}:{order_status}" if ref else _payload_digest(body)
+    return event_id, order_status, body.decode()
+
+
+def _fawry_amount(value):
+    if value in (None, ""):
+        return ""
+    try:
+        return f"{Decimal(str(value)):.2f}"
+    except InvalidOperation:
+        raise WebhookVerificationError(f"Invalid amount {value!r}")
+
+
+# ─── Handlers ──────────────────────────────────────────────────────────────────
+
+
+def _handle_stripe(event):
+    data = json.loads(event.payload)
+    payment_intent = data["data"]["object"]
+    if event.event_type == "payment_intent.succeeded":
+        _stripe_payment_succeeded(payment_intent)
+    elif event.event_type == "payment_intent.payment_failed":
+        _stripe_payment_closed(payment_intent, "failed")
+    elif event.event_type == "payment_intent.canceled":
+        _stripe_payment_closed(payment_intent, "cancelled")
+
+
+def _stripe_payment_succeeded(payment_intent):
+    """
+    Mark payment and order as paid and queue the sellers' transfers
+    (sent by `manage.py run_payouts`, see api/payouts.py).
+    """
+    order_id = payment_intent["metadata"].get("order_id")
+
+    with transaction.atomic():
+        payment = Payment.objects.get(stripe_payment_id=payment_intent["id"])
+        payment.status = "success"
+        payment.save()
+
+        order = Order.objects.get(id=order_id)
+        if order.status == "pending":
+            order.status = "confirmed"
+            order.save()
+
+        commit_order_stock(order)
+        record_payouts(order)
+
+    logger.info(f"Payment succeeded for Order #{order_id}")
+
+
+def _close_order(order):
+    """Cancel an order whose payment failed and hand its held stock back."""
+    if order.status == "pending":
+        order.status = "cancelled"
+        order.save(update_fields=["status"])
+    release_order_stock(order)
+
+
+def _stripe_payment_closed(payment_intent, payment_status):
+    order_id = payment_intent["metadata"].get("order_id")
+
+    with transaction.atomic():
+        payment = Payment.objects.get(stripe_payment_id=payment_intent["id"])
+        payment.status = payment_status
+        payment.save()
+
+        order = Order.objects.filter(id=order_id).first() if order_id else None
+        if order is None:
+            order = Order.objects.filter(payment=payment).first()
+        if order is not None:
+            _close_order(order)
+
+    logger.info(f"Payment {payment_status} for Order #{order_id}")
+
+
+def _handle_paymob(event):
+    if event.event_type != "TRANSACTION":
+        return  # saved-card TOKEN callbacks carry no payment outcome
+    data = json.loads(event.payload)
+    obj = data.get("obj", {})
+    paymob_order_id = str(obj.get("order", {}).get("id", ""))
+    success = obj.get("success", False)
+    if not paymob_order_id:
+        return
+
+    with transaction.atomic():
+        payment = Payment.objects.filter(provider_payment_id=paymob_order_id).first()
+        if not payment:
+            return
+        payment.status = "completed" if success else "failed"
+        payment.raw_response = json.dumps(data)
+        payment.save(update_fields=["status", "raw_response"])
+
+        order = Order.objects.filter(payment=payment).first()
+        if order is None:
+            return
+        if success:
+            order.status = "confirmed"
+            order.save(update_fields=["status"])
+            commit_order_stock(order)
+        else:
+            _close_order(order)
+
+
+def _handle_fawry(event):
+    data = json.loads(event.payload)
+    fawry_ref = data.get("fawryRefNumber", "")
+    merchant_ref = data.get("merchantRefNumber", "")
+    order_status = data.get("orderStatus", "")
+    if not (fawry_ref or merchant_ref):
+        return
+
+    with transaction.atomic():
+        payment = Payment.objects.filter(
+            provider_payment_id__in=[fawry_ref, merchant_ref]
+        ).first()
+        if not payment:
+            return
+        order = Order.objects.filter(payment=payment).first()
+        if order_status == "PAID":
+            payment.status = "completed"
+            if order is not None:
+                order.status = "confirmed"
+                order.save(update_fields=["status"])
+                commit_order_stock(order)
+        elif order_status in ("CANCELED", "EXPIRED"):
+            payment.status = "failed"
+            if order is not None:
+                _close_order(order)
+
+        payment.raw_response = json.dumps(data)
+        payment.save(update_fields=["status", "raw_response"])
+
+
+HANDLERS = {
+    WebhookEvent.Provider.STRIPE: _handle_stripe,
+    WebhookEvent.Provider.PAYMOB: _handle_paymob,
+    WebhookEvent.Provider.FAWRY: _handle_fawry,
+}
+
+
+# ─── Draining ──────────────────────────────────────────────────────────────────
+
+
+def backoff(attempts):
+    return min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to batch_size due events to this worker. Rows are locked with
+    SKIP LOCKED where supported, so concurrent drainers take disjoint
+    batches; the lease keeps them hidden until this worker records an
+    outcome (or dies and the lease runs out).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=WebhookEvent.Status.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "pk")[:batch_size]
+        )
+        if events:
+            WebhookEvent.objects.filter(pk__in=[e.pk for e in events]).update(
+                next_attempt_at=now + LEASE
+            )
+    return events
+
+
+def process_event(event):
+    """Apply one event and record the outcome. Returns True on success."""
+    event.attempts += 1
+    try:
+        HANDLERS[event.provider](event)
+    except Exception as e:
+        logger.exception(f"Webhook {event} failed (attempt {event.attempts})")
+        event.last_error = f"{type(e).__name__}: {e}"
+        if event.attempts >= MAX_ATTEMPTS:
+            event.status = WebhookEvent.Status.FAILED
+        else:
+            event.next_attempt_at = timezone.now() + backoff(event.attempts)
+        event.save(update_fields=["attempts", "status", "next_attempt_at", "last_error"])
+        return False
+
+    event.status = WebhookEvent.Status.PROCESSED
+    event.processed_at = timezone.now()
+    event.last_error = ""
+    event.save(update_fields=["attempts", "status", "processed_at", "last_error"])
+    return True
+
+
+def drain(batch_size=50):
+    """Process one batch of due events. Returns (processed, failed)."""
+    processed = failed = 0
+    for event in claim_batch(batch_size):
+        if process_event(event):
+            processed += 1
+        else:
+            failed += 1
+    return processed, failed
@@ -15,6 +15,7 @@ from pathlib import Path
 
 import cloudinary
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 import os
@@ -145,6 +146,10 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 # ✅ Global cache control flag
 ENABLE_CACHING = os.getenv("ENABLE_CACHING", "True").lower() in ("true", "1", "yes")
 
+# Serve public product listings from the ProductCard read model (api/cards.py).
+# Run `manage.py rebuild_product_cards` before switching this on.
+SERVE_PRODUCT_CARDS = os.getenv("SERVE_PRODUCT_CARDS", "False").lower() in ("true", "1", "yes")
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
@@ -279,6 +284,7 @@ MEDIA_URL = "/media/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
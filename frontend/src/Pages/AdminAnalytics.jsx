@@ -2108,7 +2108,7 @@ const AdminAnalytics = () => {
               />
               <KPICard
                 label="Active Sellers"
-                value={sellerEarnings.earnings?.length || 0}
+                value={sellerEarnings.summary?.active_sellers ?? sellerEarnings.earnings?.length ?? 0}
                 sub="Registered sellers"
                 accent={TOKEN.success}
                 icon={<Users2 size={18} color="var(--color-info, #3b82f6)" />}
@@ -2176,7 +2176,7 @@ const AdminAnalytics = () => {
               <div className="section-header">
                 <h2>
                   Seller Earnings{" "}
-                  <span className="badge">{sellerEarnings.earnings?.length || 0}</span>
+                  <span className="badge">{sellerEarnings.count ?? sellerEarnings.earnings?.length ?? 0}</span>
                 </h2>
               </div>
               {sellerEarnings.earnings?.length > 0 ? (